@@ -1,68 +1,82 @@
 import asyncio
 
-from aiogram import Bot, Dispatcher
-from aiogram.contrib.fsm_storage.memory import MemoryStorage
-from aiogram.contrib.middlewares.environment import EnvironmentMiddleware
 from structlog import get_logger
 from structlog.stdlib import BoundLogger
 
-from app.config_reader import load_config
-from app.handlers import (register_funny_handlers,
-                          register_introduction_handlers,
-                          register_source_handlers, register_title_handlers)
+from app.application import (ALLOWED_UPDATES, Application,
+                             create_application)
+from app.config_reader import Config, load_config
 from app.logging import logging_configure
-from app.services.title.anilist import AnilistApi
+from app.metrics import start_metrics_server
+from app.supervisor import run_supervisor
+from app.webhook import run_webhook
 
 logger: BoundLogger = get_logger()
 
 
-async def main() -> None:
-    logging_configure()
-    logger.info("Logging is configured")
+async def run_polling(application: Application) -> None:
+    try:
+        await application.dp.start_polling(
+            allowed_updates=ALLOWED_UPDATES,
+        )
+    finally:
+        logger.warning("Bot stopped!")
+
+        await application.close()
+
+
+async def run_workers(config: Config) -> None:
+    # Workers serve their own metrics, the supervisor only the health of
+    # workers
+    metrics_runner = None
+    if config.metrics.port is not None:
+        metrics_runner = await start_metrics_server(
+            host=config.metrics.host,
+            port=config.metrics.port,
+        )
+
+    logger.warning("Bot starting!", workers=config.workers.count)
+    try:
+        await run_supervisor(config)
+    finally:
+        if metrics_runner is not None:
+            await metrics_runner.cleanup()
 
+        logger.info("Bye!")
+
+
+async def main() -> None:
     config = load_config()
-    logger.info("Configuration loaded")
 
-    bot = Bot(
-        token=config.bot.token,
-        parse_mode=None,
-        disable_web_page_preview=None,
-    )
-    dp = Dispatcher(
-        bot=bot,
-        storage=MemoryStorage(),
+    logging_configure(
+        profile=config.logging.profile,
+        level=config.logging.level,
+        sample_rate=config.logging.sample_rate,
     )
+    logger.info("Configuration loaded", logging=config.logging.profile)
 
-    anilist = AnilistApi()
+    if config.workers.count > 1:
+        await run_workers(config)
+        return
 
-    dp.setup_middleware(
-        EnvironmentMiddleware(
-            {"anilist": anilist, "config": config},
-        ),
-    )
-    logger.info("Middlewares are setup!")
+    application = create_application(config)
 
-    register_introduction_handlers(dp)
-    register_funny_handlers(dp)
-    register_source_handlers(dp)
-    register_title_handlers(dp)
-    logger.info("Handlers are registered!")
+    metrics_runner = None
+    if config.metrics.port is not None:
+        metrics_runner = await start_metrics_server(
+            host=config.metrics.host,
+            port=config.metrics.port,
+        )
 
     logger.warning("Bot starting!")
     try:
-        await dp.start_polling(
-            allowed_updates=[
-                "message_handlers", "callback_query_handlers",
-            ],
-        )
+        if config.webhook.url is not None:
+            await run_webhook(application)
+        else:
+            await run_polling(application)
     finally:
-        logger.warning("Bot stopped!")
-
-        bot_session = await bot.get_session()
-        if bot_session is not None:
-            await bot_session.close()
-
-        await anilist.close()
+        if metrics_runner is not None:
+            await metrics_runner.cleanup()
 
         logger.info("Bye!")
 
@@ -0,0 +1,199 @@
+from dataclasses import dataclass
+from typing import Optional
+
+from aiogram import Dispatcher
+from aiogram.bot.api import TELEGRAM_PRODUCTION, TelegramAPIServer
+from aiogram.contrib.fsm_storage.memory import MemoryStorage
+from aiogram.contrib.middlewares.environment import EnvironmentMiddleware
+from structlog import get_logger
+from structlog.stdlib import BoundLogger
+
+from app.config_reader import Config
+from app.handlers import (register_funny_handlers,
+                          register_introduction_handlers,
+                          register_source_handlers, register_stats_handlers,
+                          register_title_handlers)
+from app.metrics import ANILIST_RATE_LIMITER_QUEUE, observe_cache
+from app.middlewares import (MetricsMiddleware, SchedulerMiddleware,
+                             UpdateRecorderMiddleware)
+from app.services.title.anilist import AnilistApi
+from app.services.title.anilist.cache import (BaseCache, MemoryCache,
+                                              SqliteCache, TieredCache)
+from app.services.title.anilist.prefetcher import Prefetcher
+from app.services.title.anilist.title_index import TitleIndex
+from app.telegram import InstrumentedBot, SendQueue
+from app.utils import (FairScheduler, LatestTasks, RateLimiter,
+                       install_aiogram_json_loads)
+
+logger: BoundLogger = get_logger()
+
+ALLOWED_UPDATES = ["message", "callback_query", "inline_query"]
+
+
+@dataclass
+class Application:
+    config: Config
+    bot: InstrumentedBot
+    dp: Dispatcher
+    anilist: AnilistApi
+    inline_searches: LatestTasks
+    message_tasks: LatestTasks
+    recorder: Optional[UpdateRecorderMiddleware] = None
+
+    async def close(self) -> None:
+        if self.recorder is not None:
+            self.recorder.close()
+
+        if self.bot.send_queue is not None:
+            self.bot.send_queue.close()
+
+        bot_session = await self.bot.get_session()
+        if bot_session is not None:
+            await bot_session.close()
+
+        self.inline_searches.close()
+        self.message_tasks.close()
+        await self.anilist.close()
+
+
+def create_anilist(config: Config) -> AnilistApi:
+    cache: BaseCache = MemoryCache(
+        max_size=config.cache.max_size,
+        ttl=config.cache.ttl,
+        refresh_ahead=config.cache.refresh_ahead,
+    )
+    search_cache: BaseCache = MemoryCache(
+        max_size=config.search_cache.max_size,
+        ttl=config.search_cache.ttl,
+        negative_ttl=config.search_cache.negative_ttl,
+    )
+    if config.cache.path is not None:
+        cache = TieredCache(
+            memory=cache,
+            persistent=SqliteCache(
+                path=config.cache.path,
+                table="titles",
+                ttl=config.cache.ttl,
+            ),
+        )
+        search_cache = TieredCache(
+            memory=search_cache,
+            persistent=SqliteCache(
+                path=config.cache.path,
+                table="searches",
+                ttl=config.search_cache.ttl,
+                negative_ttl=config.search_cache.negative_ttl,
+            ),
+        )
+        logger.info("Persistent cache is enabled", path=config.cache.path)
+
+    title_index = None
+    if config.title_index.path is not None:
+        title_index = TitleIndex(path=config.title_index.path)
+        logger.info("Title index is enabled", path=config.title_index.path)
+
+    rate_limiter = RateLimiter(
+        requests_per_minute=config.anilist.requests_per_minute,
+        burst=config.anilist.burst,
+    )
+    prefetcher = Prefetcher(
+        max_concurrency=config.anilist.prefetch_concurrency,
+        min_tokens=config.anilist.prefetch_min_tokens,
+        rate_limiter=rate_limiter,
+    )
+    anilist = AnilistApi(
+        cache=cache,
+        search_cache=search_cache,
+        batch_window=config.anilist.batch_window_ms / 1000,
+        batch_size=config.anilist.batch_size,
+        rate_limiter=rate_limiter,
+        title_index=title_index,
+        source_url=config.anilist.url,
+        prefetcher=prefetcher,
+    )
+
+    observe_cache("titles", cache)
+    observe_cache("searches", search_cache)
+    ANILIST_RATE_LIMITER_QUEUE.labels().set_function(
+        lambda: rate_limiter.queue_depth,
+    )
+    return anilist
+
+
+def create_application(config: Config) -> Application:
+    install_aiogram_json_loads()
+
+    server = TELEGRAM_PRODUCTION
+    if config.bot.api_url is not None:
+        server = TelegramAPIServer.from_base(config.bot.api_url)
+        logger.info("Custom Bot API server", url=config.bot.api_url)
+
+    bot = InstrumentedBot(
+        token=config.bot.token,
+        parse_mode=None,
+        disable_web_page_preview=None,
+        server=server,
+    )
+    bot.send_queue = SendQueue(
+        send=bot.send_now,
+        messages_per_second=config.send_limits.messages_per_second,
+        chat_messages_per_minute=config.send_limits.chat_messages_per_minute,
+        group_chat_messages_per_minute=(
+            config.send_limits.group_chat_messages_per_minute
+        ),
+        chat_burst=config.send_limits.chat_burst,
+    )
+    dp = Dispatcher(
+        bot=bot,
+        storage=MemoryStorage(),
+    )
+
+    anilist = create_anilist(config)
+    inline_searches = LatestTasks()
+    message_tasks = LatestTasks()
+
+    recorder = None
+    if config.recorder.path is not None:
+        recorder = UpdateRecorderMiddleware(config.recorder.path)
+        dp.setup_middleware(recorder)
+        logger.info("Updates are recorded", path=config.recorder.path)
+
+    dp.setup_middleware(MetricsMiddleware())
+    dp.setup_middleware(
+        SchedulerMiddleware(
+            FairScheduler(
+                concurrency=config.scheduler.concurrency,
+                queue_size=config.scheduler.queue_size,
+            ),
+            message_tasks=message_tasks,
+            inline_searches=inline_searches,
+        ),
+    )
+    dp.setup_middleware(
+        EnvironmentMiddleware(
+            {
+                "anilist": anilist,
+                "config": config,
+                "inline_searches": inline_searches,
+                "message_tasks": message_tasks,
+            },
+        ),
+    )
+    logger.info("Middlewares are setup!")
+
+    register_introduction_handlers(dp)
+    register_stats_handlers(dp)
+    register_funny_handlers(dp)
+    register_source_handlers(dp)
+    register_title_handlers(dp)
+    logger.info("Handlers are registered!")
+
+    return Application(
+        config=config,
+        bot=bot,
+        dp=dp,
+        anilist=anilist,
+        inline_searches=inline_searches,
+        message_tasks=message_tasks,
+        recorder=recorder,
+    )
@@ -0,0 +1,59 @@
+import argparse
+import asyncio
+import logging
+
+from app.bench.catalog import Catalog
+from app.bench.runner import bench_config, drive, report, run
+from app.bench.servers import (FakeServers, add_server_arguments,
+                               server_options)
+from app.bench.workload import Workload
+from app.logging import logging_configure
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog="python -m app.bench",
+        description=(
+            "Drive the bot's dispatcher with synthetic updates against "
+            "local stand-ins for AniList and the Telegram Bot API."
+        ),
+    )
+    parser.add_argument("--updates", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--users", type=int, default=1000)
+    add_server_arguments(parser)
+    return parser.parse_args()
+
+
+async def main() -> None:
+    args = parse_args()
+
+    logging_configure()
+    logging.getLogger().setLevel(args.log_level)
+
+    workload = Workload(
+        Catalog(size=args.catalog_size, seed=args.seed),
+        users=args.users,
+        seed=args.seed,
+    )
+    updates = workload.updates(args.updates)
+
+    with FakeServers(server_options(args)) as servers:
+        config = bench_config(
+            anilist_url=servers.anilist_url,
+            telegram_url=servers.telegram_url,
+            requests_per_minute=args.requests_per_minute,
+            batch_window_ms=args.batch_window_ms,
+        )
+        result = await run(
+            config,
+            lambda application: drive(
+                application, updates, args.concurrency,
+            ),
+        )
+        anilist, telegram = await servers.stats()
+
+    print(report(result, anilist, telegram))
+
+
+asyncio.run(main())
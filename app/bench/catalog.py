@@ -0,0 +1,130 @@
+import random
+from dataclasses import dataclass, field
+from typing import Optional
+
+WORDS = (
+    "tokyo ghoul attack titan steel alchemist fullmetal hunter death note "
+    "one piece naruto bleach spirited away cowboy bebop evangelion neon "
+    "genesis sword art online demon slayer jujutsu kaisen spy family chainsaw "
+    "man hero academia mob psycho vinland saga berserk monster mushishi "
+    "frieren dungeon meshi gintama haikyuu kuroko basketball slam dunk "
+    "clannad steins gate code geass violet evergarden your name weathering "
+    "child silent voice orange march lion toradora nana paradise kiss "
+    "bakuman dororo parasyte blue lock kingdom dragon ball ranma inuyasha "
+    "sailor moon cardcaptor sakura lucky star nichijou konosuba overlord "
+    "re zero log horizon no game life made abyss promised neverland"
+).split()
+
+FORMATS = {
+    "ANIME": ("TV", "TV_SHORT", "MOVIE", "OVA", "ONA", "SPECIAL"),
+    "MANGA": ("MANGA", "NOVEL", "ONE_SHOT"),
+}
+GENRES = (
+    "Action", "Adventure", "Comedy", "Drama", "Fantasy", "Horror",
+    "Mystery", "Psychological", "Romance", "Sci-Fi", "Slice of Life",
+    "Sports", "Supernatural", "Thriller",
+)
+RELATION_TYPES = (
+    "ADAPTATION", "PREQUEL", "SEQUEL", "PARENT", "SIDE_STORY", "CHARACTER",
+    "SUMMARY", "ALTERNATIVE", "SPIN_OFF", "OTHER", "SOURCE",
+)
+
+
+@dataclass
+class Catalog:
+    # A deterministic stand-in for AniList media, shared by the fake
+    # server and the workload so that searches find something
+    size: int = 5000
+    seed: int = 0
+    media: dict[int, dict] = field(default_factory=dict)
+    relations: dict[int, list[tuple[int, str]]] = field(default_factory=dict)
+    names: list[str] = field(default_factory=list)
+    _words: dict[str, set[int]] = field(default_factory=dict)
+
+    def __post_init__(self) -> None:
+        rng = random.Random(self.seed)
+
+        for title_id in range(1, self.size + 1):
+            words = rng.sample(WORDS, rng.randint(2, 4))
+            name = " ".join(words)
+            media_type = rng.choice(tuple(FORMATS))
+            story = " ".join(rng.choices(WORDS, k=rng.randint(20, 120)))
+
+            self.media[title_id] = {
+                "id": title_id,
+                "type": media_type,
+                "title": {
+                    "english": name.title(),
+                    "romaji": name,
+                    "native": None,
+                },
+                "format": rng.choice(FORMATS[media_type]),
+                "siteUrl": f"https://anilist.co/anime/{title_id}",
+                "bannerImage": None,
+                "description": (
+                    f"{name.capitalize()} is a story about {story}."
+                    "<br><br>\n(Source: <i>Bench</i>)"
+                ),
+                "genres": rng.sample(GENRES, rng.randint(1, 4)),
+                "popularity": rng.randint(0, 100000),
+            }
+            self.names.append(name)
+            for word in words:
+                self._words.setdefault(word, set()).add(title_id)
+
+        # Most titles have a few relations, some belong to huge franchises
+        for title_id in self.media:
+            count = rng.choice((0, 1, 2, 3, 5, 8, 40))
+            self.relations[title_id] = [
+                (rng.randint(1, self.size), rng.choice(RELATION_TYPES))
+                for _ in range(count)
+            ]
+
+    def search(
+        self,
+        query: str,
+        media_type: Optional[str] = None,
+    ) -> list[dict]:
+        ids: Optional[set[int]] = None
+        for word in query.casefold().split():
+            matches = set()
+            for known, title_ids in self._words.items():
+                if known.startswith(word):
+                    matches |= title_ids
+            ids = matches if ids is None else ids & matches
+
+        if not ids:
+            ids = self._unknown_search(query)
+
+        found = [
+            self.media[title_id]
+            for title_id in ids or ()
+            if media_type is None or self.media[title_id]["type"] == media_type
+        ]
+        found.sort(key=lambda media: -media["popularity"])
+        return found
+
+    def get(self, title_id: int) -> Optional[dict]:
+        if title_id <= 0:
+            return None
+
+        media = self.media.get(title_id)
+        if media is None:
+            # Ids from recorded traffic are served by a generated title
+            # wearing that id
+            media = {**self.media[self._known_id(title_id)], "id": title_id}
+        return media
+
+    def related(self, title_id: int) -> list[tuple[int, str]]:
+        return self.relations[self._known_id(title_id)]
+
+    def _known_id(self, title_id: int) -> int:
+        return (title_id - 1) % self.size + 1
+
+    def _unknown_search(self, query: str) -> set[int]:
+        # Searches from recorded traffic don't match generated names, so
+        # every such query gets its own stable set of results
+        rng = random.Random(query.casefold())
+        if rng.random() < 0.1:
+            return set()
+        return set(rng.sample(range(1, self.size + 1), rng.randint(1, 60)))
@@ -0,0 +1,191 @@
+import asyncio
+import random
+import re
+from typing import Any, Optional
+
+from aiohttp import web
+from app.bench.catalog import Catalog
+
+MEDIA_TYPE = re.compile(r"type: (ANIME|MANGA)")
+ARGUMENTS = re.compile(r"\([^()]*\)")
+SELECTION_TOKEN = re.compile(r"[A-Za-z_]\w*|[{}]")
+
+Selection = dict[str, Optional["Selection"]]
+
+
+def parse_selection(query: str) -> Selection:
+    # Fields the query selects, nested like the response. Arguments and
+    # variables don't change which fields are returned
+    tokens = SELECTION_TOKEN.findall(ARGUMENTS.sub("", query))
+    root: Selection = {}
+    stack = [root]
+    field = ""
+    for token in tokens[tokens.index("{") + 1:]:
+        if token == "{":
+            selection: Selection = {}
+            stack[-1][field] = selection
+            stack.append(selection)
+        elif token == "}":
+            stack.pop()
+        else:
+            stack[-1][token] = None
+        field = token
+    return root
+
+
+def select(value: Any, selection: Optional[Selection]) -> Any:
+    # Like AniList, answers only with the fields the query selects
+    if selection is None or value is None:
+        return value
+    if isinstance(value, list):
+        return [select(item, selection) for item in value]
+    return {
+        field: select(value[field], subselection)
+        for field, subselection in selection.items()
+        if field in value
+    }
+
+
+def media_fields(media: dict) -> dict:
+    return {
+        "id": media["id"],
+        "title": dict(media["title"]),
+        "format": media["format"],
+        "siteUrl": media["siteUrl"],
+        "bannerImage": media["bannerImage"],
+        "description": media["description"],
+        "genres": list(media["genres"]),
+    }
+
+
+class FakeAnilist:
+    # A stand-in for graphql.anilist.co, which answers the queries of
+    # AnilistApi from a generated catalog
+    def __init__(
+        self,
+        catalog: Catalog,
+        latency: float = 0.05,
+        error_rate: float = 0,
+        rate_limit_rate: float = 0,
+        retry_after: int = 1,
+        seed: int = 0,
+    ) -> None:
+        self.catalog = catalog
+        self.latency = latency
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+
+        self.requests = 0
+        self.statuses: dict[int, int] = {}
+
+        self._random = random.Random(seed)
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post("/", self.graphql)
+        app.router.add_get("/_stats", self.stats)
+        return app
+
+    async def stats(self, _: web.Request) -> web.Response:
+        return web.json_response(
+            {
+                "requests": self.requests,
+                "statuses": self.statuses,
+            },
+        )
+
+    async def graphql(self, request: web.Request) -> web.Response:
+        self.requests += 1
+        payload = await request.json()
+
+        if self.latency:
+            # Jitter around the mean keeps responses from arriving in
+            # lockstep
+            await asyncio.sleep(self.latency * self._random.uniform(0.5, 1.5))
+
+        roll = self._random.random()
+        if roll < self.rate_limit_rate:
+            return self._respond(
+                429,
+                {"errors": [{"message": "Too Many Requests."}]},
+                headers={"Retry-After": str(self.retry_after)},
+            )
+        if roll < self.rate_limit_rate + self.error_rate:
+            return self._respond(
+                500, {"errors": [{"message": "Internal Server Error"}]},
+            )
+
+        query = payload["query"]
+        status, data = self.answer(query, payload["variables"])
+        return self._respond(
+            status, {"data": select(data, parse_selection(query))},
+        )
+
+    def answer(self, query: str, variables: dict) -> tuple[int, dict]:
+        match = MEDIA_TYPE.search(query)
+        media_type: Optional[str] = match.group(1) if match else None
+        catalog = self.catalog
+
+        if "relations" in query:
+            media = catalog.get(variables["id"])
+            if media is None:
+                return 404, {"Media": None}
+
+            edges = []
+            for related_id, relation_type in catalog.related(media["id"]):
+                related = catalog.get(related_id)
+                if related is not None:
+                    edges.append(
+                        {
+                            "node": media_fields(related),
+                            "relationType": relation_type,
+                        },
+                    )
+            return 200, {"Media": {"relations": {"edges": edges}}}
+
+        if "id_in" in query:
+            found = []
+            for title_id in variables["ids"]:
+                media = catalog.get(title_id)
+                if media is not None and media_type in (None, media["type"]):
+                    found.append(media_fields(media))
+            return 200, {"Page": {"media": found}}
+
+        if "pageInfo" in query:
+            found = catalog.search(variables["search"], media_type)
+            per_page = variables["perPage"]
+            start = (variables["page"] - 1) * per_page
+            has_next_page = start + per_page < len(found)
+            return 200, {
+                "Page": {
+                    "pageInfo": {
+                        "total": len(found),
+                        "hasNextPage": has_next_page,
+                    },
+                    "media": [
+                        media_fields(media)
+                        for media in found[start:start + per_page]
+                    ],
+                },
+            }
+
+        if "search" in variables:
+            found = catalog.search(variables["search"], media_type)
+            if not found:
+                return 404, {"Media": None}
+            return 200, {"Media": media_fields(found[0])}
+
+        media = catalog.get(variables["id"])
+        if media is None or media_type not in (None, media["type"]):
+            return 404, {"Media": None}
+        return 200, {"Media": media_fields(media)}
+
+    def _respond(
+        self,
+        status: int,
+        body: dict,
+        headers: Optional[dict] = None,
+    ) -> web.Response:
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+        return web.json_response(body, status=status, headers=headers)
@@ -0,0 +1,69 @@
+import asyncio
+import random
+from itertools import count
+from time import time
+
+from aiohttp import web
+
+MESSAGE_METHODS = {"sendMessage", "editMessageText"}
+
+
+class FakeTelegram:
+    # A stand-in for the Bot API which accepts every call the handlers make
+    def __init__(self, latency: float = 0.03, seed: int = 0) -> None:
+        self.latency = latency
+
+        self.requests = 0
+        self.methods: dict[str, int] = {}
+
+        self._random = random.Random(seed)
+        self._message_ids = count(1_000_000)
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post("/bot{token}/{method}", self.call)
+        app.router.add_get("/_stats", self.stats)
+        return app
+
+    async def stats(self, _: web.Request) -> web.Response:
+        return web.json_response(
+            {
+                "requests": self.requests,
+                "methods": self.methods,
+            },
+        )
+
+    async def call(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"]
+        # The handlers send no files, every field is text
+        data = {
+            name: str(value) for name, value in (await request.post()).items()
+        }
+
+        self.requests += 1
+        self.methods[method] = self.methods.get(method, 0) + 1
+
+        if self.latency:
+            await asyncio.sleep(self.latency * self._random.uniform(0.5, 1.5))
+
+        result: object
+        if method == "getMe":
+            result = {
+                "id": 123456,
+                "is_bot": True,
+                "first_name": "Bench",
+                "username": "bench_bot",
+            }
+        elif method in MESSAGE_METHODS:
+            result = {
+                "message_id": int(
+                    data.get("message_id") or next(self._message_ids),
+                ),
+                "date": int(time()),
+                "chat": {"id": int(data["chat_id"]), "type": "private"},
+                "text": data.get("text", ""),
+            }
+        else:
+            result = True
+
+        return web.json_response({"ok": True, "result": result})
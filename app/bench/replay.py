@@ -0,0 +1,144 @@
+import argparse
+import asyncio
+import gzip
+import json
+import logging
+from time import perf_counter
+from typing import Iterator, Optional
+
+from app.application import Application
+from app.bench.runner import (BenchResult, bench_config, drive, process,
+                              report, run)
+from app.bench.servers import (FakeServers, add_server_arguments,
+                               server_options)
+from app.logging import logging_configure
+
+
+def read_recording(path: str) -> Iterator[tuple[float, dict]]:
+    # A recorder that didn't close its last gzip member (killed bot) leaves
+    # a truncated stream, the complete lines before it are still replayed
+    with gzip.open(path, "rt", encoding="utf-8") as recording:
+        lines = iter(recording)
+        while True:
+            try:
+                line = next(lines)
+            except StopIteration:
+                break
+            except EOFError:
+                logging.warning("Recording %s is truncated", path)
+                break
+
+            if not line.endswith("\n") or not line.strip():
+                continue
+
+            record = json.loads(line)
+            yield record["time"], record["update"]
+
+
+def update_kind(update: dict) -> str:
+    if "message" in update:
+        return "message"
+    if "callback_query" in update:
+        data = update["callback_query"].get("data") or ""
+        return data.split(maxsplit=1)[0] if data else "callback"
+    if "inline_query" in update:
+        query = update["inline_query"].get("query", "")
+        command, _, argument = query.partition(" ")
+        if command in ("share", "relations") and argument.isdecimal():
+            return command
+        return "inline_search"
+    return "other"
+
+
+async def replay_timed(
+    application: Application,
+    records: list[tuple[float, dict]],
+    speed: float,
+) -> BenchResult:
+    # Keeps the recorded gaps between updates, divided by `speed`, and
+    # doesn't wait for one update before starting the next, like Telegram
+    result = BenchResult()
+    tasks = []
+
+    first_recorded_at = records[0][0]
+    started_at = perf_counter()
+    for recorded_at, update in records:
+        due = (recorded_at - first_recorded_at) / speed
+        delay = due - (perf_counter() - started_at)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+        tasks.append(
+            asyncio.create_task(
+                process(application, update_kind(update), update, result),
+            ),
+        )
+
+    await asyncio.gather(*tasks)
+    result.duration = perf_counter() - started_at
+    return result
+
+
+def parse_speed(value: str) -> Optional[float]:
+    if value == "max":
+        return None
+
+    speed = float(value.rstrip("x"))
+    if speed <= 0:
+        raise argparse.ArgumentTypeError("speed must be positive")
+    return speed
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog="python -m app.bench.replay",
+        description=(
+            "Replay a recording of updates through the bot's dispatcher "
+            "against local stand-ins for AniList and the Telegram Bot API."
+        ),
+    )
+    parser.add_argument("recording", help="gzip JSONL written by the bot")
+    parser.add_argument(
+        "--speed", type=parse_speed, default=1.0,
+        help="1x keeps the recorded pace, Nx is N times faster, max "
+        "ignores timing and is limited by --concurrency only",
+    )
+    parser.add_argument("--concurrency", type=int, default=32)
+    add_server_arguments(parser)
+    return parser.parse_args()
+
+
+async def main() -> None:
+    args = parse_args()
+
+    logging_configure()
+    logging.getLogger().setLevel(args.log_level)
+
+    records = list(read_recording(args.recording))
+    if not records:
+        print("The recording is empty")
+        return
+
+    async def driver(application: Application) -> BenchResult:
+        if args.speed is None:
+            updates = (
+                (update_kind(update), update) for _, update in records
+            )
+            return await drive(application, updates, args.concurrency)
+        return await replay_timed(application, records, args.speed)
+
+    with FakeServers(server_options(args)) as servers:
+        config = bench_config(
+            anilist_url=servers.anilist_url,
+            telegram_url=servers.telegram_url,
+            requests_per_minute=args.requests_per_minute,
+            batch_window_ms=args.batch_window_ms,
+        )
+        result = await run(config, driver)
+        anilist, telegram = await servers.stats()
+
+    print(report(result, anilist, telegram))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,185 @@
+import asyncio
+from dataclasses import dataclass, field
+from time import perf_counter
+from typing import Awaitable, Callable, Iterable
+
+from aiogram import Bot, Dispatcher, types
+from app.application import Application, create_application
+from app.config_reader import (Anilist, Cache, Config, Logging, Metrics,
+                               Recorder, Scheduler, SearchCache, SendLimits,
+                               Source, TitleIndex, Webhook, Workers)
+from app.config_reader import Bot as BotConfig
+from app.metrics import (PREFETCH_HITS, PREFETCH_WASTED, PREFETCHES,
+                         UPDATES_SHED)
+
+BENCH_TOKEN = "123456:bench-token"
+
+
+def bench_config(
+    anilist_url: str,
+    telegram_url: str,
+    requests_per_minute: int = 60000,
+    batch_window_ms: int = 0,
+) -> Config:
+    return Config(
+        bot=BotConfig(
+            token=BENCH_TOKEN,
+            admin_ids=[],
+            api_url=telegram_url,
+        ),
+        source=Source(url="https://example.com"),
+        anilist=Anilist(
+            url=anilist_url,
+            batch_window_ms=batch_window_ms,
+            batch_size=50,
+            requests_per_minute=requests_per_minute,
+            burst=max(requests_per_minute // 60, 10),
+            prefetch_concurrency=4,
+            prefetch_min_tokens=3,
+        ),
+        cache=Cache(max_size=2048, ttl=600, refresh_ahead=60, path=None),
+        search_cache=SearchCache(max_size=4096, ttl=300, negative_ttl=60),
+        title_index=TitleIndex(path=None),
+        metrics=Metrics(host="127.0.0.1", port=None),
+        recorder=Recorder(path=None),
+        webhook=Webhook(
+            url=None,
+            path="/webhook",
+            host="127.0.0.1",
+            port=8080,
+            secret_token=None,
+        ),
+        scheduler=Scheduler(concurrency=64, queue_size=3),
+        # The fake Bot API has no limits, users of the workload send far
+        # more than one message a second
+        send_limits=SendLimits(
+            messages_per_second=100000,
+            chat_messages_per_minute=100000,
+            group_chat_messages_per_minute=100000,
+            chat_burst=100,
+        ),
+        workers=Workers(count=1),
+        logging=Logging(profile="development", level="INFO", sample_rate=1),
+    )
+
+
+def percentile(values: list[float], q: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(int(q * len(values)), len(values) - 1)]
+
+
+@dataclass
+class BenchResult:
+    duration: float = 0.0
+    latencies: dict[str, list[float]] = field(default_factory=dict)
+    errors: int = 0
+
+    @property
+    def updates(self) -> int:
+        return sum(len(latencies) for latencies in self.latencies.values())
+
+    def all_latencies(self) -> list[float]:
+        return [
+            latency
+            for latencies in self.latencies.values()
+            for latency in latencies
+        ]
+
+
+async def process(
+    application: Application,
+    kind: str,
+    data: dict,
+    result: BenchResult,
+) -> None:
+    update = types.Update(**data)
+
+    started_at = perf_counter()
+    try:
+        await application.dp.process_updates([update])
+    except Exception:
+        result.errors += 1
+    result.latencies.setdefault(kind, []).append(perf_counter() - started_at)
+
+
+async def drive(
+    application: Application,
+    updates: Iterable[tuple[str, dict]],
+    concurrency: int,
+) -> BenchResult:
+    # Feeds updates straight into the dispatcher, like polling does, as
+    # fast as `concurrency` workers can handle them
+    result = BenchResult()
+    updates = iter(updates)
+
+    async def worker() -> None:
+        for kind, data in updates:
+            await process(application, kind, data, result)
+
+    started_at = perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    result.duration = perf_counter() - started_at
+    return result
+
+
+async def run(
+    config: Config,
+    driver: Callable[[Application], Awaitable[BenchResult]],
+) -> BenchResult:
+    application = create_application(config)
+
+    Bot.set_current(application.bot)
+    Dispatcher.set_current(application.dp)
+    try:
+        return await driver(application)
+    finally:
+        await application.close()
+
+
+def report(result: BenchResult, anilist: dict, telegram: dict) -> str:
+    latencies = result.all_latencies()
+    updates = result.updates or 1
+
+    lines = [
+        f"Updates:   {result.updates} in {result.duration:.2f} s, "
+        f"{result.updates / result.duration:.1f} updates/s, "
+        f"{result.errors} errors, "
+        f"{UPDATES_SHED.labels().value:.0f} shed",
+        f"Latency:   p50 {percentile(latencies, 0.5) * 1000:.1f} ms, "
+        f"p95 {percentile(latencies, 0.95) * 1000:.1f} ms, "
+        f"p99 {percentile(latencies, 0.99) * 1000:.1f} ms",
+    ]
+    for kind, kind_latencies in sorted(result.latencies.items()):
+        lines.append(
+            f"  {kind:<14} {len(kind_latencies):>6}  "
+            f"p50 {percentile(kind_latencies, 0.5) * 1000:8.1f} ms  "
+            f"p95 {percentile(kind_latencies, 0.95) * 1000:8.1f} ms  "
+            f"p99 {percentile(kind_latencies, 0.99) * 1000:8.1f} ms"
+        )
+
+    statuses = ", ".join(
+        f"{status}: {number}"
+        for status, number in sorted(anilist["statuses"].items())
+    )
+    methods = ", ".join(
+        f"{method}: {number}"
+        for method, number in sorted(telegram["methods"].items())
+    )
+    prefetches = ", ".join(
+        f"{labels['result']}: {child.value:.0f}"
+        for labels, child in sorted(
+            PREFETCHES.children(), key=lambda item: item[0]["result"],
+        )
+    )
+    lines.extend((
+        f"AniList:   {anilist['requests'] / updates:.2f} calls per update "
+        f"({anilist['requests']}; {statuses or 'none'})",
+        f"Prefetch:  {PREFETCH_HITS.labels().value:.0f} hits, "
+        f"{PREFETCH_WASTED.labels().value:.0f} wasted "
+        f"({prefetches or 'none'})",
+        f"Telegram:  {telegram['requests'] / updates:.2f} calls per update "
+        f"({telegram['requests']}; {methods or 'none'})",
+    ))
+    return "\n".join(lines)
@@ -0,0 +1,131 @@
+import argparse
+import asyncio
+from dataclasses import dataclass
+from multiprocessing import Pipe, Process
+from multiprocessing.connection import Connection
+
+import aiohttp
+from aiohttp import web
+from app.bench.catalog import Catalog
+from app.bench.fake_anilist import FakeAnilist
+from app.bench.fake_telegram import FakeTelegram
+
+
+@dataclass
+class ServerOptions:
+    catalog_size: int = 5000
+    anilist_latency: float = 0.05
+    anilist_error_rate: float = 0
+    anilist_rate_limit_rate: float = 0
+    telegram_latency: float = 0.03
+    seed: int = 0
+
+
+async def _serve(options: ServerOptions, connection: Connection) -> None:
+    catalog = Catalog(size=options.catalog_size, seed=options.seed)
+    anilist = FakeAnilist(
+        catalog,
+        latency=options.anilist_latency,
+        error_rate=options.anilist_error_rate,
+        rate_limit_rate=options.anilist_rate_limit_rate,
+        seed=options.seed,
+    )
+    telegram = FakeTelegram(
+        latency=options.telegram_latency, seed=options.seed,
+    )
+
+    runners = []
+    ports = []
+    for app in (anilist.app(), telegram.app()):
+        runner = web.AppRunner(app, access_log=None)
+        await runner.setup()
+        site = web.TCPSite(runner, host="127.0.0.1", port=0)
+        await site.start()
+
+        runners.append(runner)
+        ports.append(runner.addresses[0][1])
+    connection.send(ports)
+
+    # Block until the parent asks to stop, without blocking the loop
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(None, connection.recv)
+
+    for runner in runners:
+        await runner.cleanup()
+
+
+def _run(options: ServerOptions, connection: Connection) -> None:
+    asyncio.run(_serve(options, connection))
+
+
+class FakeServers:
+    # Runs the fake AniList and Bot API in a child process, so their work
+    # doesn't take event loop time from the bot being measured
+    def __init__(self, options: ServerOptions) -> None:
+        self.options = options
+        self.anilist_url = ""
+        self.telegram_url = ""
+
+        self._connection, child_connection = Pipe()
+        self._process = Process(
+            target=_run,
+            args=(options, child_connection),
+            daemon=True,
+        )
+
+    def __enter__(self) -> "FakeServers":
+        self._process.start()
+        anilist_port, telegram_port = self._connection.recv()
+
+        self.anilist_url = f"http://127.0.0.1:{anilist_port}/"
+        self.telegram_url = f"http://127.0.0.1:{telegram_port}"
+        return self
+
+    def __exit__(self, *_) -> None:
+        self._connection.send(None)
+        self._process.join(timeout=5)
+        if self._process.is_alive():
+            self._process.terminate()
+
+    async def stats(self) -> tuple[dict, dict]:
+        async with aiohttp.ClientSession() as session:
+            async with session.get(f"{self.anilist_url}_stats") as response:
+                anilist = await response.json()
+            async with session.get(f"{self.telegram_url}/_stats") as response:
+                telegram = await response.json()
+        return anilist, telegram
+
+
+def add_server_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--catalog-size", type=int, default=5000)
+    parser.add_argument(
+        "--anilist-latency", type=float, default=50,
+        help="mean AniList latency, ms",
+    )
+    parser.add_argument(
+        "--anilist-error-rate", type=float, default=0,
+        help="share of AniList requests answered with 500",
+    )
+    parser.add_argument(
+        "--anilist-429-rate", type=float, default=0,
+        help="share of AniList requests answered with 429",
+    )
+    parser.add_argument(
+        "--telegram-latency", type=float, default=30,
+        help="mean Bot API latency, ms",
+    )
+    parser.add_argument("--requests-per-minute", type=int, default=60000)
+    parser.add_argument("--batch-window-ms", type=int, default=0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--log-level", default="CRITICAL")
+
+
+def server_options(args: argparse.Namespace) -> ServerOptions:
+    return ServerOptions(
+        catalog_size=args.catalog_size,
+        anilist_latency=args.anilist_latency / 1000,
+        anilist_error_rate=args.anilist_error_rate,
+        anilist_rate_limit_rate=args.anilist_429_rate,
+        telegram_latency=args.telegram_latency / 1000,
+        seed=args.seed,
+    )
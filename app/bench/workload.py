@@ -0,0 +1,142 @@
+import random
+from itertools import count
+from time import time
+from typing import Iterator, Optional
+
+from app.bench.catalog import Catalog
+
+# Relative weights of update kinds, roughly the mix seen in production
+DEFAULT_MIX = {
+    "message": 15,
+    "format": 20,
+    "preview": 30,
+    "share": 10,
+    "relations": 10,
+    "inline_search": 15,
+}
+FORMATS = ("anime", "manga", "everything")
+
+
+class Workload:
+    def __init__(
+        self,
+        catalog: Catalog,
+        users: int = 1000,
+        mix: dict[str, int] = DEFAULT_MIX,
+        seed: int = 0,
+    ) -> None:
+        self.catalog = catalog
+        self.users = users
+        self.mix = mix
+
+        self._random = random.Random(seed)
+        self._update_ids = count(1)
+        self._message_ids = count(1)
+
+        # Popular titles are searched far more often than the rest
+        self._name_weights = [
+            1 / rank for rank in range(1, len(catalog.names) + 1)
+        ]
+
+    def updates(self, number: int) -> Iterator[tuple[str, dict]]:
+        kinds = self._random.choices(
+            tuple(self.mix), weights=tuple(self.mix.values()), k=number,
+        )
+        for kind in kinds:
+            yield kind, getattr(self, kind)()
+
+    def message(self) -> dict:
+        return self._update(message=self._user_message(self._query()))
+
+    def format(self) -> dict:
+        user_message = self._user_message(self._query())
+        return self._update(
+            callback_query=self._callback(
+                f"format {self._random.choice(FORMATS)}",
+                user_message,
+            ),
+        )
+
+    def preview(self) -> dict:
+        title_format = self._random.choice(FORMATS)[0]
+        page = self._random.choices((1, 2, 3, 4, 5, 12), (1, 8, 5, 3, 2, 1))
+        return self._update(
+            callback_query=self._callback(
+                f"preview {title_format} {page[0]} {self._query()}",
+            ),
+        )
+
+    def share(self) -> dict:
+        return self._update(inline_query=self._inline(
+            f"share {self._title_id()}",
+        ))
+
+    def relations(self) -> dict:
+        return self._update(inline_query=self._inline(
+            f"relations {self._title_id()}",
+        ))
+
+    def inline_search(self) -> dict:
+        return self._update(inline_query=self._inline(self._query()))
+
+    def _query(self) -> str:
+        name = self._random.choices(
+            self.catalog.names, weights=self._name_weights,
+        )[0]
+        words = name.split()
+        return " ".join(words[:self._random.randint(1, len(words))])
+
+    def _title_id(self) -> int:
+        return self._random.choices(
+            range(1, len(self.catalog.names) + 1), weights=self._name_weights,
+        )[0]
+
+    def _user(self) -> dict:
+        user_id = self._random.randint(1, self.users)
+        return {"id": user_id, "is_bot": False, "first_name": f"User{user_id}"}
+
+    def _user_message(self, text: str) -> dict:
+        user = self._user()
+        return {
+            "message_id": next(self._message_ids),
+            "date": int(time()),
+            "chat": {"id": user["id"], "type": "private"},
+            "from": user,
+            "text": text,
+        }
+
+    def _callback(
+        self,
+        data: str,
+        user_message: Optional[dict] = None,
+    ) -> dict:
+        if user_message is None:
+            user_message = self._user_message(self._query())
+        user = user_message["from"]
+
+        bot_message = {
+            "message_id": next(self._message_ids),
+            "date": int(time()),
+            "chat": user_message["chat"],
+            "from": {"id": 123456, "is_bot": True, "first_name": "Bench"},
+            "text": "What title format do you want to see?",
+            "reply_to_message": user_message,
+        }
+        return {
+            "id": str(next(self._update_ids)),
+            "from": user,
+            "message": bot_message,
+            "chat_instance": str(user["id"]),
+            "data": data,
+        }
+
+    def _inline(self, query: str) -> dict:
+        return {
+            "id": str(next(self._update_ids)),
+            "from": self._user(),
+            "query": query,
+            "offset": "",
+        }
+
+    def _update(self, **kind: dict) -> dict:
+        return {"update_id": next(self._update_ids), **kind}
@@ -1,27 +1,168 @@
 from os import getenv
+from typing import Optional
 
 from pydantic import BaseModel
 
 
 class Bot(BaseModel):
     token: str
+    admin_ids: list[int]
+    api_url: Optional[str]
 
 
 class Source(BaseModel):
     url: str
 
 
+class Anilist(BaseModel):
+    url: str
+    batch_window_ms: int
+    batch_size: int
+    requests_per_minute: int
+    burst: int
+    prefetch_concurrency: int
+    prefetch_min_tokens: int
+
+
+class Cache(BaseModel):
+    max_size: int
+    ttl: int
+    refresh_ahead: int
+    path: Optional[str]
+
+
+class SearchCache(BaseModel):
+    max_size: int
+    ttl: int
+    negative_ttl: int
+
+
+class TitleIndex(BaseModel):
+    path: Optional[str]
+
+
+class Metrics(BaseModel):
+    host: str
+    port: Optional[int]
+
+
+class Recorder(BaseModel):
+    path: Optional[str]
+
+
+class Webhook(BaseModel):
+    url: Optional[str]
+    path: str
+    host: str
+    port: int
+    secret_token: Optional[str]
+
+
+class Scheduler(BaseModel):
+    concurrency: int
+    queue_size: int
+
+
+class SendLimits(BaseModel):
+    messages_per_second: int
+    chat_messages_per_minute: int
+    group_chat_messages_per_minute: int
+    chat_burst: int
+
+
+class Logging(BaseModel):
+    profile: str
+    level: str
+    sample_rate: float
+
+
+class Workers(BaseModel):
+    count: int
+
+
 class Config(BaseModel):
     bot: Bot
     source: Source
+    anilist: Anilist
+    cache: Cache
+    search_cache: SearchCache
+    title_index: TitleIndex
+    metrics: Metrics
+    recorder: Recorder
+    webhook: Webhook
+    scheduler: Scheduler
+    send_limits: SendLimits
+    workers: Workers
+    logging: Logging
 
 
 def load_config() -> Config:
     return Config(
         bot=Bot(
             token=getenv("BOT_TOKEN"),
+            admin_ids=getenv("ADMIN_IDS", "").replace(",", " ").split(),
+            api_url=getenv("TELEGRAM_API_URL") or None,
         ),
         source=Source(
             url=getenv("SOURCE_URL"),
         ),
+        anilist=Anilist(
+            url=getenv("ANILIST_URL", "https://graphql.anilist.co"),
+            batch_window_ms=getenv("ANILIST_BATCH_WINDOW_MS", 0),
+            batch_size=getenv("ANILIST_BATCH_SIZE", 50),
+            requests_per_minute=getenv("ANILIST_REQUESTS_PER_MINUTE", 90),
+            burst=getenv("ANILIST_BURST", 10),
+            prefetch_concurrency=getenv("ANILIST_PREFETCH_CONCURRENCY", 4),
+            prefetch_min_tokens=getenv("ANILIST_PREFETCH_MIN_TOKENS", 3),
+        ),
+        cache=Cache(
+            max_size=getenv("CACHE_MAX_SIZE", 2048),
+            ttl=getenv("CACHE_TTL", 600),
+            refresh_ahead=getenv("CACHE_REFRESH_AHEAD", 60),
+            path=getenv("CACHE_PATH") or None,
+        ),
+        search_cache=SearchCache(
+            max_size=getenv("SEARCH_CACHE_MAX_SIZE", 4096),
+            ttl=getenv("SEARCH_CACHE_TTL", 300),
+            negative_ttl=getenv("SEARCH_CACHE_NEGATIVE_TTL", 60),
+        ),
+        title_index=TitleIndex(
+            path=getenv("TITLE_INDEX_PATH") or None,
+        ),
+        metrics=Metrics(
+            host=getenv("METRICS_HOST", "127.0.0.1"),
+            port=getenv("METRICS_PORT") or None,
+        ),
+        recorder=Recorder(
+            path=getenv("RECORD_UPDATES_PATH") or None,
+        ),
+        webhook=Webhook(
+            url=getenv("WEBHOOK_URL") or None,
+            path=getenv("WEBHOOK_PATH", "/webhook"),
+            host=getenv("WEBHOOK_HOST", "0.0.0.0"),
+            port=getenv("WEBHOOK_PORT", 8080),
+            secret_token=getenv("WEBHOOK_SECRET_TOKEN") or None,
+        ),
+        scheduler=Scheduler(
+            concurrency=getenv("UPDATES_CONCURRENCY", 64),
+            queue_size=getenv("UPDATES_QUEUE_SIZE", 3),
+        ),
+        send_limits=SendLimits(
+            messages_per_second=getenv("SEND_MESSAGES_PER_SECOND", 30),
+            chat_messages_per_minute=getenv(
+                "SEND_CHAT_MESSAGES_PER_MINUTE", 60,
+            ),
+            group_chat_messages_per_minute=getenv(
+                "SEND_GROUP_CHAT_MESSAGES_PER_MINUTE", 20,
+            ),
+            chat_burst=getenv("SEND_CHAT_BURST", 3),
+        ),
+        workers=Workers(
+            count=getenv("WORKERS", 1),
+        ),
+        logging=Logging(
+            profile=getenv("LOG_PROFILE", "development"),
+            level=getenv("LOG_LEVEL", "INFO"),
+            sample_rate=getenv("LOG_SAMPLE_RATE", 1),
+        ),
     )
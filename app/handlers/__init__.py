@@ -1,4 +1,5 @@
 from app.handlers.funny import register_funny_handlers
 from app.handlers.introduction import register_introduction_handlers
 from app.handlers.source import register_source_handlers
+from app.handlers.stats import register_stats_handlers
 from app.handlers.title import register_title_handlers
@@ -0,0 +1,97 @@
+from aiogram import Dispatcher
+from aiogram.dispatcher.handler import SkipHandler
+from aiogram.types import Message
+from app.config_reader import Config
+from app.metrics import (ANILIST_RATE_LIMITER_QUEUE, ANILIST_REQUEST_LATENCY,
+                         CACHE_HITS, CACHE_MISSES, HANDLER_LATENCY,
+                         PREFETCH_HITS, PREFETCH_WASTED, PREFETCHES,
+                         TELEGRAM_EDITS_COALESCED, TELEGRAM_REQUEST_ERRORS,
+                         TELEGRAM_REQUEST_LATENCY, TELEGRAM_SEND_QUEUE,
+                         UPDATE_ERRORS, UPDATE_LATENCY, UPDATE_QUEUE_TIME,
+                         UPDATES_IN_FLIGHT, UPDATES_QUEUED, UPDATES_SHED,
+                         Histogram)
+
+
+def format_latency(histogram: Histogram, label_name: str) -> list[str]:
+    lines = []
+    for labels, child in sorted(
+        histogram.children(), key=lambda item: -item[1].count,
+    ):
+        if not child.count:
+            continue
+
+        lines.append(
+            f"  {labels[label_name]}: {child.count}, "
+            f"p50 {child.quantile(0.5):.3f}s, "
+            f"p95 {child.quantile(0.95):.3f}s"
+        )
+    return lines or ["  nothing yet"]
+
+
+async def stats_cmd(m: Message, config: Config):
+    if m.from_user.id not in config.bot.admin_ids:
+        raise SkipHandler()
+
+    updates = UPDATE_LATENCY.labels()
+    queue_time = UPDATE_QUEUE_TIME.labels()
+    prefetched = PREFETCHES.labels("loaded").value
+    errors = sum(child.value for _, child in UPDATE_ERRORS.children())
+    telegram_errors = sum(
+        child.value for _, child in TELEGRAM_REQUEST_ERRORS.children()
+    )
+
+    lines = [
+        f"Updates: {updates.count}, in flight "
+        f"{UPDATES_IN_FLIGHT.labels().value:.0f}, errors {errors:.0f}",
+        f"  p50 {updates.quantile(0.5):.3f}s, "
+        f"p95 {updates.quantile(0.95):.3f}s, "
+        f"p99 {updates.quantile(0.99):.3f}s",
+        f"  queued {UPDATES_QUEUED.labels().value:.0f}, "
+        f"shed {UPDATES_SHED.labels().value:.0f}, "
+        f"waited p95 {queue_time.quantile(0.95):.3f}s",
+        "",
+        "Handlers:",
+        *format_latency(HANDLER_LATENCY, "handler"),
+        "",
+        "AniList requests by status:",
+        *format_latency(ANILIST_REQUEST_LATENCY, "status"),
+        "  rate limiter queue: "
+        f"{ANILIST_RATE_LIMITER_QUEUE.labels().value:.0f}",
+        f"  prefetched {prefetched:.0f}, "
+        f"hits {PREFETCH_HITS.labels().value:.0f}, "
+        f"wasted {PREFETCH_WASTED.labels().value:.0f}",
+        "",
+        f"Telegram requests (errors {telegram_errors:.0f}):",
+        *format_latency(TELEGRAM_REQUEST_LATENCY, "method"),
+        f"  send queue: {TELEGRAM_SEND_QUEUE.labels().value:.0f}, "
+        f"edits merged {TELEGRAM_EDITS_COALESCED.labels().value:.0f}",
+        "",
+        "Caches:",
+    ]
+
+    for labels, hits in CACHE_HITS.children():
+        cache = labels["cache"]
+        misses = CACHE_MISSES.labels(cache).value
+        total = hits.value + misses
+        ratio = hits.value / total if total else 0
+
+        lines.append(
+            f"  {cache}: {ratio:.0%} hits "
+            f"({hits.value:.0f} of {total:.0f})"
+        )
+
+    await m.answer(
+        text="\n".join(lines),
+        parse_mode=None,
+        disable_web_page_preview=True,
+        disable_notification=True,
+    )
+
+
+def register_stats_handlers(dp: Dispatcher):
+    dp.register_message_handler(
+        callback=stats_cmd,
+        commands={"stats"},
+        content_types={"text"},
+        state="*",
+    )
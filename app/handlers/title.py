@@ -6,26 +6,63 @@ from aiogram.types import (CallbackQuery, InlineKeyboardButton,
                            Message)
 from aiogram.utils.text_decorations import html_decoration as html
 from app.filters import CorrectId
+from app.middlewares import callback_message_key
 from app.services.title.anilist import AnilistApi
-from app.services.title.anilist.dto import TitleFormat
+from app.services.title.anilist.dto import RequestPriority, TitleFormat
 from app.services.title.anilist.exceptions import ServerError, TitleNotFound
-from app.text_utils.html_formatting import (escape_html_tags,
-                                            escape_html_tags_or_none)
-from app.text_utils.text_checker import all_text_length, utf8_length
+from app.services.title.anilist.schemas import TitlePreviewPage
+from app.text_utils.text_checker import utf8_length
 from app.text_utils.text_formatting import (
-    cut_description, formatting_description, formatting_description_for_inline,
-    formatting_genres, formatting_relation_type_for_inline, formatting_source,
-    formatting_title_format, formatting_title_format_for_inline,
-    formatting_titles, formatting_titles_for_inline)
+    formatting_description_for_inline, formatting_relation_type_for_inline,
+    formatting_title_format_for_inline, formatting_titles_for_inline)
+from app.text_utils.title_card import render_title_card
+from app.utils import LatestTasks, Superseded
 from structlog import get_logger
 from structlog.stdlib import BoundLogger
 
-MAX_TEXT_LENGHT = 4000
 MAX_COUNT_RELATIONS = 18
+INLINE_SEARCH_DELAY = 0.3
 
 logger: BoundLogger = get_logger()
 
 
+def title_preview_keyboard(
+    title_format_small: str,
+    page: int,
+    name: str,
+    title_id: int,
+    has_next_page: bool,
+) -> InlineKeyboardMarkup:
+    navigation_buttons = [
+        InlineKeyboardButton(
+            text="⬅️ Previous",
+            callback_data=f"preview {title_format_small} {page - 1} {name}"
+        ),
+    ]
+    if has_next_page:
+        navigation_buttons.append(
+            InlineKeyboardButton(
+                text="Next ➡️",
+                callback_data=(
+                    f"preview {title_format_small} {page + 1} {name}"
+                ),
+            ),
+        )
+
+    return InlineKeyboardMarkup(row_width=2).row(
+        *navigation_buttons,
+    ).row(
+        InlineKeyboardButton(
+            text="Relations",
+            switch_inline_query_current_chat=f"relations {title_id}",
+        ),
+        InlineKeyboardButton(
+            text="Share",
+            switch_inline_query=f"share {title_id}",
+        ),
+    )
+
+
 async def title_format_cmd(m: Message):
     text = (
         "What title format do you want to see?"
@@ -64,12 +101,35 @@ async def title_preview_cmd(q: CallbackQuery, anilist: AnilistApi):
     elif title_format_pure == "everything":
         title_format = TitleFormat.EVERYTHING
 
-    text = (
-        "Wait one second, please! Searching..."
+    # The button stops spinning at once, whatever the search brings
+    await q.answer(
+        text="Thanks for using the bot!",
+        show_alert=False,
     )
 
     m = q.message.reply_to_message
 
+    page = 1
+    name = m.text
+
+    if utf8_length(name) > 64:
+        text = (
+            "This title name is so long!"
+        )
+
+        await m.reply(
+            text=text,
+            parse_mode=None,
+            disable_web_page_preview=True,
+        )
+        return
+
+    text = (
+        "Wait one second, please! Searching..."
+    )
+
+    # The placeholder becomes the result, which saves deleting it and
+    # sending the result as another message
     wait_msg = await m.reply(
         text=text,
         parse_mode=None,
@@ -77,12 +137,9 @@ async def title_preview_cmd(q: CallbackQuery, anilist: AnilistApi):
         disable_notification=True,
     )
 
-    page = 1
-    name = m.text
-
     try:
-        title = await anilist.title_preview_by_name(
-            name=name, title_format=title_format,
+        title_page = await anilist.title_preview_page_by_name(
+            page=page, name=name, title_format=title_format,
         )
     except TitleNotFound:
         text = (
@@ -94,7 +151,6 @@ async def title_preview_cmd(q: CallbackQuery, anilist: AnilistApi):
             parse_mode=None,
             disable_web_page_preview=True,
         )
-        await q.answer(cache_time=30)
         return
     except ServerError as e:
         logger.exception(
@@ -112,94 +168,31 @@ async def title_preview_cmd(q: CallbackQuery, anilist: AnilistApi):
             parse_mode=None,
             disable_web_page_preview=True,
         )
-        await q.answer(cache_time=10)
         return
 
-    if utf8_length(name) > 64:
-        text = (
-            "This title name is so long!"
-        )
-
-        await wait_msg.edit_text(
-            text=text,
-            parse_mode=None,
-            disable_web_page_preview=True,
-        )
-        await q.answer()
-        return
+    title = title_page.title
 
-    titles = formatting_titles(
-        title.english_name,
-        title.romaji_name,
-        title.native_name,
-    )
-    title_format = formatting_title_format(title.title_format)
-    description = formatting_description(title.description)
-    genres = formatting_genres(title.genres)
-    source = formatting_source(title.url)
-
-    text_length = all_text_length(
-        titles, description,
-        genres, source,
-    )
-
-    if text_length > MAX_TEXT_LENGHT:
-        need_cut_length = text_length - MAX_TEXT_LENGHT
-
-        description = formatting_description(
-            cut_description(
-                escape_html_tags(description, "lxml"),
-                need_cut_length,
-            ),
-        ) + html.bold("... (so long description)")
-
-    text = (
-        "Titles:\n{titles}\n\n"
-        "Format: {title_format}\n\n"
-        "Description: {description}\n\n"
-        "Genres: {genres}\n\n"
-        "{source}"
-    ).format(
-        titles=titles,
-        title_format=title_format,
-        description=description,
-        genres=genres,
-        source=source,
-    )
+    text = render_title_card(title)
 
     title_format_small = title_format_pure[0]
 
-    buttons = [
-        InlineKeyboardButton(
-            text="⬅️ Previous",
-            callback_data=f"preview {title_format_small} {page - 1} {name}"
-        ),
-        InlineKeyboardButton(
-            text="Next ➡️",
-            callback_data=f"preview {title_format_small} {page + 1} {name}"
-        ),
-        InlineKeyboardButton(
-            text="Relations",
-            switch_inline_query_current_chat=f"relations {title.id}",
-        ),
-        InlineKeyboardButton(
-            text="Share",
-            switch_inline_query=f"share {title.id}",
-        ),
-    ]
+    reply_markup = title_preview_keyboard(
+        title_format_small=title_format_small,
+        page=page,
+        name=name,
+        title_id=title.id,
+        has_next_page=title_page.has_next_page,
+    )
 
-    await wait_msg.delete()
-    await m.answer(
+    await wait_msg.edit_text(
         text=text,
         parse_mode="HTML",
         disable_web_page_preview=False,
-        disable_notification=False,
-        reply_markup=InlineKeyboardMarkup(row_width=2).add(*buttons)
-    )
-    await q.answer(
-        text="Thanks for using the bot!",
-        show_alert=False,
+        reply_markup=reply_markup,
     )
+    # "Relations" is a likely next click, the next page is loaded ahead
+    # with the page window
+    anilist.prefetch_title_relations_by_id(title.id)
 
 
 async def title_preview_incorrect_cmd(m: Message):
@@ -217,7 +210,11 @@ async def title_preview_incorrect_cmd(m: Message):
     )
 
 
-async def title_preview_switch_cmd(q: CallbackQuery, anilist: AnilistApi):
+async def title_preview_switch_cmd(
+    q: CallbackQuery,
+    anilist: AnilistApi,
+    message_tasks: LatestTasks,
+):
     _, title_format_small, page, name = q.data.split(maxsplit=3)
     page = int(page)
 
@@ -246,10 +243,23 @@ async def title_preview_switch_cmd(q: CallbackQuery, anilist: AnilistApi):
         )
         return
 
-    try:
-        title = await anilist.title_preview_page_by_name(
+    async def render_page() -> tuple[TitlePreviewPage, str]:
+        title_page = await anilist.title_preview_page_by_name(
             page=page, name=name, title_format=title_format,
         )
+        return title_page, render_title_card(title_page.title)
+
+    m = q.message
+
+    # A newer click on the message cancels this one, together with its
+    # AniList request and rendering
+    try:
+        title_page, text = await message_tasks.run(
+            callback_message_key(q), render_page,
+        )
+    except Superseded:
+        await q.answer()
+        return
     except TitleNotFound:
         text = (
             "Title not found!"
@@ -279,79 +289,24 @@ async def title_preview_switch_cmd(q: CallbackQuery, anilist: AnilistApi):
         )
         return
 
-    titles = formatting_titles(
-        title.english_name,
-        title.romaji_name,
-        title.native_name,
-    )
-    title_format = formatting_title_format(title.title_format)
-    description = formatting_description(
-        escape_html_tags_or_none(title.description, "lxml"),
-    )
-    genres = formatting_genres(title.genres)
-    source = formatting_source(title.url)
+    title = title_page.title
 
-    text_length = all_text_length(
-        titles, description,
-        genres, source,
+    reply_markup = title_preview_keyboard(
+        title_format_small=title_format_small,
+        page=page,
+        name=name,
+        title_id=title.id,
+        has_next_page=title_page.has_next_page,
     )
 
-    if text_length > MAX_TEXT_LENGHT:
-        need_cut_length = text_length - MAX_TEXT_LENGHT
-
-        description = formatting_description(
-            cut_description(
-                escape_html_tags(description, "lxml"),
-                need_cut_length,
-            ),
-        ) + html.bold("... (so long description)")
-
-    text = (
-        "Titles:\n{titles}\n\n"
-        "Format: {title_format}\n\n"
-        "Description: {description}\n\n"
-        "Genres: {genres}\n\n"
-        "{source}"
-    ).format(
-        titles=titles,
-        title_format=title_format,
-        description=description,
-        genres=genres,
-        source=source,
-    )
-
-    m = q.message
-
-    buttons = m.reply_markup.inline_keyboard
-    for row_index, row in enumerate(buttons):
-        for button_index, button in enumerate(row):
-            button_text = button.text.lower()
-
-            if button_text.endswith("previous"):
-                buttons[row_index][button_index].callback_data = (
-                    f"preview {title_format_small} {page - 1} {name}"
-                )
-            elif button_text.startswith("next"):
-                buttons[row_index][button_index].callback_data = (
-                    f"preview {title_format_small} {page + 1} {name}"
-                )
-            elif button_text.startswith("relations"):
-                buttons[row_index][button_index]\
-                    .switch_inline_query_current_chat = (
-                    f"relations {title.id}"
-                )
-            elif button_text.startswith("share"):
-                buttons[row_index][button_index].switch_inline_query = (
-                    f"share {title.id}"
-                )
-
     await m.edit_text(
         text=text,
         parse_mode="HTML",
         disable_web_page_preview=False,
-        reply_markup=InlineKeyboardMarkup(inline_keyboard=buttons),
+        reply_markup=reply_markup,
     )
     await q.answer(cache_time=3)
+    anilist.prefetch_title_relations_by_id(title.id)
 
 
 async def title_share_cmd(q: InlineQuery, anilist: AnilistApi):
@@ -373,51 +328,13 @@ async def title_share_cmd(q: InlineQuery, anilist: AnilistApi):
     if utf8_length(str(title_id)) > 64:
         return
 
-    titles = formatting_titles(
-        title.english_name,
-        title.romaji_name,
-        title.native_name,
-    )
     titles_for_inline = formatting_titles_for_inline(
         title.english_name,
         title.romaji_name,
         title.native_name,
     )
-    title_format = formatting_title_format(title.title_format)
-    description = formatting_description(
-        escape_html_tags_or_none(title.description, "lxml"),
-    )
-    genres = formatting_genres(title.genres)
-    source = formatting_source(title.url)
 
-    text_length = all_text_length(
-        titles, description,
-        genres, source,
-    )
-
-    if text_length > MAX_TEXT_LENGHT:
-        need_cut_length = text_length - MAX_TEXT_LENGHT
-
-        description = formatting_description(
-            cut_description(
-                escape_html_tags(description, "lxml"),
-                need_cut_length,
-            ),
-        ) + html.bold("... (so long description)")
-
-    text = (
-        "Titles:\n{titles}\n\n"
-        "Format: {title_format}\n\n"
-        "Description: {description}\n\n"
-        "Genres: {genres}\n\n"
-        "{source}"
-    ).format(
-        titles=titles,
-        title_format=title_format,
-        description=description,
-        genres=genres,
-        source=source,
-    )
+    text = render_title_card(title)
 
     description_for_inline = formatting_title_format_for_inline(
         title.title_format,
@@ -459,27 +376,21 @@ async def title_relations_cmd(q: InlineQuery, anilist: AnilistApi):
 
         return
 
-    if not relations:
+    offset = int(q.offset) if q.offset.isdecimal() else 0
+    # The relations list is cached, so every page slices the same list
+    # and only the requested slice is rendered
+    relations_page = relations[offset:offset + MAX_COUNT_RELATIONS]
+    if not relations_page:
         return
 
     results = []
-    for title in relations:
-        titles = formatting_titles(
-            title.english_name,
-            title.romaji_name,
-            title.native_name,
-        )
+    for title in relations_page:
         titles_for_inline = formatting_titles_for_inline(
             title.english_name,
             title.romaji_name,
             title.native_name,
         )
 
-        title_format = formatting_title_format(title.title_format)
-
-        description = formatting_description(
-            escape_html_tags_or_none(title.description, "lxml"),
-        )
         description_for_inline = formatting_description_for_inline(
             title_format=formatting_title_format_for_inline(
                 title.title_format,
@@ -489,37 +400,86 @@ async def title_relations_cmd(q: InlineQuery, anilist: AnilistApi):
             ),
         )
 
-        genres = formatting_genres(title.genres)
-        source = formatting_source(title.url)
+        text = render_title_card(title)
 
-        text_length = all_text_length(
-            titles, description,
-            genres, source,
+        preview = InlineQueryResultArticle(
+            id=title.id,
+            title=titles_for_inline,
+            input_message_content=InputTextMessageContent(
+                message_text=text,
+                parse_mode="HTML",
+                disable_web_page_preview=False,
+            ),
+            description=description_for_inline,
+            thumb_url=title.banner_image_url,
         )
 
-        if text_length > MAX_TEXT_LENGHT:
-            need_cut_length = text_length - MAX_TEXT_LENGHT
+        results.append(preview)
 
-            description = formatting_description(
-                cut_description(
-                    escape_html_tags(description, "lxml"),
-                    need_cut_length,
-                ),
-            ) + html.bold("... (so long description)")
+    if offset + MAX_COUNT_RELATIONS < len(relations):
+        next_offset = str(offset + MAX_COUNT_RELATIONS)
+    else:
+        next_offset = ""
 
-        text = (
-            "Titles:\n{titles}\n\n"
-            "Format: {title_format}\n\n"
-            "Description: {description}\n\n"
-            "Genres: {genres}\n\n"
-            "{source}"
-        ).format(
-            titles=titles,
-            title_format=title_format,
-            description=description,
-            genres=genres,
-            source=source,
+    await q.answer(
+        results=results,
+        cache_time=3,
+        is_personal=False,
+        next_offset=next_offset,
+    )
+
+
+async def title_search_inline_cmd(
+    q: InlineQuery,
+    anilist: AnilistApi,
+    inline_searches: LatestTasks,
+):
+    name = q.query.strip()
+    if not name:
+        return
+
+    offset = q.offset
+    page = int(offset) if offset.isdecimal() else 1
+
+    # Wait for the user to stop typing before the first page is searched,
+    # following pages are requested by scrolling and load without delay
+    delay = INLINE_SEARCH_DELAY if page == 1 else 0
+
+    try:
+        title_page = await inline_searches.run(
+            q.from_user.id,
+            lambda: anilist.title_page_by_name(
+                page=page,
+                name=name,
+                priority=RequestPriority.INLINE,
+            ),
+            delay=delay,
         )
+    except Superseded:
+        return
+    except TitleNotFound:
+        return
+    except ServerError as e:
+        logger.exception(
+            "Handling error!",
+            error=e,
+            query=q,
+        )
+        return
+
+    results = []
+    for title in title_page.titles:
+        titles_for_inline = formatting_titles_for_inline(
+            title.english_name,
+            title.romaji_name,
+            title.native_name,
+        )
+
+        description_for_inline = formatting_title_format_for_inline(
+            title.title_format,
+        )
+
+        text = render_title_card(title)
 
         preview = InlineQueryResultArticle(
             id=title.id,
@@ -535,10 +495,16 @@ async def title_relations_cmd(q: InlineQuery, anilist: AnilistApi):
 
         results.append(preview)
 
+    if title_page.has_next_page:
+        next_offset = str(page + 1)
+    else:
+        next_offset = ""
+
     await q.answer(
         results=results,
-        cache_time=3,
+        cache_time=30,
         is_personal=False,
+        next_offset=next_offset,
     )
 
 
@@ -575,3 +541,7 @@ def register_title_handlers(dp: Dispatcher):
         CorrectId(is_correct_id=True),
         state="*",
     )
+    dp.register_inline_handler(
+        title_search_inline_cmd,
+        state="*",
+    )
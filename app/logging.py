@@ -1,15 +1,76 @@
+import atexit
 import logging
+import random
 import sys
+from logging.handlers import QueueHandler, QueueListener
+from queue import SimpleQueue
+from typing import Any, Optional, TextIO
 
 import structlog
+from app.utils import json_dumps
+from structlog.types import EventDict, Processor
 
+DEVELOPMENT = "development"
+PRODUCTION = "production"
+
+_listener: Optional[QueueListener] = None
+_SRCFILE = logging._srcfile
+
+
+class EventSampler:
+    # Keeps a `rate` share of events below warning, the rest are dropped
+    # before they are rendered
+    def __init__(self, rate: float) -> None:
+        self.rate = rate
+
+    def __call__(
+        self,
+        logger: Any,
+        method_name: str,
+        event_dict: EventDict,
+    ) -> EventDict:
+        if method_name in ("debug", "info") and random.random() >= self.rate:
+            raise structlog.DropEvent
+        return event_dict
+
+
+def _json_serializer(obj: Any, **kwargs: Any) -> str:
+    return json_dumps(obj, default=kwargs.get("default"))
+
+
+def _set_root_handler(handler: logging.Handler, level: str) -> None:
+    # Handlers inherited from a parent process or an earlier call are
+    # replaced, a queue handler without its listener would lose records
+    root = logging.getLogger()
+    for old_handler in root.handlers[:]:
+        root.removeHandler(old_handler)
+    root.addHandler(handler)
+    root.setLevel(level)
+
+
+def _stop_listener() -> None:
+    global _listener
+
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def _collect_record_details(enabled: bool) -> None:
+    # Production records don't show the call site, thread or process,
+    # so the logging HOWTO's optimizations skip collecting them
+    logging._srcfile = _SRCFILE if enabled else None
+    logging.logThreads = enabled
+    logging.logProcesses = enabled
+    logging.logMultiprocessing = enabled
+
+
+def _configure_development(level: str, stream: TextIO) -> None:
+    _collect_record_details(True)
+    handler = logging.StreamHandler(stream)
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    _set_root_handler(handler, level)
 
-def logging_configure() -> None:
-    logging.basicConfig(
-        format="%(message)s",
-        level=logging.INFO,
-        stream=sys.stdout,
-    )
     structlog.configure(
         processors=[
             structlog.processors.format_exc_info,
@@ -29,3 +90,59 @@ def logging_configure() -> None:
         logger_factory=structlog.stdlib.LoggerFactory(),
         cache_logger_on_first_use=False,
     )
+
+
+def _configure_production(
+    level: str,
+    sample_rate: float,
+    stream: TextIO,
+) -> None:
+    global _listener
+
+    _collect_record_details(False)
+
+    # Records are written by a separate thread, so a slow stdout never
+    # blocks the event loop
+    queue: SimpleQueue = SimpleQueue()
+    output = logging.StreamHandler(stream)
+    output.setFormatter(logging.Formatter("%(message)s"))
+    _listener = QueueListener(queue, output)
+    _listener.start()
+    _set_root_handler(QueueHandler(queue), level)
+
+    processors: list[Processor] = [structlog.stdlib.filter_by_level]
+    if sample_rate < 1:
+        processors.append(EventSampler(sample_rate))
+    processors.extend((
+        structlog.stdlib.add_logger_name,
+        structlog.stdlib.add_log_level,
+        structlog.processors.TimeStamper(fmt="iso", utc=True),
+        structlog.processors.format_exc_info,
+        structlog.processors.JSONRenderer(serializer=_json_serializer),
+    ))
+
+    structlog.configure(
+        processors=processors,
+        wrapper_class=structlog.stdlib.BoundLogger,
+        logger_factory=structlog.stdlib.LoggerFactory(),
+        cache_logger_on_first_use=True,
+    )
+
+
+def logging_configure(
+    profile: str = DEVELOPMENT,
+    level: str = "INFO",
+    sample_rate: float = 1.0,
+    stream: TextIO = sys.stdout,
+) -> None:
+    _stop_listener()
+
+    if profile == PRODUCTION:
+        _configure_production(level, sample_rate, stream)
+    elif profile == DEVELOPMENT:
+        _configure_development(level, stream)
+    else:
+        raise ValueError(f"Unknown logging profile: {profile}")
+
+
+atexit.register(_stop_listener)
@@ -0,0 +1,18 @@
+from app.metrics.collectors import (ANILIST_RATE_LIMITER_QUEUE,
+                                    ANILIST_REQUEST_LATENCY, CACHE_HITS,
+                                    CACHE_MISSES, HANDLER_LATENCY,
+                                    PREFETCH_HITS, PREFETCH_WASTED,
+                                    PREFETCHES,
+                                    TELEGRAM_EDITS_COALESCED,
+                                    TELEGRAM_REQUEST_ERRORS,
+                                    TELEGRAM_REQUEST_LATENCY,
+                                    TELEGRAM_RETRY_AFTER, TELEGRAM_SEND_QUEUE,
+                                    UPDATE_ERRORS, UPDATE_LATENCY,
+                                    UPDATE_QUEUE_TIME, UPDATES_IN_FLIGHT,
+                                    UPDATES_QUEUED, UPDATES_SHED,
+                                    UPDATES_SUPERSEDED, WORKER_IN_FLIGHT,
+                                    WORKER_PROCESSED, WORKER_UP,
+                                    observe_cache)
+from app.metrics.registry import (REGISTRY, Counter, Gauge, Histogram,
+                                  Registry)
+from app.metrics.server import metrics_app, start_metrics_server
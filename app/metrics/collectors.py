@@ -0,0 +1,125 @@
+from typing import Protocol
+
+from app.metrics.registry import Counter, Gauge, Histogram
+
+
+class HitCounting(Protocol):
+    hits: int
+    misses: int
+
+
+UPDATES_IN_FLIGHT = Gauge(
+    "bot_updates_in_flight",
+    "Updates that are being processed right now",
+)
+UPDATE_LATENCY = Histogram(
+    "bot_update_duration_seconds",
+    "Time spent processing an update",
+)
+UPDATE_ERRORS = Counter(
+    "bot_update_errors_total",
+    "Updates whose handler raised an error",
+    labelnames=("error",),
+)
+UPDATE_QUEUE_TIME = Histogram(
+    "bot_update_queue_seconds",
+    "Time an update waited for a free processing slot",
+)
+UPDATES_QUEUED = Gauge(
+    "bot_updates_queued",
+    "Updates waiting for a free processing slot",
+)
+UPDATES_SHED = Counter(
+    "bot_updates_shed_total",
+    "Updates dropped because their user had too many waiting",
+)
+UPDATES_SUPERSEDED = Counter(
+    "bot_updates_superseded_total",
+    "Clicks dropped because a newer click on the same message came",
+)
+HANDLER_LATENCY = Histogram(
+    "bot_handler_duration_seconds",
+    "Time spent in a handler",
+    labelnames=("handler",),
+)
+
+ANILIST_REQUEST_LATENCY = Histogram(
+    "anilist_request_duration_seconds",
+    "Latency of AniList requests by response status",
+    labelnames=("status",),
+)
+ANILIST_RATE_LIMITER_QUEUE = Gauge(
+    "anilist_rate_limiter_queue_depth",
+    "Requests waiting for an AniList rate limit token",
+)
+
+PREFETCHES = Counter(
+    "anilist_prefetches_total",
+    "Speculative AniList loads by how they ended",
+    labelnames=("result",),
+)
+PREFETCH_HITS = Counter(
+    "anilist_prefetch_hits_total",
+    "Prefetched values that users asked for later",
+)
+PREFETCH_WASTED = Counter(
+    "anilist_prefetch_wasted_total",
+    "Prefetched values that nobody asked for in time",
+)
+
+TELEGRAM_REQUEST_LATENCY = Histogram(
+    "telegram_request_duration_seconds",
+    "Latency of Telegram Bot API calls",
+    labelnames=("method",),
+)
+TELEGRAM_REQUEST_ERRORS = Counter(
+    "telegram_request_errors_total",
+    "Telegram Bot API calls that failed",
+    labelnames=("method", "error"),
+)
+
+TELEGRAM_SEND_QUEUE = Gauge(
+    "telegram_send_queue_depth",
+    "Bot API calls waiting for the chat or global rate limit",
+)
+TELEGRAM_EDITS_COALESCED = Counter(
+    "telegram_edits_coalesced_total",
+    "Message edits merged into a newer edit before being sent",
+)
+TELEGRAM_RETRY_AFTER = Counter(
+    "telegram_retry_after_total",
+    "Bot API calls retried after a flood wait",
+    labelnames=("method",),
+)
+
+WORKER_UP = Gauge(
+    "bot_worker_up",
+    "Whether a worker process is alive and reporting",
+    labelnames=("worker",),
+)
+WORKER_PROCESSED = Gauge(
+    "bot_worker_processed_updates",
+    "Updates processed by a worker process since it started",
+    labelnames=("worker",),
+)
+WORKER_IN_FLIGHT = Gauge(
+    "bot_worker_updates_in_flight",
+    "Updates that a worker process is handling right now",
+    labelnames=("worker",),
+)
+
+CACHE_HITS = Counter(
+    "cache_hits_total",
+    "Cache lookups that found a value",
+    labelnames=("cache",),
+)
+CACHE_MISSES = Counter(
+    "cache_misses_total",
+    "Cache lookups that had to load a value",
+    labelnames=("cache",),
+)
+
+
+def observe_cache(name: str, cache: HitCounting) -> None:
+    CACHE_HITS.labels(name).set_function(lambda: cache.hits)
+    CACHE_MISSES.labels(name).set_function(lambda: cache.misses)
@@ -0,0 +1,230 @@
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from contextlib import contextmanager
+from math import inf
+from time import perf_counter
+from typing import (Any, Callable, Generic, Iterator, Optional, Sequence,
+                    TypeVar, Union)
+
+DEFAULT_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, inf,
+)
+
+Sample = tuple[str, dict[str, str], float]
+
+
+def _format_value(value: float) -> str:
+    if value == inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+def _format_labels(labels: dict[str, str]) -> str:
+    if not labels:
+        return ""
+
+    pairs = []
+    for name, value in labels.items():
+        value = (
+            value.replace("\\", "\\\\")
+            .replace("\n", "\\n")
+            .replace("\"", "\\\"")
+        )
+        pairs.append(f"{name}=\"{value}\"")
+    return "{" + ",".join(pairs) + "}"
+
+
+class Value:
+    def __init__(self) -> None:
+        self._value = 0.0
+        self._function: Optional[Callable[[], float]] = None
+
+    @property
+    def value(self) -> float:
+        if self._function is not None:
+            return self._function()
+        return self._value
+
+    def inc(self, amount: float = 1) -> None:
+        self._value += amount
+
+    def dec(self, amount: float = 1) -> None:
+        self._value -= amount
+
+    def set(self, value: float) -> None:
+        self._value = value
+
+    def set_function(self, function: Callable[[], float]) -> None:
+        self._function = function
+
+    def samples(self, name: str) -> Iterator[Sample]:
+        yield name, {}, self.value
+
+
+class HistogramValue:
+    def __init__(self, buckets: Sequence[float]) -> None:
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    @contextmanager
+    def time(self) -> Iterator[None]:
+        started_at = perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(perf_counter() - started_at)
+
+    def quantile(self, q: float) -> float:
+        # Interpolates inside the bucket like Prometheus' histogram_quantile
+        if not self.count:
+            return 0.0
+
+        rank = q * self.count
+        cumulative = 0
+        lower_bound = 0.0
+        for upper_bound, count in zip(self.buckets, self.counts):
+            if cumulative + count >= rank and count:
+                if upper_bound == inf:
+                    return lower_bound
+                fraction = (rank - cumulative) / count
+                return lower_bound + (upper_bound - lower_bound) * fraction
+            cumulative += count
+            lower_bound = upper_bound
+        return lower_bound
+
+    def samples(self, name: str) -> Iterator[Sample]:
+        cumulative = 0
+        for upper_bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            yield (
+                f"{name}_bucket",
+                {"le": _format_value(upper_bound)},
+                cumulative,
+            )
+        yield f"{name}_count", {}, self.count
+        yield f"{name}_sum", {}, self.sum
+
+
+Child = TypeVar("Child", bound=Union[Value, HistogramValue])
+
+
+class Metric(ABC, Generic[Child]):
+    type = "untyped"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        registry: Optional["Registry"] = None,
+    ) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+        self._children: dict[tuple[str, ...], Child] = {}
+        if not self.labelnames:
+            self._children[()] = self._new_child()
+
+        if registry is None:
+            registry = REGISTRY
+        registry.register(self)
+
+    def labels(self, *values: object) -> Child:
+        if len(values) != len(self.labelnames):
+            raise ValueError(
+                f"{self.name} expects labels {self.labelnames}, "
+                f"got {values}",
+            )
+
+        key = tuple(str(value) for value in values)
+        child = self._children.get(key)
+        if child is None:
+            child = self._children[key] = self._new_child()
+        return child
+
+    def children(self) -> Iterator[tuple[dict[str, str], Child]]:
+        for key, child in list(self._children.items()):
+            yield dict(zip(self.labelnames, key)), child
+
+    def collect(self) -> Iterator[Sample]:
+        for labels, child in self.children():
+            for name, sample_labels, value in child.samples(self.name):
+                yield name, {**labels, **sample_labels}, value
+
+    @abstractmethod
+    def _new_child(self) -> Child:
+        pass
+
+
+class Counter(Metric[Value]):
+    type = "counter"
+
+    def _new_child(self) -> Value:
+        return Value()
+
+
+class Gauge(Metric[Value]):
+    type = "gauge"
+
+    def _new_child(self) -> Value:
+        return Value()
+
+
+class Histogram(Metric[HistogramValue]):
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+        registry: Optional["Registry"] = None,
+    ) -> None:
+        buckets = tuple(sorted(buckets))
+        if buckets[-1] != inf:
+            buckets += (inf,)
+        self.buckets = buckets
+
+        super().__init__(name, documentation, labelnames, registry)
+
+    def _new_child(self) -> HistogramValue:
+        return HistogramValue(self.buckets)
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._metrics: dict[str, Metric[Any]] = {}
+
+    def register(self, metric: Metric[Any]) -> None:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+
+    def get(self, name: str) -> Optional[Metric[Any]]:
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            for name, labels, value in metric.collect():
+                lines.append(
+                    f"{name}{_format_labels(labels)} {_format_value(value)}",
+                )
+        lines.append("")
+        return "\n".join(lines)
+
+
+REGISTRY = Registry()
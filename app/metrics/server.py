@@ -0,0 +1,35 @@
+from aiohttp import web
+from app.metrics.registry import REGISTRY, Registry
+from structlog import get_logger
+from structlog.stdlib import BoundLogger
+
+logger: BoundLogger = get_logger()
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def metrics_app(registry: Registry = REGISTRY) -> web.Application:
+    async def metrics(_: web.Request) -> web.Response:
+        return web.Response(
+            body=registry.render().encode(),
+            headers={"Content-Type": CONTENT_TYPE},
+        )
+
+    app = web.Application()
+    app.router.add_get("/metrics", metrics)
+    return app
+
+
+async def start_metrics_server(
+    host: str,
+    port: int,
+    registry: Registry = REGISTRY,
+) -> web.AppRunner:
+    runner = web.AppRunner(metrics_app(registry), access_log=None)
+    await runner.setup()
+
+    site = web.TCPSite(runner, host=host, port=port)
+    await site.start()
+
+    logger.info("Metrics server started", host=host, port=port)
+    return runner
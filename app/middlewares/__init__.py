@@ -0,0 +1,4 @@
+from app.middlewares.metrics import MetricsMiddleware
+from app.middlewares.recorder import UpdateRecorderMiddleware
+from app.middlewares.scheduler import (SchedulerMiddleware,
+                                       callback_message_key)
@@ -0,0 +1,36 @@
+from time import perf_counter
+
+from aiogram.dispatcher.handler import current_handler
+from aiogram.dispatcher.middlewares import BaseMiddleware
+from app.metrics import (HANDLER_LATENCY, UPDATE_ERRORS, UPDATE_LATENCY,
+                         UPDATES_IN_FLIGHT)
+
+STARTED_AT_KEY = "_metrics_started_at"
+HANDLER_KEY = "_metrics_handler"
+
+
+class MetricsMiddleware(BaseMiddleware):
+    async def trigger(self, action: str, args: tuple) -> None:
+        data = args[-1]
+        if action == "process_update":
+            UPDATES_IN_FLIGHT.labels().inc()
+            data[STARTED_AT_KEY] = perf_counter()
+        elif action == "post_process_update":
+            started_at = data.pop(STARTED_AT_KEY, None)
+            if started_at is not None:
+                UPDATES_IN_FLIGHT.labels().dec()
+                UPDATE_LATENCY.labels().observe(perf_counter() - started_at)
+        elif action == "pre_process_error":
+            _, error, _ = args
+            UPDATE_ERRORS.labels(type(error).__name__).inc()
+        elif action.startswith("process_"):
+            # Called once a handler has passed its filters and is about
+            # to run, the handler is known only at this point
+            data[HANDLER_KEY] = current_handler.get().__name__
+            data[STARTED_AT_KEY] = perf_counter()
+        elif action.startswith("post_process_"):
+            started_at = data.pop(STARTED_AT_KEY, None)
+            if started_at is not None:
+                HANDLER_LATENCY.labels(data.pop(HANDLER_KEY)).observe(
+                    perf_counter() - started_at,
+                )
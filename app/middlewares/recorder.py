@@ -0,0 +1,133 @@
+import gzip
+import json
+import os
+from hashlib import blake2b
+from queue import Empty, SimpleQueue
+from threading import Thread
+from time import monotonic, time
+from typing import Any, Optional
+
+from aiogram.dispatcher.middlewares import BaseMiddleware
+from aiogram.types import Update
+from structlog import get_logger
+from structlog.stdlib import BoundLogger
+
+logger: BoundLogger = get_logger()
+
+USER_KEYS = {
+    "from", "user", "forward_from", "via_bot", "new_chat_member",
+    "left_chat_member",
+}
+CHAT_KEYS = {"chat", "sender_chat", "forward_from_chat"}
+# Content that identifies a person or isn't needed to replay the workload
+DROPPED_KEYS = {
+    "contact", "location", "venue", "photo", "document", "voice", "video",
+    "video_note", "audio", "animation", "sticker", "caption_entities",
+    "entities", "author_signature", "forward_sender_name", "new_chat_members",
+    "new_chat_photo", "new_chat_title", "reply_markup",
+}
+# Every flush writes a complete gzip member, so a killed bot loses only the
+# updates of the last interval and leaves a recording which can be replayed
+FLUSH_INTERVAL = 5.0
+
+
+class UpdateRecorderMiddleware(BaseMiddleware):
+    # Appends anonymized updates to gzip JSONL, one {"time", "update"}
+    # object per line. Users and chats get pseudonymous ids which are stable
+    # within a recording, names and media are dropped and texts are kept,
+    # as they are title searches that shape the workload
+    def __init__(self, path: str) -> None:
+        super().__init__()
+
+        self.path = path
+
+        self._salt = os.urandom(16)
+        self._queue: SimpleQueue[Optional[tuple[float, dict]]] = SimpleQueue()
+        self._writer = Thread(
+            target=self._write, name="update-recorder", daemon=True,
+        )
+        self._writer.start()
+
+    async def on_pre_process_update(self, update: Update, data: dict) -> None:
+        # Serialization and compression happen on the writer thread
+        self._queue.put((time(), update.to_python()))
+
+    def close(self) -> None:
+        self._queue.put(None)
+        self._writer.join()
+
+    def anonymize(self, value: Any, key: Optional[str] = None) -> Any:
+        if isinstance(value, list):
+            return [self.anonymize(item) for item in value]
+        if not isinstance(value, dict):
+            return value
+
+        if key in USER_KEYS:
+            return {
+                "id": self._pseudonym(value["id"]),
+                "is_bot": value.get("is_bot", False),
+                "first_name": "User",
+            }
+        if key in CHAT_KEYS:
+            return {
+                "id": self._pseudonym(value["id"]),
+                "type": value.get("type", "private"),
+            }
+
+        result = {}
+        for name, item in value.items():
+            if name in DROPPED_KEYS:
+                continue
+            if name == "chat_instance":
+                item = str(self._pseudonym(item))
+            result[name] = self.anonymize(item, name)
+        return result
+
+    def _pseudonym(self, value: Any) -> int:
+        digest = blake2b(
+            str(value).encode(), key=self._salt, digest_size=6,
+        ).digest()
+        return int.from_bytes(digest, "big")
+
+    def _write(self) -> None:
+        lines: list[str] = []
+        flush_at = monotonic() + FLUSH_INTERVAL
+        while True:
+            try:
+                record = self._queue.get(
+                    timeout=max(flush_at - monotonic(), 0),
+                )
+            except Empty:
+                pass
+            else:
+                if record is None:
+                    self._flush(lines)
+                    break
+                self._append(lines, record)
+
+            if monotonic() >= flush_at:
+                self._flush(lines)
+                lines.clear()
+                flush_at = monotonic() + FLUSH_INTERVAL
+
+    def _append(self, lines: list[str], record: tuple[float, dict]) -> None:
+        recorded_at, update = record
+        try:
+            update = self.anonymize(update)
+            line = json.dumps(
+                {"time": recorded_at, "update": update}, ensure_ascii=False,
+            )
+        except Exception as e:
+            logger.warning("Update can't be recorded!", error=e)
+            return
+        lines.append(line)
+
+    def _flush(self, lines: list[str]) -> None:
+        if not lines:
+            return
+
+        try:
+            with gzip.open(self.path, "at", encoding="utf-8") as recording:
+                recording.write("\n".join(lines) + "\n")
+        except OSError as e:
+            logger.warning("Updates can't be recorded!", error=e)
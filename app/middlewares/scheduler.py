@@ -0,0 +1,188 @@
+from time import perf_counter
+from typing import Hashable, Optional
+
+from aiogram import types
+from aiogram.dispatcher.handler import CancelHandler
+from aiogram.dispatcher.middlewares import BaseMiddleware
+from aiogram.utils.exceptions import TelegramAPIError
+from app.metrics import (UPDATE_QUEUE_TIME, UPDATES_QUEUED, UPDATES_SHED,
+                         UPDATES_SUPERSEDED)
+from app.utils import FairScheduler, LatestTasks, QueueFull, Superseded
+from structlog import get_logger
+from structlog.stdlib import BoundLogger
+
+logger: BoundLogger = get_logger()
+
+SCHEDULER_KEY = "_scheduler_key"
+INLINE_QUERY_TAG = "inline_query"
+BUSY_TEXT = "Too many requests at once, wait a bit and repeat, please!"
+
+
+def update_scheduler_key(update: types.Update) -> Hashable:
+    # Updates of a user are handled in the order they came and users take
+    # turns, so a busy group chat doesn't hold back its members elsewhere.
+    # Inline queries have a queue per user of their own, where only the
+    # latest query waits
+    message = update.message or update.edited_message
+    if message is not None:
+        if message.from_user is not None:
+            return message.from_user.id
+        # Channel posts and anonymous admins have no user
+        return ("chat", message.chat.id)
+
+    if update.callback_query is not None:
+        return update.callback_query.from_user.id
+
+    if update.inline_query is not None:
+        return ("inline_query", update.inline_query.from_user.id)
+    # Other updates don't wait behind each other
+    return ("update", update.update_id)
+
+
+def callback_message_key(query: types.CallbackQuery) -> Optional[tuple]:
+    # Only the latest click on the buttons of a message matters
+    if query.message is None:
+        return None
+    return (query.message.chat.id, query.message.message_id)
+
+
+class SchedulerMiddleware(BaseMiddleware):
+    # Waits for a slot of the scheduler before an update is handled, and
+    # drops the update if its user has too many waiting. A click on a
+    # message makes older clicks on it stale, whoever made them, like a
+    # new inline query does with older queries of the user: a waiting one
+    # is dropped and the work of a running one in `message_tasks` or
+    # `inline_searches` is cancelled, so edits of a message keep the order
+    # of the clicks
+    def __init__(
+        self,
+        scheduler: FairScheduler,
+        message_tasks: LatestTasks,
+        inline_searches: LatestTasks,
+    ) -> None:
+        super().__init__()
+
+        self.scheduler = scheduler
+        self.message_tasks = message_tasks
+        self.inline_searches = inline_searches
+        # The latest click on every message with clicks in flight
+        self._latest_clicks: dict[tuple, int] = {}
+        UPDATES_QUEUED.labels().set_function(lambda: scheduler.queued)
+
+    async def on_pre_process_update(
+        self,
+        update: types.Update,
+        data: dict,
+    ) -> None:
+        key = update_scheduler_key(update)
+
+        tag: Optional[Hashable] = None
+        if update.callback_query is not None:
+            tag = callback_message_key(update.callback_query)
+            if tag is not None:
+                self.message_tasks.cancel(tag)
+                self._latest_clicks[tag] = update.update_id
+        elif update.inline_query is not None:
+            # The queue of the key holds at most this query, so it's never
+            # shed
+            tag = INLINE_QUERY_TAG
+            self.inline_searches.cancel(update.inline_query.from_user.id)
+
+        started_at = perf_counter()
+        try:
+            await self.scheduler.acquire(key, tag=tag)
+        except QueueFull:
+            self._forget_click(update)
+            UPDATES_SHED.labels().inc()
+            await self._answer_busy(update)
+            raise CancelHandler()
+        except Superseded:
+            self._forget_click(update)
+            UPDATES_SUPERSEDED.labels().inc()
+            await self._answer_superseded(update)
+            raise CancelHandler()
+        UPDATE_QUEUE_TIME.labels().observe(perf_counter() - started_at)
+
+        if self._is_stale_click(update):
+            # Someone else clicked the message while this click waited
+            self.scheduler.release(key)
+            UPDATES_SUPERSEDED.labels().inc()
+            await self._answer_superseded(update)
+            raise CancelHandler()
+
+        data[SCHEDULER_KEY] = key
+
+    async def on_post_process_update(
+        self,
+        update: types.Update,
+        result: list,
+        data: dict,
+    ) -> None:
+        self.scheduler.release(data.pop(SCHEDULER_KEY))
+        self._forget_click(update)
+
+    def _is_stale_click(self, update: types.Update) -> bool:
+        if update.callback_query is None:
+            return False
+
+        tag = callback_message_key(update.callback_query)
+        if tag is None:
+            return False
+        # A newer click which was shed doesn't make this one stale
+        latest = self._latest_clicks.get(tag, update.update_id)
+        return latest != update.update_id
+
+    def _forget_click(self, update: types.Update) -> None:
+        if update.callback_query is None:
+            return
+
+        tag = callback_message_key(update.callback_query)
+        if tag is None:
+            return
+        if self._latest_clicks.get(tag) == update.update_id:
+            del self._latest_clicks[tag]
+
+    @staticmethod
+    async def _answer_superseded(update: types.Update) -> None:
+        # Answers to older inline queries aren't shown anyway
+        if update.callback_query is None:
+            return
+
+        try:
+            await update.callback_query.answer()
+        except TelegramAPIError as e:
+            logger.warning(
+                "Stale click can't be answered!",
+                error=e,
+                update_id=update.update_id,
+            )
+
+    @staticmethod
+    async def _answer_busy(update: types.Update) -> None:
+        # A shed message is dropped silently in a group, where a reply
+        # would be one more message to everybody
+        try:
+            message = update.message
+            if message is not None and message.chat.type == "private":
+                await message.answer(
+                    text=BUSY_TEXT,
+                    parse_mode=None,
+                    disable_notification=True,
+                )
+            elif update.callback_query is not None:
+                await update.callback_query.answer(
+                    text=BUSY_TEXT,
+                    show_alert=False,
+                )
+            elif update.inline_query is not None:
+                await update.inline_query.answer(
+                    results=[],
+                    cache_time=1,
+                    is_personal=True,
+                )
+        except TelegramAPIError as e:
+            logger.warning(
+                "Busy answer can't be sent!",
+                error=e,
+                update_id=update.update_id,
+            )
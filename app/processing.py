@@ -0,0 +1,73 @@
+import asyncio
+
+from aiogram import Bot, Dispatcher, types
+from app.application import Application
+from structlog import get_logger
+from structlog.stdlib import BoundLogger
+
+logger: BoundLogger = get_logger()
+
+
+def update_chat_key(data: dict) -> int:
+    # Updates of a chat are sent to the same worker process
+    message = data.get("message") or data.get("edited_message")
+    if message is not None:
+        return message["chat"]["id"]
+
+    callback_query = data.get("callback_query")
+    if callback_query is not None:
+        message = callback_query.get("message")
+        if message is not None:
+            return message["chat"]["id"]
+        return callback_query["from"]["id"]
+
+    inline_query = data.get("inline_query")
+    if inline_query is not None:
+        return inline_query["from"]["id"]
+    return data["update_id"]
+
+
+class UpdateProcessor:
+    # Handles updates in background tasks. How many run at once and in
+    # which order is up to the scheduler middleware, which keeps updates
+    # of a chat in the order they were fed
+    def __init__(self, application: Application) -> None:
+        self.application = application
+        self.processed = 0
+
+        self._tasks: set[asyncio.Task] = set()
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._tasks)
+
+    def feed(self, data: dict) -> None:
+        task = asyncio.create_task(self._process(data))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def drain(self, timeout: float) -> None:
+        if not self._tasks:
+            return
+
+        logger.info("Waiting for updates in progress", count=len(self._tasks))
+        _, pending = await asyncio.wait(set(self._tasks), timeout=timeout)
+        for task in pending:
+            task.cancel()
+
+    async def _process(self, data: dict) -> None:
+        Bot.set_current(self.application.bot)
+        Dispatcher.set_current(self.application.dp)
+
+        update = types.Update(**data)
+        try:
+            # Unlike process_update, this runs the update middlewares
+            await self.application.dp.process_updates([update])
+        except Exception as e:
+            logger.exception(
+                "Update processing failed!",
+                error=e,
+                update_id=update.update_id,
+            )
+        finally:
+            self.processed += 1
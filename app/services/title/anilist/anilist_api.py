@@ -1,21 +1,132 @@
-from typing import Optional
+import asyncio
+import json
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from math import isnan
+from time import perf_counter
+from typing import Any, Awaitable, Callable, Hashable, Optional
 
-from aiohttp import ClientResponse, ClientSession, ClientTimeout
-from app.services.title.anilist.dto import TitleFormat
-from app.services.title.anilist.exceptions import ServerError, TitleNotFound
-from app.services.title.anilist.schemas import TitlePreview, TitleRelation
+from aiohttp import ClientError, ClientSession, ClientTimeout
+from app.metrics import ANILIST_REQUEST_LATENCY
+from app.services.title.anilist.cache import BaseCache
+from app.services.title.anilist.dto import RequestPriority, TitleFormat
+from app.services.title.anilist.exceptions import (RateLimitExceeded,
+                                                   ServerError, TitleNotFound)
+from app.services.title.anilist.media_batcher import MediaBatcher
+from app.services.title.anilist.prefetcher import Prefetcher
+from app.services.title.anilist.schemas import (TitlePage, TitlePreview,
+                                                TitlePreviewPage,
+                                                TitleRelation)
+from app.services.title.anilist.title_index import TitleIndex
 from app.text_utils.html_formatting import escape_html_tags_or_none
+from app.text_utils.text_formatting import normalize_search_query
+from app.utils import RateLimiter, json_loads
 from structlog import get_logger
 from structlog.stdlib import BoundLogger
 
 logger: BoundLogger = get_logger()
 
+# AniList can't answer right now, the title index may still know the title
+SOURCE_ERRORS = (
+    ServerError, RateLimitExceeded, ClientError, asyncio.TimeoutError,
+)
+DEFAULT_RETRY_AFTER = 60.0
+MAX_RETRY_AFTER = 300.0
+
+
+def parse_retry_after(value: Optional[str]) -> float:
+    # The header holds either seconds or an HTTP date
+    if value is None:
+        return DEFAULT_RETRY_AFTER
+
+    try:
+        seconds = float(value)
+    except ValueError:
+        try:
+            retry_at = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return DEFAULT_RETRY_AFTER
+        if retry_at.tzinfo is None:
+            retry_at = retry_at.replace(tzinfo=timezone.utc)
+        seconds = (retry_at - datetime.now(timezone.utc)).total_seconds()
+
+    if isnan(seconds):
+        return DEFAULT_RETRY_AFTER
+    return min(max(seconds, 0.0), MAX_RETRY_AFTER)
+
+
+def parse_title_preview(media: dict) -> TitlePreview:
+    title = media["title"]
+
+    return TitlePreview(
+        id=media["id"],
+        english_name=escape_html_tags_or_none(title["english"]),
+        romaji_name=escape_html_tags_or_none(title["romaji"]),
+        native_name=escape_html_tags_or_none(title["native"]),
+        title_format=media["format"],
+        url=media["siteUrl"],
+        banner_image_url=media["bannerImage"],
+        description=escape_html_tags_or_none(media["description"]),
+        genres=media["genres"],
+    )
+
+
+def parse_title_relation(edge: dict) -> TitleRelation:
+    node = edge["node"]
+    title = node["title"]
+
+    return TitleRelation(
+        id=node["id"],
+        english_name=escape_html_tags_or_none(title["english"]),
+        romaji_name=escape_html_tags_or_none(title["romaji"]),
+        native_name=escape_html_tags_or_none(title["native"]),
+        title_format=node["format"],
+        url=node["siteUrl"],
+        banner_image_url=node["bannerImage"],
+        description=escape_html_tags_or_none(node["description"]),
+        genres=node["genres"],
+        relation_type=edge["relationType"],
+    )
+
 
 class AnilistApi:
     source_url = "https://graphql.anilist.co"
+    page_window_size = 10
+    page_prefetch_distance = 2
+    rate_limit_retries = 2
+
+    def __init__(
+        self,
+        cache: Optional[BaseCache] = None,
+        search_cache: Optional[BaseCache] = None,
+        batch_window: float = 0,
+        batch_size: int = 50,
+        rate_limiter: Optional[RateLimiter] = None,
+        title_index: Optional[TitleIndex] = None,
+        source_url: Optional[str] = None,
+        prefetcher: Optional[Prefetcher] = None,
+    ) -> None:
+        if source_url is not None:
+            self.source_url = source_url
 
-    def __init__(self) -> None:
         self._session: Optional[ClientSession] = None
+        self._cache = cache
+        self._search_cache = search_cache
+        self.rate_limiter = rate_limiter
+        self.title_index = title_index
+        self.prefetcher = prefetcher
+
+        self._batcher: Optional[MediaBatcher] = None
+        if batch_window > 0:
+            self._batcher = MediaBatcher(
+                load_batch=self._fetch_title_previews_by_ids,
+                window=batch_window,
+                max_size=min(batch_size, 50),
+            )
+
+        self._requests_in_flight: dict[tuple[str, str], asyncio.Task] = {}
+        self._request_waiters: dict[asyncio.Future, int] = {}
+        self._background_tasks: set[asyncio.Task] = set()
 
     def get_new_session(self) -> ClientSession:
         return ClientSession(
@@ -29,34 +140,242 @@ class AnilistApi:
         return self._session
 
     async def close(self) -> None:
+        for task in self._background_tasks:
+            task.cancel()
+
+        if self.prefetcher is not None:
+            self.prefetcher.close()
+
+        if self._batcher is not None:
+            self._batcher.close()
+
         session = self._session
         if session is not None and not session.closed:
             await session.close()
 
+        for cache in (self._cache, self._search_cache):
+            if cache is not None:
+                await cache.close()
+
+        if self.title_index is not None:
+            await self.title_index.close()
+
+    def _run_in_background(self, coro: Awaitable[Any]) -> None:
+        task = asyncio.ensure_future(coro)
+        task.add_done_callback(self._forget_background_task)
+        self._background_tasks.add(task)
+
+    def _forget_background_task(self, task: asyncio.Task) -> None:
+        self._background_tasks.discard(task)
+        if task.cancelled():
+            return
+
+        error = task.exception()
+        if error is not None:
+            logger.warning(
+                "Background request failed!",
+                error=error,
+            )
+
+    def _prefetch(
+        self,
+        cache: Optional[BaseCache],
+        key: Hashable,
+        load: Callable[[], Awaitable[Any]],
+    ) -> None:
+        if self.prefetcher is None:
+            self._run_in_background(load())
+        else:
+            self.prefetcher.prefetch(key, cache, load)
+
+    def _mark_used(self, key: Hashable, priority: RequestPriority) -> None:
+        if self.prefetcher is None:
+            return
+        if priority != RequestPriority.BACKGROUND:
+            self.prefetcher.used(key)
+
+    async def _cached(
+        self,
+        key: Hashable,
+        loader: Callable[[RequestPriority], Awaitable[Any]],
+        priority: RequestPriority,
+    ) -> Any:
+        self._mark_used(key, priority)
+        if self._cache is None:
+            return await loader(priority)
+        return await self._cache.get_or_load(
+            key,
+            lambda: loader(priority),
+            refresh_loader=lambda: loader(RequestPriority.BACKGROUND),
+        )
+
+    async def _search_cached(
+        self,
+        key: Hashable,
+        loader: Callable[[RequestPriority], Awaitable[Any]],
+        priority: RequestPriority,
+    ) -> Any:
+        self._mark_used(key, priority)
+        if self._search_cache is None:
+            return await loader(priority)
+
+        async def loader_or_none(priority: RequestPriority) -> Any:
+            try:
+                return await loader(priority)
+            except TitleNotFound:
+                return None
+
+        result = await self._search_cache.get_or_load(
+            key,
+            lambda: loader_or_none(priority),
+            refresh_loader=lambda: loader_or_none(RequestPriority.BACKGROUND),
+        )
+        if result is None:
+            raise TitleNotFound("Title not found!")
+        return result
+
     async def send_request_to_source(
         self,
         query: str,
         variables: dict,
-    ) -> ClientResponse:
-        response = await self.session.post(
-            url=self.source_url,
-            json={
-                "query": query,
-                "variables": variables,
-            },
-        )
-        if response.status >= 500:
-            raise ServerError(await response.text())
-        return response
+        priority: RequestPriority = RequestPriority.INTERACTIVE,
+    ) -> tuple[int, dict]:
+        key = (query, json.dumps(variables, sort_keys=True))
 
-    async def title_preview_by_name(
+        request = self._requests_in_flight.get(key)
+        if request is None:
+            request = asyncio.ensure_future(
+                self._post_to_source(query, variables, priority),
+            )
+            request.add_done_callback(
+                lambda future: self._forget_request(key, future),
+            )
+            self._requests_in_flight[key] = request
+        elif self.rate_limiter is not None:
+            # A user joining a prefetch or a cache refresh must not wait
+            # at its background priority
+            self.rate_limiter.raise_priority(request, priority)
+
+        waiters = self._request_waiters
+        waiters[request] = waiters.get(request, 0) + 1
+        try:
+            status, body = await asyncio.shield(request)
+        finally:
+            count = waiters.pop(request) - 1
+            if count:
+                waiters[request] = count
+            elif not request.done():
+                # Every caller has gone away, so don't spend a rate limit
+                # token on an answer nobody reads. The cancelled request
+                # is forgotten at once, so a new caller doesn't join it
+                request.cancel()
+                if self._requests_in_flight.get(key) is request:
+                    del self._requests_in_flight[key]
+        # Waiters of a shared request share the body and decode their own
+        # copy of it, which is cheaper than a deep copy of the result
+        return status, json_loads(body)
+
+    def _forget_request(self, key: tuple[str, str], request: asyncio.Future):
+        if self._requests_in_flight.get(key) is request:
+            del self._requests_in_flight[key]
+        if not request.cancelled():
+            # Mark the error as retrieved if every waiter has gone away
+            request.exception()
+
+    async def _post_to_source(
         self,
-        name: str,
+        query: str,
+        variables: dict,
+        priority: RequestPriority,
+    ) -> tuple[int, bytes]:
+        for attempt in range(self.rate_limit_retries + 1):
+            if self.rate_limiter is not None:
+                await self.rate_limiter.acquire(priority)
+
+            started_at = perf_counter()
+            status = "error"
+            try:
+                async with self.session.post(
+                    url=self.source_url,
+                    json={
+                        "query": query,
+                        "variables": variables,
+                    },
+                ) as response:
+                    status = str(response.status)
+
+                    if response.status == 429:
+                        retry_after = parse_retry_after(
+                            response.headers.get("Retry-After"),
+                        )
+                        logger.warning(
+                            "Source rate limit exceeded!",
+                            retry_after=retry_after,
+                            attempt=attempt,
+                        )
+
+                        if self.rate_limiter is None:
+                            break
+                        self.rate_limiter.pause(retry_after)
+                        continue
+
+                    if response.status >= 500:
+                        raise ServerError(await response.text())
+                    return response.status, await response.read()
+            finally:
+                ANILIST_REQUEST_LATENCY.labels(status).observe(
+                    perf_counter() - started_at,
+                )
+
+        raise RateLimitExceeded("Source rate limit exceeded!")
+
+    async def title_preview_by_id(
+        self,
+        title_id: int,
         title_format: Optional[TitleFormat] = TitleFormat.EVERYTHING,
+        priority: RequestPriority = RequestPriority.INLINE,
+    ) -> TitlePreview:
+        fetch: Callable[
+            [int, TitleFormat, RequestPriority], Awaitable[TitlePreview],
+        ]
+        if self._batcher is not None:
+            fetch = self._batcher.load
+        else:
+            fetch = self._fetch_title_preview_by_id
+
+        async def load(priority: RequestPriority) -> TitlePreview:
+            # The index isn't kept up to date, so it's read only when
+            # AniList is unavailable
+            try:
+                return await fetch(title_id, title_format, priority)
+            except SOURCE_ERRORS as e:
+                if self.title_index is None:
+                    raise
+                title = await self.title_index.get(title_id, title_format)
+                if title is None:
+                    raise
+                logger.warning(
+                    "Title is loaded from the index!",
+                    title_id=title_id,
+                    error=e,
+                )
+                return title
+
+        return await self._cached(
+            ("title_preview_by_id", title_id, title_format),
+            load,
+            priority,
+        )
+
+    async def _fetch_title_preview_by_id(
+        self,
+        title_id: int,
+        title_format: TitleFormat,
+        priority: RequestPriority,
     ) -> TitlePreview:
         query = """
-        query ($search: String) {
-            Media(search: $search, %s) {
+        query ($id: Int) {
+            Media(id: $id, %s) {
                 id
                 title {
                     english
@@ -72,93 +391,149 @@ class AnilistApi:
         }
         """ % title_format.value
         variables = {
-            "search": name,
+            "id": title_id,
         }
 
-        response = await self.send_request_to_source(
-            query=query, variables=variables,
+        status, result = await self.send_request_to_source(
+            query=query, variables=variables, priority=priority,
         )
-        if response.status == 404:
+        if status == 404:
             raise TitleNotFound(
                 "Title with this name not found!"
             )
 
-        result = await response.json()
-
-        data = result["data"]["Media"]
-        title = data["title"]
-
-        return TitlePreview(
-            id=data["id"],
-            english_name=escape_html_tags_or_none(title["english"]),
-            romaji_name=escape_html_tags_or_none(title["romaji"]),
-            native_name=escape_html_tags_or_none(title["native"]),
-            title_format=data["format"],
-            url=data["siteUrl"],
-            banner_image_url=data["bannerImage"],
-            description=escape_html_tags_or_none(data["description"]),
-            genres=data["genres"],
-        )
+        return parse_title_preview(result["data"]["Media"])
 
-    async def title_preview_by_id(
+    async def _fetch_title_previews_by_ids(
         self,
-        title_id: int,
-        title_format: Optional[TitleFormat] = TitleFormat.EVERYTHING,
-    ) -> TitlePreview:
+        title_ids: list[int],
+        title_format: TitleFormat,
+        priority: RequestPriority,
+    ) -> dict[int, TitlePreview]:
         query = """
-        query ($id: Int) {
-            Media(id: $id, %s) {
-                title {
-                    english
-                    romaji
-                    native
+        query ($ids: [Int], $perPage: Int) {
+            Page(perPage: $perPage) {
+                media(id_in: $ids, %s) {
+                    id
+                    title {
+                        english
+                        romaji
+                        native
+                    }
+                    format
+                    siteUrl
+                    bannerImage
+                    description
+                    genres
                 }
-                format
-                siteUrl
-                bannerImage
-                description
-                genres
             }
         }
         """ % title_format.value
         variables = {
-            "id": title_id,
+            "ids": title_ids,
+            "perPage": len(title_ids),
         }
 
-        response = await self.send_request_to_source(
-            query=query, variables=variables,
+        _, result = await self.send_request_to_source(
+            query=query, variables=variables, priority=priority,
         )
-        if response.status == 404:
-            raise TitleNotFound(
-                "Title with this name not found!"
-            )
 
-        result = await response.json()
-
-        data = result["data"]["Media"]
-        title = data["title"]
-
-        return TitlePreview(
-            id=title_id,
-            english_name=escape_html_tags_or_none(title["english"]),
-            romaji_name=escape_html_tags_or_none(title["romaji"]),
-            native_name=escape_html_tags_or_none(title["native"]),
-            title_format=data["format"],
-            url=data["siteUrl"],
-            banner_image_url=data["bannerImage"],
-            description=escape_html_tags_or_none(data["description"]),
-            genres=data["genres"],
-        )
+        return {
+            media["id"]: parse_title_preview(media)
+            for media in result["data"]["Page"]["media"]
+        }
 
     async def title_preview_page_by_name(
         self,
         page: int,
         name: str,
         title_format: Optional[TitleFormat] = TitleFormat.EVERYTHING,
-    ) -> TitlePreview:
+        priority: RequestPriority = RequestPriority.INTERACTIVE,
+    ) -> TitlePreviewPage:
+        window, index = divmod(page - 1, self.page_window_size)
+
+        title_page = await self.title_page_by_name(
+            page=window + 1,
+            name=name,
+            title_format=title_format,
+            priority=priority,
+        )
+        if index >= len(title_page.titles):
+            raise TitleNotFound("Title not found!")
+
+        need_prefetch = (
+            index >= self.page_window_size - self.page_prefetch_distance
+        )
+        if need_prefetch and title_page.has_next_page:
+            self.prefetch_title_page_by_name(window + 2, name, title_format)
+
+        has_next_page = index + 1 < len(title_page.titles)
+
+        return TitlePreviewPage(
+            title=title_page.titles[index],
+            page=page,
+            has_next_page=has_next_page or title_page.has_next_page,
+        )
+
+    def prefetch_title_page_by_name(
+        self,
+        page: int,
+        name: str,
+        title_format: Optional[TitleFormat] = TitleFormat.EVERYTHING,
+    ) -> None:
+        name = normalize_search_query(name)
+
+        self._prefetch(
+            self._search_cache,
+            ("title_page_by_name", name, title_format, page),
+            lambda: self.title_page_by_name(
+                page=page,
+                name=name,
+                title_format=title_format,
+                priority=RequestPriority.BACKGROUND,
+            ),
+        )
+
+    async def title_page_by_name(
+        self,
+        page: int,
+        name: str,
+        title_format: Optional[TitleFormat] = TitleFormat.EVERYTHING,
+        priority: RequestPriority = RequestPriority.INTERACTIVE,
+    ) -> TitlePage:
+        name = normalize_search_query(name)
+
+        return await self._search_cached(
+            ("title_page_by_name", name, title_format, page),
+            lambda priority: self._fetch_title_page_by_name(
+                page, name, title_format, priority,
+            ),
+            priority,
+        )
+
+    async def _fetch_title_page_by_name(
+        self,
+        page: int,
+        name: str,
+        title_format: TitleFormat,
+        priority: RequestPriority,
+    ) -> TitlePage:
+        if self.title_index is not None:
+            local_page = await self._search_title_index(
+                self.title_index, page, name, title_format,
+            )
+            if local_page is not None:
+                return await self._refresh_title_page(
+                    local_page, title_format, priority,
+                )
+
         query = """
-        query ($page: Int, $search: String) {
-            Page(page: $page, perPage: 1) {
+        query ($page: Int, $perPage: Int, $search: String) {
+            Page(page: $page, perPage: $perPage) {
+                pageInfo {
+                    total
+                    hasNextPage
+                }
                 media(search: $search, %s) {
                     id
                     title {
@@ -177,35 +552,117 @@ class AnilistApi:
         """ % title_format.value
         variables = {
             "page": page,
+            "perPage": self.page_window_size,
             "search": name,
         }
 
-        response = await self.send_request_to_source(
-            query=query, variables=variables,
+        _, result = await self.send_request_to_source(
+            query=query, variables=variables, priority=priority,
         )
 
-        result = await response.json()
+        data = result["data"]["Page"]
+        page_info = data["pageInfo"]
+        # Raised before the cache, so a search without results is kept
+        # only for the short negative ttl
+        if page == 1 and not data["media"]:
+            raise TitleNotFound("Title with this name not found!")
 
-        data = result["data"]["Page"]["media"]
-        if not data:
-            raise TitleNotFound("Title not found!")
-        else:
-            data = data[0]
-        title = data["title"]
-
-        return TitlePreview(
-            id=data["id"],
-            english_name=escape_html_tags_or_none(title["english"]),
-            romaji_name=escape_html_tags_or_none(title["romaji"]),
-            native_name=escape_html_tags_or_none(title["native"]),
-            title_format=data["format"],
-            url=data["siteUrl"],
-            banner_image_url=data["bannerImage"],
-            description=escape_html_tags_or_none(data["description"]),
-            genres=data["genres"],
+        return TitlePage(
+            titles=[parse_title_preview(media) for media in data["media"]],
+            page=page,
+            total=page_info["total"] or 0,
+            has_next_page=page_info["hasNextPage"] or False,
         )
 
-    async def title_relations_by_id(self, id: int) -> list[TitleRelation]:
+    async def _refresh_title_page(
+        self,
+        local_page: TitlePage,
+        title_format: TitleFormat,
+        priority: RequestPriority,
+    ) -> TitlePage:
+        # The index only ranks the titles, their details come from AniList
+        # unless it's unavailable
+        ids = [title.id for title in local_page.titles]
+        if not ids:
+            return local_page
+
+        try:
+            titles = await self._fetch_title_previews_by_ids(
+                ids, title_format, priority,
+            )
+        except SOURCE_ERRORS as e:
+            logger.warning(
+                "Titles of a search are loaded from the index!",
+                error=e,
+            )
+            return local_page
+
+        if local_page.page == 1 and not titles:
+            raise TitleNotFound("Title with this name not found!")
+
+        return TitlePage(
+            titles=[titles[id] for id in ids if id in titles],
+            page=local_page.page,
+            total=local_page.total,
+            has_next_page=local_page.has_next_page,
+        )
+
+    async def _search_title_index(
+        self,
+        title_index: TitleIndex,
+        page: int,
+        name: str,
+        title_format: TitleFormat,
+    ) -> Optional[TitlePage]:
+        offset = (page - 1) * self.page_window_size
+        titles = await title_index.search(
+            name,
+            title_format,
+            limit=self.page_window_size + 1,
+            offset=offset,
+        )
+
+        # Once the first window came from the index, later windows must
+        # come from it too, or the order would change between pages
+        if not titles:
+            if page == 1:
+                return None
+            if not await title_index.search(name, title_format):
+                return None
+
+        has_next_page = len(titles) > self.page_window_size
+        return TitlePage(
+            titles=titles[:self.page_window_size],
+            page=page,
+            total=offset + len(titles),
+            has_next_page=has_next_page,
+        )
+
+    def prefetch_title_relations_by_id(self, id: int) -> None:
+        self._prefetch(
+            self._cache,
+            ("title_relations_by_id", id, TitleFormat.EVERYTHING),
+            lambda: self.title_relations_by_id(
+                id, priority=RequestPriority.BACKGROUND,
+            ),
+        )
+
+    async def title_relations_by_id(
+        self,
+        id: int,
+        priority: RequestPriority = RequestPriority.INLINE,
+    ) -> list[TitleRelation]:
+        return await self._cached(
+            ("title_relations_by_id", id, TitleFormat.EVERYTHING),
+            lambda priority: self._fetch_title_relations_by_id(id, priority),
+            priority,
+        )
+
+    async def _fetch_title_relations_by_id(
+        self,
+        id: int,
+        priority: RequestPriority,
+    ) -> list[TitleRelation]:
         query = """
         query ($id: Int) {
             Media(id: $id) {
@@ -234,37 +691,13 @@ class AnilistApi:
             "id": id,
         }
 
-        response = await self.send_request_to_source(
-            query=query, variables=variables,
+        status, result = await self.send_request_to_source(
+            query=query, variables=variables, priority=priority,
         )
-        if response.status == 404:
+        if status == 404:
             raise TitleNotFound(
                 "Title with this id not found!"
             )
 
-        result = await response.json()
-
-        data = result["data"]["Media"]
-        relations = data["relations"]
-        edges = relations["edges"]
-
-        relations = []
-        for edge in edges:
-            node = edge["node"]
-            title = node["title"]
-
-            relations.append(
-                TitleRelation(
-                    id=node["id"],
-                    english_name=escape_html_tags_or_none(title["english"]),
-                    romaji_name=escape_html_tags_or_none(title["romaji"]),
-                    native_name=escape_html_tags_or_none(title["native"]),
-                    title_format=node["format"],
-                    url=node["siteUrl"],
-                    banner_image_url=node["bannerImage"],
-                    description=node["description"],
-                    genres=node["genres"],
-                    relation_type=edge["relationType"],
-                ),
-            )
-        return relations
+        edges = result["data"]["Media"]["relations"]["edges"]
+        return [parse_title_relation(edge) for edge in edges]
@@ -0,0 +1,4 @@
+from app.services.title.anilist.cache.base import BaseCache, CacheEntry
+from app.services.title.anilist.cache.memory import MemoryCache
+from app.services.title.anilist.cache.sqlite import SqliteCache
+from app.services.title.anilist.cache.tiered import TieredCache
@@ -0,0 +1,109 @@
+import asyncio
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from time import time
+from typing import Any, Awaitable, Callable, Hashable, Optional
+
+from structlog import get_logger
+from structlog.stdlib import BoundLogger
+
+logger: BoundLogger = get_logger()
+
+
+@dataclass
+class CacheEntry:
+    value: Any
+    expires_at: float
+    hits: int = 0
+
+    def expired(self, now: float) -> bool:
+        return self.expires_at <= now
+
+
+class BaseCache(ABC):
+    def __init__(
+        self,
+        ttl: float,
+        negative_ttl: float = 0,
+        refresh_ahead: float = 0,
+    ) -> None:
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.refresh_ahead = refresh_ahead
+        self.hits = 0
+        self.misses = 0
+
+        self._refreshing: dict[Hashable, asyncio.Task] = {}
+
+    @abstractmethod
+    async def get(self, key: Hashable) -> Optional[CacheEntry]:
+        ...
+
+    @abstractmethod
+    async def set(
+        self,
+        key: Hashable,
+        value: Any,
+        ttl: Optional[float] = None,
+    ) -> None:
+        ...
+
+    async def close(self) -> None:
+        for task in self._refreshing.values():
+            task.cancel()
+        self._refreshing.clear()
+
+    async def get_or_load(
+        self,
+        key: Hashable,
+        loader: Callable[[], Awaitable[Any]],
+        ttl: Optional[float] = None,
+        refresh_loader: Optional[Callable[[], Awaitable[Any]]] = None,
+    ) -> Any:
+        entry = await self.get(key)
+        if entry is None:
+            self.misses += 1
+
+            value = await loader()
+            await self._store(key, value, ttl)
+            return value
+
+        self.hits += 1
+
+        time_left = entry.expires_at - time()
+        need_refresh = 0 < time_left <= self.refresh_ahead
+        if need_refresh and key not in self._refreshing:
+            self._refreshing[key] = asyncio.create_task(
+                self._refresh(key, refresh_loader or loader, ttl),
+            )
+        return entry.value
+
+    async def _store(
+        self,
+        key: Hashable,
+        value: Any,
+        ttl: Optional[float],
+    ) -> None:
+        if value is None:
+            if not self.negative_ttl:
+                return
+            ttl = self.negative_ttl
+        await self.set(key, value, ttl)
+
+    async def _refresh(
+        self,
+        key: Hashable,
+        loader: Callable[[], Awaitable[Any]],
+        ttl: Optional[float],
+    ) -> None:
+        try:
+            value = await loader()
+            await self._store(key, value, ttl)
+        except Exception as e:
+            logger.warning(
+                "Cache entry refresh failed!",
+                key=key,
+                error=e,
+            )
+        finally:
+            self._refreshing.pop(key, None)
@@ -0,0 +1,58 @@
+from collections import OrderedDict
+from time import time
+from typing import Any, Hashable, Optional
+
+from app.services.title.anilist.cache.base import BaseCache, CacheEntry
+
+
+class MemoryCache(BaseCache):
+    def __init__(
+        self,
+        max_size: int,
+        ttl: float,
+        negative_ttl: float = 0,
+        refresh_ahead: float = 0,
+    ) -> None:
+        super().__init__(
+            ttl=ttl,
+            negative_ttl=negative_ttl,
+            refresh_ahead=refresh_ahead,
+        )
+
+        self.max_size = max_size
+
+        self._entries: OrderedDict[Hashable, CacheEntry] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    async def get(self, key: Hashable) -> Optional[CacheEntry]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        if entry.expired(time()):
+            del self._entries[key]
+            return None
+
+        entry.hits += 1
+        self._entries.move_to_end(key)
+        return entry
+
+    async def set(
+        self,
+        key: Hashable,
+        value: Any,
+        ttl: Optional[float] = None,
+    ) -> None:
+        if ttl is None:
+            ttl = self.ttl
+
+        self._entries[key] = CacheEntry(
+            value=value,
+            expires_at=time() + ttl,
+        )
+        self._entries.move_to_end(key)
+
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
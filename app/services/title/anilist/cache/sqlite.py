@@ -0,0 +1,171 @@
+import asyncio
+import pickle
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from time import time
+from typing import Any, Hashable, Optional
+
+from app.services.title.anilist.cache.base import BaseCache, CacheEntry
+from structlog import get_logger
+from structlog.stdlib import BoundLogger
+
+logger: BoundLogger = get_logger()
+
+
+class SqliteCache(BaseCache):
+    def __init__(
+        self,
+        path: str,
+        table: str,
+        ttl: float,
+        negative_ttl: float = 0,
+        refresh_ahead: float = 0,
+        write_delay: float = 1,
+    ) -> None:
+        super().__init__(
+            ttl=ttl,
+            negative_ttl=negative_ttl,
+            refresh_ahead=refresh_ahead,
+        )
+
+        self.path = path
+        self.table = table
+        self.write_delay = write_delay
+
+        # sqlite3 connections must stay on the thread that created them
+        self._executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix=f"sqlite-cache-{table}",
+        )
+        self._connection: Optional[sqlite3.Connection] = None
+        self._pending: dict[str, tuple[bytes, float]] = {}
+        self._pending_values: dict[str, CacheEntry] = {}
+        self._flush_task: Optional[asyncio.Task] = None
+
+    async def get(self, key: Hashable) -> Optional[CacheEntry]:
+        raw_key = repr(key)
+
+        entry = self._pending_values.get(raw_key)
+        if entry is None:
+            entry = await self._run(self._get_sync, raw_key)
+        if entry is None or entry.expired(time()):
+            return None
+        return entry
+
+    async def set(
+        self,
+        key: Hashable,
+        value: Any,
+        ttl: Optional[float] = None,
+    ) -> None:
+        if ttl is None:
+            ttl = self.ttl
+
+        raw_key = repr(key)
+        expires_at = time() + ttl
+
+        self._pending[raw_key] = (pickle.dumps(value), expires_at)
+        self._pending_values[raw_key] = CacheEntry(
+            value=value,
+            expires_at=expires_at,
+        )
+
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_later())
+
+    async def close(self) -> None:
+        await super().close()
+
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+        await self._flush()
+
+        if self._connection is not None:
+            await self._run(self._connection.close)
+            self._connection = None
+        self._executor.shutdown(wait=True)
+
+    async def _run(self, func, *args) -> Any:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, func, *args)
+
+    async def _flush_later(self) -> None:
+        await asyncio.sleep(self.write_delay)
+        await self._flush()
+
+    async def _flush(self) -> None:
+        if not self._pending:
+            return
+
+        rows = [
+            (raw_key, value, expires_at)
+            for raw_key, (value, expires_at) in self._pending.items()
+        ]
+        self._pending = {}
+
+        try:
+            await self._run(self._set_many_sync, rows)
+        except sqlite3.Error as e:
+            logger.warning(
+                "Cache entries are not saved!",
+                error=e,
+                count=len(rows),
+            )
+        finally:
+            for raw_key, _, _ in rows:
+                if raw_key not in self._pending:
+                    self._pending_values.pop(raw_key, None)
+
+    def _connect_sync(self) -> sqlite3.Connection:
+        if self._connection is not None:
+            return self._connection
+
+        connection = sqlite3.connect(self.path, check_same_thread=False)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.execute(
+            f"CREATE TABLE IF NOT EXISTS {self.table} ("
+            "key TEXT PRIMARY KEY, value BLOB NOT NULL, "
+            "expires_at REAL NOT NULL)"
+        )
+        connection.execute(
+            f"DELETE FROM {self.table} WHERE expires_at <= ?", (time(),),
+        )
+        connection.commit()
+
+        self._connection = connection
+        return connection
+
+    def _get_sync(self, raw_key: str) -> Optional[CacheEntry]:
+        row = self._connect_sync().execute(
+            f"SELECT value, expires_at FROM {self.table} WHERE key = ?",
+            (raw_key,),
+        ).fetchone()
+        if row is None:
+            return None
+
+        value, expires_at = row
+        try:
+            value = pickle.loads(value)
+        except Exception as e:
+            # Entries written by an older version of a schema class are
+            # treated as missing and overwritten on the next load
+            logger.warning(
+                "Cache entry can't be read!",
+                error=e,
+                key=raw_key,
+            )
+            return None
+
+        return CacheEntry(
+            value=value,
+            expires_at=expires_at,
+        )
+
+    def _set_many_sync(self, rows: list[tuple[str, bytes, float]]) -> None:
+        connection = self._connect_sync()
+        with connection:
+            connection.executemany(
+                f"INSERT OR REPLACE INTO {self.table} "
+                "(key, value, expires_at) VALUES (?, ?, ?)",
+                rows,
+            )
@@ -0,0 +1,47 @@
+from time import time
+from typing import Any, Hashable, Optional
+
+from app.services.title.anilist.cache.base import BaseCache, CacheEntry
+
+
+class TieredCache(BaseCache):
+    def __init__(
+        self,
+        memory: BaseCache,
+        persistent: BaseCache,
+    ) -> None:
+        super().__init__(
+            ttl=memory.ttl,
+            negative_ttl=memory.negative_ttl,
+            refresh_ahead=memory.refresh_ahead,
+        )
+
+        self.memory = memory
+        self.persistent = persistent
+
+    async def get(self, key: Hashable) -> Optional[CacheEntry]:
+        entry = await self.memory.get(key)
+        if entry is not None:
+            return entry
+
+        entry = await self.persistent.get(key)
+        if entry is not None:
+            await self.memory.set(key, entry.value, entry.expires_at - time())
+        return entry
+
+    async def set(
+        self,
+        key: Hashable,
+        value: Any,
+        ttl: Optional[float] = None,
+    ) -> None:
+        if ttl is None:
+            ttl = self.ttl
+
+        await self.memory.set(key, value, ttl)
+        await self.persistent.set(key, value, ttl)
+
+    async def close(self) -> None:
+        await super().close()
+        await self.memory.close()
+        await self.persistent.close()
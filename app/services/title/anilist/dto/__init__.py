@@ -1 +1,2 @@
+from app.services.title.anilist.dto.request_priority import RequestPriority
 from app.services.title.anilist.dto.title_format import TitleFormat
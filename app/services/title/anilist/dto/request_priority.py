@@ -0,0 +1,7 @@
+from enum import IntEnum
+
+
+class RequestPriority(IntEnum):
+    INTERACTIVE = 0  # searches and pagination
+    INLINE = 1  # inline share and relations
+    BACKGROUND = 2  # prefetch and cache refresh
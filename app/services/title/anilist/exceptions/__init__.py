@@ -1,2 +1,3 @@
-from app.services.title.anilist.exceptions.site import ServerError
+from app.services.title.anilist.exceptions.site import (RateLimitExceeded,
+                                                        ServerError)
 from app.services.title.anilist.exceptions.title import TitleNotFound
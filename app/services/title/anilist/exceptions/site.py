@@ -1,2 +1,6 @@
 class ServerError(Exception):
     pass
+
+
+class RateLimitExceeded(ServerError):
+    pass
@@ -0,0 +1,138 @@
+import asyncio
+from typing import Awaitable, Callable, Optional
+
+from app.services.title.anilist.dto import RequestPriority, TitleFormat
+from app.services.title.anilist.exceptions import TitleNotFound
+from app.services.title.anilist.schemas import TitlePreview
+from structlog import get_logger
+from structlog.stdlib import BoundLogger
+
+logger: BoundLogger = get_logger()
+
+BatchLoader = Callable[
+    [list[int], TitleFormat, RequestPriority],
+    Awaitable[dict[int, TitlePreview]],
+]
+
+
+class MediaBatcher:
+    def __init__(
+        self,
+        load_batch: BatchLoader,
+        window: float,
+        max_size: int,
+    ) -> None:
+        self.load_batch = load_batch
+        self.window = window
+        self.max_size = max_size
+
+        self._batches: dict[TitleFormat, dict[int, asyncio.Future]] = {}
+        self._priorities: dict[TitleFormat, RequestPriority] = {}
+        self._timers: dict[TitleFormat, asyncio.TimerHandle] = {}
+        self._waiters: dict[asyncio.Future, int] = {}
+        self._tasks: set[asyncio.Task] = set()
+
+    async def load(
+        self,
+        title_id: int,
+        title_format: TitleFormat,
+        priority: RequestPriority = RequestPriority.INLINE,
+    ) -> TitlePreview:
+        loop = asyncio.get_running_loop()
+
+        batch = self._batches.get(title_format)
+        if batch is None:
+            batch = self._batches[title_format] = {}
+            self._timers[title_format] = loop.call_later(
+                self.window, self._flush, title_format,
+            )
+
+        self._priorities[title_format] = min(
+            priority, self._priorities.get(title_format, priority),
+        )
+
+        future = batch.get(title_id)
+        if future is None:
+            future = batch[title_id] = loop.create_future()
+
+        if len(batch) >= self.max_size:
+            self._flush(title_format)
+
+        waiters = self._waiters
+        waiters[future] = waiters.get(future, 0) + 1
+        try:
+            return await asyncio.shield(future)
+        finally:
+            count = waiters.pop(future) - 1
+            if count:
+                waiters[future] = count
+            elif not future.done():
+                # Every caller of the id has gone away. A batch that
+                # hasn't been sent yet doesn't ask for the id at all
+                future.cancel()
+                if batch.get(title_id) is future:
+                    del batch[title_id]
+
+    def close(self) -> None:
+        for timer in self._timers.values():
+            timer.cancel()
+        for batch in self._batches.values():
+            for future in batch.values():
+                future.cancel()
+        for task in self._tasks:
+            task.cancel()
+
+    def _flush(self, title_format: TitleFormat) -> None:
+        timer: Optional[asyncio.TimerHandle] = self._timers.pop(
+            title_format, None,
+        )
+        if timer is not None:
+            timer.cancel()
+
+        batch = self._batches.pop(title_format, None)
+        priority = self._priorities.pop(title_format, RequestPriority.INLINE)
+        if not batch:
+            return
+
+        task = asyncio.ensure_future(
+            self._dispatch(title_format, priority, batch),
+        )
+        task.add_done_callback(self._tasks.discard)
+        self._tasks.add(task)
+
+    async def _dispatch(
+        self,
+        title_format: TitleFormat,
+        priority: RequestPriority,
+        batch: dict[int, asyncio.Future],
+    ) -> None:
+        if not batch:
+            # Every caller went away before the batch was sent
+            return
+
+        try:
+            titles = await self.load_batch(
+                list(batch), title_format, priority,
+            )
+        except Exception as e:
+            for future in batch.values():
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        logger.debug(
+            "Batch of titles loaded",
+            size=len(batch),
+        )
+
+        for title_id, future in batch.items():
+            if future.done():
+                continue
+
+            title = titles.get(title_id)
+            if title is None:
+                future.set_exception(
+                    TitleNotFound("Title with this id not found!"),
+                )
+            else:
+                future.set_result(title)
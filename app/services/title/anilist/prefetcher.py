@@ -0,0 +1,135 @@
+import asyncio
+from time import time
+from typing import Any, Awaitable, Callable, Hashable, Optional
+
+from app.metrics import PREFETCH_HITS, PREFETCH_WASTED, PREFETCHES
+from app.services.title.anilist.cache import BaseCache
+from app.utils import RateLimiter
+from structlog import get_logger
+from structlog.stdlib import BoundLogger
+
+logger: BoundLogger = get_logger()
+
+
+class Prefetcher:
+    # Loads into a cache what a user is likely to ask for next. At most
+    # `max_concurrency` prefetches run at once, and none starts while
+    # the rate limiter has fewer than `min_tokens` tokens or a queue, so
+    # prefetching never delays requests of users.
+    # A prefetched key that users ask for before its cache entry expires
+    # counts as a hit, the rest as waste. An expired key is prefetched
+    # again
+    def __init__(
+        self,
+        max_concurrency: int,
+        min_tokens: int,
+        rate_limiter: Optional[RateLimiter] = None,
+        max_tracked: int = 10000,
+    ) -> None:
+        self.max_concurrency = max_concurrency
+        self.min_tokens = min_tokens
+        self.rate_limiter = rate_limiter
+        self.max_tracked = max_tracked
+
+        self._tasks: dict[Hashable, asyncio.Task] = {}
+        # Keys that users asked for while their prefetch was running
+        self._claimed: set[Hashable] = set()
+        # Prefetched keys by the time their cache entry expires, in the
+        # order they were loaded
+        self._prefetched: dict[Hashable, float] = {}
+
+    def prefetch(
+        self,
+        key: Hashable,
+        cache: Optional[BaseCache],
+        load: Callable[[], Awaitable[Any]],
+    ) -> bool:
+        if cache is None or key in self._tasks:
+            return False
+        expires_at = self._prefetched.get(key)
+        if expires_at is not None:
+            if expires_at > time():
+                return False
+            del self._prefetched[key]
+            PREFETCH_WASTED.labels().inc()
+        if not self._has_budget():
+            PREFETCHES.labels("no_budget").inc()
+            return False
+
+        task = asyncio.ensure_future(self._prefetch(key, cache, load))
+        self._tasks[key] = task
+        task.add_done_callback(lambda _: self._forget_task(key))
+        return True
+
+    def used(self, key: Hashable) -> None:
+        if key in self._tasks:
+            self._claimed.add(key)
+            PREFETCH_HITS.labels().inc()
+            return
+
+        expires_at = self._prefetched.pop(key, None)
+        if expires_at is None:
+            return
+        if expires_at > time():
+            PREFETCH_HITS.labels().inc()
+        else:
+            # The user's request went to the source again
+            PREFETCH_WASTED.labels().inc()
+
+    def close(self) -> None:
+        for task in self._tasks.values():
+            task.cancel()
+        self._tasks.clear()
+        self._claimed.clear()
+
+    def _has_budget(self) -> bool:
+        if len(self._tasks) >= self.max_concurrency:
+            return False
+
+        rate_limiter = self.rate_limiter
+        if rate_limiter is None:
+            return True
+        if rate_limiter.queue_depth or rate_limiter.paused_for:
+            return False
+        return rate_limiter.available_tokens >= self.min_tokens
+
+    async def _prefetch(
+        self,
+        key: Hashable,
+        cache: BaseCache,
+        load: Callable[[], Awaitable[Any]],
+    ) -> None:
+        if await cache.get(key) is not None:
+            PREFETCHES.labels("cached").inc()
+            return
+
+        try:
+            await load()
+        except Exception as e:
+            PREFETCHES.labels("failed").inc()
+            logger.info("Prefetch failed", key=key, error=e)
+            return
+
+        PREFETCHES.labels("loaded").inc()
+
+        # Empty results live for the negative TTL of the cache or aren't
+        # stored at all
+        entry = await cache.get(key)
+        if entry is not None and key not in self._claimed:
+            self._forget_expired()
+            self._prefetched[key] = entry.expires_at
+
+    def _forget_task(self, key: Hashable) -> None:
+        self._tasks.pop(key, None)
+        self._claimed.discard(key)
+
+    def _forget_expired(self) -> None:
+        now = time()
+        prefetched = self._prefetched
+        while prefetched:
+            key, expires_at = next(iter(prefetched.items()))
+            if expires_at > now and len(prefetched) < self.max_tracked:
+                break
+
+            del prefetched[key]
+            PREFETCH_WASTED.labels().inc()
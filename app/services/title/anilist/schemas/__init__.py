@@ -1,2 +1,4 @@
+from app.services.title.anilist.schemas.page import (TitlePage,
+                                                     TitlePreviewPage)
 from app.services.title.anilist.schemas.title import (TitlePreview,
                                                       TitleRelation)
@@ -0,0 +1,22 @@
+from dataclasses import dataclass
+
+from app.services.title.anilist.schemas.title import TitlePreview
+
+
+@dataclass
+class TitlePage:
+    __slots__ = ("titles", "page", "total", "has_next_page")
+
+    titles: list[TitlePreview]
+    page: int
+    total: int
+    has_next_page: bool
+
+
+@dataclass
+class TitlePreviewPage:
+    __slots__ = ("title", "page", "has_next_page")
+
+    title: TitlePreview
+    page: int
+    has_next_page: bool
@@ -1,8 +1,17 @@
+from dataclasses import dataclass
 from typing import Optional
-from pydantic import BaseModel
 
 
-class TitlePreview(BaseModel):
+# Plain records instead of pydantic models: they are built from AniList
+# responses whose shape is fixed by our own queries, so per-field
+# validation would only cost time on every response
+@dataclass
+class TitlePreview:
+    __slots__ = (
+        "id", "english_name", "romaji_name", "native_name", "title_format",
+        "url", "banner_image_url", "description", "genres",
+    )
+
     id: int
     english_name: Optional[str]
     romaji_name: Optional[str]
@@ -14,7 +23,13 @@ class TitlePreview(BaseModel):
     genres: list[str]
 
 
-class TitleRelation(BaseModel):
+@dataclass
+class TitleRelation:
+    __slots__ = (
+        "id", "english_name", "romaji_name", "native_name", "title_format",
+        "url", "banner_image_url", "description", "genres", "relation_type",
+    )
+
     id: int
     english_name: Optional[str]
     romaji_name: Optional[str]
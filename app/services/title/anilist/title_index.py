@@ -0,0 +1,314 @@
+import asyncio
+import json
+import sqlite3
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Iterable, Optional
+
+from app.services.title.anilist.dto import TitleFormat
+from app.services.title.anilist.schemas import TitlePreview
+from app.text_utils.html_formatting import escape_html_tags_or_none
+from app.text_utils.text_formatting import normalize_search_query
+from structlog import get_logger
+from structlog.stdlib import BoundLogger
+
+logger: BoundLogger = get_logger()
+
+MEDIA_TYPES = {
+    TitleFormat.ANIME: "ANIME",
+    TitleFormat.MANGA: "MANGA",
+    TitleFormat.EVERYTHING: None,
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS titles (
+    id INTEGER PRIMARY KEY,
+    type TEXT,
+    format TEXT,
+    english TEXT,
+    romaji TEXT,
+    native TEXT,
+    synonyms TEXT,
+    url TEXT NOT NULL,
+    banner_image_url TEXT,
+    description TEXT,
+    genres TEXT NOT NULL,
+    popularity INTEGER NOT NULL DEFAULT 0
+);
+CREATE TRIGGER IF NOT EXISTS titles_insert AFTER INSERT ON titles BEGIN
+    INSERT INTO titles_search (rowid, english, romaji, native, synonyms)
+    VALUES (new.id, new.english, new.romaji, new.native, new.synonyms);
+END;
+CREATE TRIGGER IF NOT EXISTS titles_delete AFTER DELETE ON titles BEGIN
+    INSERT INTO titles_search (
+        titles_search, rowid, english, romaji, native, synonyms
+    )
+    VALUES ('delete', old.id, old.english, old.romaji, old.native,
+            old.synonyms);
+END;
+CREATE TRIGGER IF NOT EXISTS titles_update AFTER UPDATE ON titles BEGIN
+    INSERT INTO titles_search (
+        titles_search, rowid, english, romaji, native, synonyms
+    )
+    VALUES ('delete', old.id, old.english, old.romaji, old.native,
+            old.synonyms);
+    INSERT INTO titles_search (rowid, english, romaji, native, synonyms)
+    VALUES (new.id, new.english, new.romaji, new.native, new.synonyms);
+END;
+"""
+
+SEARCH_TABLE = """
+CREATE VIRTUAL TABLE IF NOT EXISTS titles_search USING fts5(
+    english, romaji, native, synonyms,
+    content='titles', content_rowid='id', tokenize='{tokenize}'
+)
+"""
+
+UPSERT = """
+INSERT INTO titles (
+    id, type, format, english, romaji, native, synonyms, url,
+    banner_image_url, description, genres, popularity
+)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (id) DO UPDATE SET
+    type = excluded.type,
+    format = excluded.format,
+    english = excluded.english,
+    romaji = excluded.romaji,
+    native = excluded.native,
+    synonyms = excluded.synonyms,
+    url = excluded.url,
+    banner_image_url = excluded.banner_image_url,
+    description = excluded.description,
+    genres = excluded.genres,
+    popularity = excluded.popularity
+"""
+
+COLUMNS = ", ".join(
+    f"titles.{column}"
+    for column in (
+        "id", "english", "romaji", "native", "format", "url",
+        "banner_image_url", "description", "genres",
+    )
+)
+
+
+class TitleIndex:
+    def __init__(self, path: str) -> None:
+        self.path = path
+
+        self._executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="title-index",
+        )
+        self._connection: Optional[sqlite3.Connection] = None
+        self._trigram = False
+
+    async def search(
+        self,
+        name: str,
+        title_format: TitleFormat = TitleFormat.EVERYTHING,
+        limit: int = 1,
+        offset: int = 0,
+    ) -> list[TitlePreview]:
+        return await self._run(
+            self.search_sync, name, title_format, limit, offset,
+        )
+
+    async def get(
+        self,
+        title_id: int,
+        title_format: TitleFormat = TitleFormat.EVERYTHING,
+    ) -> Optional[TitlePreview]:
+        return await self._run(self.get_sync, title_id, title_format)
+
+    async def upsert(self, media: Iterable[dict]) -> int:
+        return await self._run(self.upsert_sync, media)
+
+    async def close(self) -> None:
+        if self._connection is not None:
+            await self._run(self._connection.close)
+            self._connection = None
+        self._executor.shutdown(wait=True)
+
+    async def _run(self, func, *args) -> Any:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, func, *args)
+
+    def connect_sync(self) -> sqlite3.Connection:
+        if self._connection is not None:
+            return self._connection
+
+        connection = sqlite3.connect(self.path, check_same_thread=False)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+
+        # The trigram tokenizer matches any part of a name, including
+        # native names without spaces, but needs SQLite 3.34+
+        try:
+            connection.execute(SEARCH_TABLE.format(tokenize="trigram"))
+            self._trigram = True
+        except sqlite3.OperationalError:
+            connection.execute(
+                SEARCH_TABLE.format(tokenize="unicode61 remove_diacritics 2"),
+            )
+        else:
+            row = connection.execute(
+                "SELECT sql FROM sqlite_master WHERE name = 'titles_search'",
+            ).fetchone()
+            self._trigram = "trigram" in row[0]
+        connection.executescript(SCHEMA)
+        connection.commit()
+
+        self._connection = connection
+        return connection
+
+    def search_sync(
+        self,
+        name: str,
+        title_format: TitleFormat,
+        limit: int,
+        offset: int,
+    ) -> list[TitlePreview]:
+        connection = self.connect_sync()
+
+        match = self._match_expression(name)
+        if match is None:
+            return []
+
+        query = (
+            f"SELECT {COLUMNS} FROM titles_search "
+            "JOIN titles ON titles.id = titles_search.rowid "
+            "WHERE titles_search MATCH ?"
+        )
+        parameters: list[Any] = [match]
+
+        media_type = MEDIA_TYPES[title_format]
+        if media_type is not None:
+            query += " AND titles.type = ?"
+            parameters.append(media_type)
+
+        query += (
+            " ORDER BY bm25(titles_search), popularity DESC"
+            " LIMIT ? OFFSET ?"
+        )
+        parameters.extend((limit, offset))
+
+        rows = connection.execute(query, parameters).fetchall()
+        return [self._title_preview(row) for row in rows]
+
+    def get_sync(
+        self,
+        title_id: int,
+        title_format: TitleFormat,
+    ) -> Optional[TitlePreview]:
+        connection = self.connect_sync()
+
+        query = f"SELECT {COLUMNS} FROM titles WHERE id = ?"
+        parameters: list[Any] = [title_id]
+
+        media_type = MEDIA_TYPES[title_format]
+        if media_type is not None:
+            query += " AND type = ?"
+            parameters.append(media_type)
+
+        row = connection.execute(query, parameters).fetchone()
+        if row is None:
+            return None
+        return self._title_preview(row)
+
+    def upsert_sync(self, media: Iterable[dict]) -> int:
+        connection = self.connect_sync()
+
+        count = 0
+        with connection:
+            for data in media:
+                title = data.get("title") or {}
+
+                connection.execute(
+                    UPSERT,
+                    (
+                        data["id"],
+                        data.get("type"),
+                        data.get("format"),
+                        escape_html_tags_or_none(title.get("english")),
+                        escape_html_tags_or_none(title.get("romaji")),
+                        escape_html_tags_or_none(title.get("native")),
+                        "\n".join(data.get("synonyms") or ()),
+                        data["siteUrl"],
+                        data.get("bannerImage"),
+                        escape_html_tags_or_none(data.get("description")),
+                        json.dumps(data.get("genres") or []),
+                        data.get("popularity") or 0,
+                    ),
+                )
+                count += 1
+        return count
+
+    def load_dump_sync(self, path: str, batch_size: int = 1000) -> int:
+        count = 0
+        batch = []
+
+        with open(path, encoding="utf-8") as dump:
+            for line in dump:
+                line = line.strip()
+                if not line:
+                    continue
+
+                batch.append(json.loads(line))
+                if len(batch) >= batch_size:
+                    count += self.upsert_sync(batch)
+                    batch.clear()
+
+        return count + self.upsert_sync(batch)
+
+    def _match_expression(self, name: str) -> Optional[str]:
+        words = normalize_search_query(name).split()
+        if self._trigram:
+            # Trigram can only match words of three or more characters
+            words = [word for word in words if len(word) >= 3]
+            template = '"{}"'
+        else:
+            template = '"{}"*'
+
+        if not words:
+            return None
+        return " ".join(
+            template.format(word.replace('"', '""')) for word in words
+        )
+
+    @staticmethod
+    def _title_preview(row: tuple) -> TitlePreview:
+        (
+            title_id, english, romaji, native, title_format, url,
+            banner_image_url, description, genres,
+        ) = row
+
+        return TitlePreview(
+            id=title_id,
+            english_name=english,
+            romaji_name=romaji,
+            native_name=native,
+            title_format=title_format or "",
+            url=url,
+            banner_image_url=banner_image_url,
+            description=description,
+            genres=json.loads(genres),
+        )
+
+
+def main() -> None:
+    if len(sys.argv) < 3:
+        print(
+            "Usage: python -m app.services.title.anilist.title_index "
+            "<index path> <dump.jsonl>...",
+        )
+        sys.exit(1)
+
+    index = TitleIndex(sys.argv[1])
+    for path in sys.argv[2:]:
+        count = index.load_dump_sync(path)
+        print(f"{path}: {count} titles loaded")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,327 @@
+import asyncio
+import multiprocessing
+import os
+import signal
+from dataclasses import dataclass, field
+from multiprocessing.process import BaseProcess
+from queue import Empty
+from time import monotonic
+from typing import Any, Optional
+
+from aiogram import Bot
+from aiogram.bot.api import TELEGRAM_PRODUCTION, Methods, TelegramAPIServer
+from aiogram.utils.payload import generate_payload, prepare_arg
+from app.application import ALLOWED_UPDATES, create_application
+from app.config_reader import Config, Recorder
+from app.logging import logging_configure
+from app.metrics import (WORKER_IN_FLIGHT, WORKER_PROCESSED, WORKER_UP,
+                         start_metrics_server)
+from app.processing import UpdateProcessor, update_chat_key
+from app.webhook import SHUTDOWN_TIMEOUT, serve_until_stopped, webhook_app
+from structlog import get_logger
+from structlog.stdlib import BoundLogger
+
+logger: BoundLogger = get_logger()
+
+HEALTH_INTERVAL = 5
+# A worker that missed this many heartbeats is reported as unhealthy
+MISSED_HEARTBEATS = 3
+POLLING_TIMEOUT = 20
+
+
+def shard(data: dict, workers: int) -> int:
+    # Chat ids are spread well enough by the modulo, and unlike hash()
+    # of a string it's the same in every process
+    return update_chat_key(data) % workers
+
+
+def worker_config(config: Config, index: int) -> Config:
+    # AniList and Telegram count requests of the bot, not of a process,
+    # so every worker gets an equal share of the budgets. Recordings go
+    # to a file per worker, updates.jsonl.gz of worker 1 is
+    # updates-1.jsonl.gz
+    count = config.workers.count
+    anilist = config.anilist.copy(
+        update={
+            "requests_per_minute": max(
+                1, config.anilist.requests_per_minute // count,
+            ),
+            "burst": max(1, config.anilist.burst // count),
+        },
+    )
+    send_limits = config.send_limits.copy(
+        update={
+            "messages_per_second": max(
+                1, config.send_limits.messages_per_second // count,
+            ),
+        },
+    )
+
+    recorder = config.recorder
+    if recorder.path is not None:
+        directory, name = os.path.split(recorder.path)
+        stem, dot, extensions = name.partition(".")
+        recorder = Recorder(
+            path=os.path.join(directory, f"{stem}-{index}{dot}{extensions}"),
+        )
+
+    return config.copy(
+        update={
+            "anilist": anilist,
+            "send_limits": send_limits,
+            "recorder": recorder,
+        },
+    )
+
+
+async def _worker(
+    index: int,
+    config: Config,
+    updates: multiprocessing.Queue,
+    status: multiprocessing.Queue,
+) -> None:
+    application = create_application(config)
+    processor = UpdateProcessor(application)
+    loop = asyncio.get_running_loop()
+
+    metrics_runner = None
+    if config.metrics.port is not None:
+        metrics_runner = await start_metrics_server(
+            host=config.metrics.host,
+            port=config.metrics.port + 1 + index,
+        )
+
+    async def report_health() -> None:
+        while True:
+            status.put(
+                (index, os.getpid(), processor.processed, processor.in_flight),
+            )
+            await asyncio.sleep(HEALTH_INTERVAL)
+
+    health = asyncio.create_task(report_health())
+    try:
+        while True:
+            data = await loop.run_in_executor(None, updates.get)
+            if data is None:
+                break
+            processor.feed(data)
+
+        await processor.drain(SHUTDOWN_TIMEOUT)
+    finally:
+        health.cancel()
+        await application.close()
+        if metrics_runner is not None:
+            await metrics_runner.cleanup()
+
+    logger.info("Worker stopped", worker=index, processed=processor.processed)
+
+
+def _run_worker(
+    index: int,
+    config: Config,
+    updates: multiprocessing.Queue,
+    status: multiprocessing.Queue,
+) -> None:
+    # The supervisor coordinates shutdown through the queue, so a Ctrl+C
+    # reaching the whole process group must not stop workers halfway
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+
+    logging_configure(
+        profile=config.logging.profile,
+        level=config.logging.level,
+        sample_rate=config.logging.sample_rate,
+    )
+    asyncio.run(_worker(index, config, updates, status))
+
+
+@dataclass
+class WorkerHandle:
+    index: int
+    updates: Any
+    process: Optional[BaseProcess] = None
+    pid: Optional[int] = None
+    processed: int = 0
+    in_flight: int = 0
+    seen_at: float = field(default_factory=monotonic)
+
+
+class Supervisor:
+    # Runs one ingest point and `workers` processes which handle updates.
+    # Updates of a chat always go to the same worker, which handles them
+    # in order
+    def __init__(self, config: Config) -> None:
+        self.config = config
+        self.stopping = False
+
+        self._context = multiprocessing.get_context()
+        self._status = self._context.Queue()
+        self._workers = [
+            WorkerHandle(index=index, updates=self._context.Queue())
+            for index in range(config.workers.count)
+        ]
+
+    def feed(self, data: dict) -> None:
+        worker = self._workers[shard(data, len(self._workers))]
+        worker.updates.put(data)
+
+    def start(self) -> None:
+        for worker in self._workers:
+            self._start_worker(worker)
+
+    async def stop(self) -> None:
+        self.stopping = True
+        for worker in self._workers:
+            worker.updates.put(None)
+
+        loop = asyncio.get_running_loop()
+        deadline = SHUTDOWN_TIMEOUT + 5
+        for worker in self._workers:
+            process = worker.process
+            if process is None:
+                continue
+            await loop.run_in_executor(None, process.join, deadline)
+            if process.is_alive():
+                logger.warning("Worker is killed", worker=worker.index)
+                process.kill()
+            WORKER_UP.labels(worker.index).set(0)
+
+        logger.warning("Workers stopped")
+
+    async def monitor(self) -> None:
+        loop = asyncio.get_running_loop()
+        while not self.stopping:
+            try:
+                index, pid, processed, in_flight = await loop.run_in_executor(
+                    None, self._status.get, True, HEALTH_INTERVAL,
+                )
+            except Empty:
+                pass
+            else:
+                worker = self._workers[index]
+                worker.pid = pid
+                worker.processed = processed
+                worker.in_flight = in_flight
+                worker.seen_at = monotonic()
+
+            self._check_workers()
+
+    def _check_workers(self) -> None:
+        now = monotonic()
+        for worker in self._workers:
+            process = worker.process
+            if process is None:
+                continue
+            alive = process.is_alive()
+            silent_for = now - worker.seen_at
+            healthy = silent_for < HEALTH_INTERVAL * MISSED_HEARTBEATS
+
+            WORKER_UP.labels(worker.index).set(alive and healthy)
+            WORKER_PROCESSED.labels(worker.index).set(worker.processed)
+            WORKER_IN_FLIGHT.labels(worker.index).set(worker.in_flight)
+
+            if not alive and not self.stopping:
+                logger.error(
+                    "Worker died, restarting",
+                    worker=worker.index,
+                    exitcode=process.exitcode,
+                )
+                self._start_worker(worker)
+            elif not healthy:
+                logger.warning(
+                    "Worker is not responding",
+                    worker=worker.index,
+                    silent_for=round(silent_for),
+                )
+
+    def _start_worker(self, worker: WorkerHandle) -> None:
+        process = self._context.Process(
+            target=_run_worker,
+            args=(
+                worker.index,
+                worker_config(self.config, worker.index),
+                worker.updates,
+                self._status,
+            ),
+            name=f"worker-{worker.index}",
+            daemon=True,
+        )
+        process.start()
+        worker.process = process
+        worker.seen_at = monotonic()
+        logger.info("Worker started", worker=worker.index, pid=process.pid)
+
+
+def ingest_bot(config: Config) -> Bot:
+    server = TELEGRAM_PRODUCTION
+    if config.bot.api_url is not None:
+        server = TelegramAPIServer.from_base(config.bot.api_url)
+    return Bot(token=config.bot.token, server=server)
+
+
+async def poll(bot: Bot, supervisor: Supervisor) -> None:
+    stopped = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signal_number in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signal_number, stopped.set)
+
+    # The raw getUpdates answer is passed on as is, workers parse it
+    offset = None
+    while not stopped.is_set():
+        request = asyncio.ensure_future(
+            bot.request(
+                Methods.GET_UPDATES,
+                generate_payload(
+                    offset=offset,
+                    timeout=POLLING_TIMEOUT,
+                    allowed_updates=prepare_arg(ALLOWED_UPDATES),
+                ),
+            ),
+        )
+        stop = asyncio.ensure_future(stopped.wait())
+        await asyncio.wait(
+            (request, stop), return_when=asyncio.FIRST_COMPLETED,
+        )
+        stop.cancel()
+        if stopped.is_set():
+            request.cancel()
+            break
+
+        try:
+            updates = request.result()
+        except Exception as e:
+            logger.exception("Updates can't be received!", error=e)
+            await asyncio.sleep(1)
+            continue
+
+        for data in updates:
+            supervisor.feed(data)
+            offset = data["update_id"] + 1
+
+
+async def run_supervisor(config: Config) -> None:
+    supervisor = Supervisor(config)
+    supervisor.start()
+    monitor = asyncio.create_task(supervisor.monitor())
+
+    bot = ingest_bot(config)
+    try:
+        if config.webhook.url is not None:
+            app = webhook_app(
+                bot=bot,
+                webhook=config.webhook,
+                feed=supervisor.feed,
+                on_shutdown=supervisor.stop,
+            )
+            await serve_until_stopped(app, config.webhook)
+        else:
+            await bot.delete_webhook()
+            try:
+                await poll(bot, supervisor)
+            finally:
+                await supervisor.stop()
+    finally:
+        monitor.cancel()
+        session = await bot.get_session()
+        if session is not None:
+            await session.close()
@@ -0,0 +1,2 @@
+from app.telegram.bot import InstrumentedBot
+from app.telegram.send_queue import SendQueue
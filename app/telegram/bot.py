@@ -0,0 +1,43 @@
+from time import perf_counter
+from typing import Dict, List, Optional, Union
+
+from aiogram import Bot
+from aiogram.types import base
+from app.metrics import TELEGRAM_REQUEST_ERRORS, TELEGRAM_REQUEST_LATENCY
+from app.telegram.send_queue import SendQueue
+
+
+class InstrumentedBot(Bot):
+    # Calls to chats go through the send queue when it's set
+    send_queue: Optional[SendQueue] = None
+
+    async def request(
+        self,
+        method: base.String,
+        data: Optional[Dict] = None,
+        files: Optional[Dict] = None,
+        **kwargs,
+    ) -> Union[List, Dict, base.Boolean]:
+        send_queue = self.send_queue
+        if send_queue is not None and data:
+            if send_queue.accepts(method, data):
+                return await send_queue.submit(method, data, files, kwargs)
+        return await self.send_now(method, data, files, **kwargs)
+
+    async def send_now(
+        self,
+        method: base.String,
+        data: Optional[Dict] = None,
+        files: Optional[Dict] = None,
+        **kwargs,
+    ) -> Union[List, Dict, base.Boolean]:
+        started_at = perf_counter()
+        try:
+            return await super().request(method, data, files, **kwargs)
+        except Exception as e:
+            TELEGRAM_REQUEST_ERRORS.labels(method, type(e).__name__).inc()
+            raise
+        finally:
+            TELEGRAM_REQUEST_LATENCY.labels(method).observe(
+                perf_counter() - started_at,
+            )
@@ -0,0 +1,236 @@
+import asyncio
+from collections import deque
+from itertools import count
+from typing import Any, Awaitable, Callable, Hashable, Optional
+
+from aiogram.utils.exceptions import RetryAfter
+from app.metrics import (TELEGRAM_EDITS_COALESCED, TELEGRAM_RETRY_AFTER,
+                         TELEGRAM_SEND_QUEUE)
+from app.utils import RateLimiter
+from structlog import get_logger
+from structlog.stdlib import BoundLogger
+
+logger: BoundLogger = get_logger()
+
+Send = Callable[..., Awaitable[Any]]
+
+QUEUED_METHODS = frozenset((
+    "sendMessage", "sendPhoto", "sendDocument", "sendAnimation",
+    "sendSticker", "copyMessage", "forwardMessage", "deleteMessage",
+    "editMessageText", "editMessageCaption", "editMessageMedia",
+    "editMessageReplyMarkup",
+))
+EDIT_METHODS = frozenset((
+    "editMessageText", "editMessageCaption", "editMessageMedia",
+    "editMessageReplyMarkup",
+))
+MAX_RETRIES = 3
+
+
+class Call:
+    __slots__ = ("method", "data", "files", "kwargs", "future", "waiters",
+                 "started")
+
+    def __init__(
+        self,
+        method: str,
+        data: dict,
+        files: Optional[dict],
+        kwargs: dict,
+    ) -> None:
+        self.method = method
+        self.data = data
+        self.files = files
+        self.kwargs = kwargs
+        self.future = asyncio.get_running_loop().create_future()
+        self.waiters = 0
+        self.started = False
+
+
+class ChatQueue:
+    __slots__ = ("calls", "limiter", "last_calls", "worker")
+
+    def __init__(self, limiter: RateLimiter) -> None:
+        self.calls: deque[Call] = deque()
+        self.limiter = limiter
+        # The latest queued call for each message, to merge edits into
+        self.last_calls: dict[Any, Call] = {}
+        self.worker: Optional[asyncio.Task] = None
+
+
+class SendQueue:
+    # Sends Bot API calls of a chat one after another under the chat's
+    # and the global rate limits, groups and channels have a lower chat
+    # limit than private chats. An edit of a message that is still
+    # waiting to be edited replaces the waiting one, so only the latest
+    # content is sent
+    def __init__(
+        self,
+        send: Send,
+        messages_per_second: int,
+        chat_messages_per_minute: int,
+        group_chat_messages_per_minute: int,
+        chat_burst: int,
+    ) -> None:
+        self._send = send
+        self._limiter = RateLimiter(
+            requests_per_minute=messages_per_second * 60,
+            burst=messages_per_second,
+        )
+        self._chat_messages_per_minute = chat_messages_per_minute
+        self._group_chat_messages_per_minute = group_chat_messages_per_minute
+        self._chat_burst = chat_burst
+        self._chats: dict[Hashable, ChatQueue] = {}
+
+        TELEGRAM_SEND_QUEUE.labels().set_function(lambda: self.queued)
+
+    @property
+    def queued(self) -> int:
+        return sum(len(chat.calls) for chat in self._chats.values())
+
+    @staticmethod
+    def accepts(method: str, data: dict) -> bool:
+        return method in QUEUED_METHODS and "chat_id" in data
+
+    async def submit(
+        self,
+        method: str,
+        data: dict,
+        files: Optional[dict],
+        kwargs: dict,
+    ) -> Any:
+        chat_id = data["chat_id"]
+        chat = self._chats.get(chat_id)
+        if chat is None:
+            chat = self._chats[chat_id] = ChatQueue(
+                RateLimiter(
+                    requests_per_minute=self._chat_rate(chat_id),
+                    burst=self._chat_burst,
+                ),
+            )
+
+        message_id = data.get("message_id")
+        last = chat.last_calls.get(message_id)
+        if last is not None and self._mergeable(last, method):
+            last.data = data
+            last.files = files
+            last.kwargs = kwargs
+            TELEGRAM_EDITS_COALESCED.labels().inc()
+            return await self._wait(last)
+
+        call = Call(method, data, files, kwargs)
+        chat.calls.append(call)
+        if message_id is not None:
+            chat.last_calls[message_id] = call
+
+        if chat.worker is None:
+            chat.worker = asyncio.create_task(self._work(chat_id, chat))
+        return await self._wait(call)
+
+    def close(self) -> None:
+        for chat in self._chats.values():
+            if chat.worker is not None:
+                chat.worker.cancel()
+            for call in chat.calls:
+                call.future.cancel()
+        self._chats.clear()
+
+    def _chat_rate(self, chat_id: Any) -> int:
+        # Ids of groups and channels are negative, and channels can be
+        # addressed by their @username too
+        try:
+            is_private = int(chat_id) > 0
+        except ValueError:
+            is_private = False
+
+        if is_private:
+            return self._chat_messages_per_minute
+        return self._group_chat_messages_per_minute
+
+    @staticmethod
+    def _mergeable(call: Call, method: str) -> bool:
+        if method not in EDIT_METHODS or call.method != method:
+            return False
+        return not call.started and not call.future.done()
+
+    @staticmethod
+    async def _wait(call: Call) -> Any:
+        # The call is dropped if everyone waiting for it is cancelled
+        # before it's sent
+        call.waiters += 1
+        try:
+            return await asyncio.shield(call.future)
+        finally:
+            call.waiters -= 1
+            if not call.waiters and not call.started:
+                call.future.cancel()
+
+    async def _work(self, chat_id: Hashable, chat: ChatQueue) -> None:
+        try:
+            while chat.calls:
+                # Edits coming while the call waits for the limits are
+                # still merged into it
+                await chat.limiter.acquire()
+                await self._limiter.acquire()
+
+                call = self._next_call(chat)
+                if call is None:
+                    continue
+
+                call.started = True
+                try:
+                    result = await self._send_with_retries(call)
+                except Exception as e:
+                    if not call.future.done():
+                        call.future.set_exception(e)
+                else:
+                    if not call.future.done():
+                        call.future.set_result(result)
+        finally:
+            chat.worker = None
+            # The chat's limiter is full again after this much idle time
+            idle_time = chat.limiter.burst / chat.limiter.rate
+            asyncio.get_running_loop().call_later(
+                idle_time, self._forget, chat_id, chat,
+            )
+
+    @staticmethod
+    def _next_call(chat: ChatQueue) -> Optional[Call]:
+        # Calls whose callers were cancelled are skipped, so they don't
+        # take the tokens of the next one
+        while chat.calls:
+            call = chat.calls.popleft()
+            message_id = call.data.get("message_id")
+            if chat.last_calls.get(message_id) is call:
+                del chat.last_calls[message_id]
+            if not call.future.done():
+                return call
+        return None
+
+    async def _send_with_retries(self, call: Call) -> Any:
+        for attempt in count(1):
+            try:
+                return await self._send(
+                    call.method, call.data, call.files, **call.kwargs,
+                )
+            except RetryAfter as e:
+                if attempt > MAX_RETRIES:
+                    raise
+
+                TELEGRAM_RETRY_AFTER.labels(call.method).inc()
+                logger.warning(
+                    "Telegram asks to wait",
+                    method=call.method,
+                    chat_id=call.data["chat_id"],
+                    retry_after=e.timeout,
+                )
+                # Calls of the chat wait behind this one meanwhile, and
+                # other chats wait too, as the flood limit is the bot's
+                self._limiter.pause(e.timeout)
+                await asyncio.sleep(e.timeout)
+
+    def _forget(self, chat_id: Hashable, chat: ChatQueue) -> None:
+        if self._chats.get(chat_id) is not chat:
+            return
+        if chat.worker is None and not chat.calls:
+            del self._chats[chat_id]
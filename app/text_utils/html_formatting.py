@@ -1,16 +1,169 @@
-from typing import Optional
+from html import unescape
+from typing import Iterator, Optional
 
-from bs4 import BeautifulSoup
+ASCII_SPACES = " \t\n\r\x0c"
 
+VOID_TAGS = {
+    "area", "base", "basefont", "br", "col", "embed", "frame", "hr", "img",
+    "input", "isindex", "keygen", "link", "meta", "param", "source", "track",
+    "wbr",
+}
+DROPPED_CONTENT_TAGS = {"script", "style"}
+RAW_TEXT_TAGS = {"textarea", "title"} | DROPPED_CONTENT_TAGS
+PRESERVE_WHITESPACE_TAGS = {"pre", "textarea"}
 
-def escape_html_tags(string: str, builder: str = "lxml") -> str:
-    return BeautifulSoup(string, builder).text
 
+def _find_tag_end(string: str, start: int) -> int:
+    length = len(string)
+    position = string.find(">", start)
+    if position == -1:
+        position = length
 
-def escape_html_tags_or_none(
-    string: Optional[str],
-    builder: str = "lxml",
-) -> Optional[str]:
+    tag = string[start:position]
+    if "\"" not in tag and "'" not in tag:
+        return position
+
+    position = start
+    quote = None
+
+    while position < length:
+        char = string[position]
+        if quote is not None:
+            if char == quote:
+                quote = None
+        elif char == ">":
+            return position
+        elif char in "\"'" and _follows_equals_sign(string, position):
+            quote = char
+        position += 1
+    return length
+
+
+def _follows_equals_sign(string: str, position: int) -> bool:
+    position -= 1
+    while position > 0 and string[position] in ASCII_SPACES:
+        position -= 1
+    return string[position] == "="
+
+
+def _find_end(string: str, start: int, marker: str) -> int:
+    position = string.find(marker, start)
+    if position == -1:
+        return len(string)
+    return position + len(marker) - 1
+
+
+def _tag_name(string: str, start: int, end: int) -> str:
+    position = start
+    while position < end and string[position] not in " \t\n\r\x0c/>":
+        position += 1
+    return string[start:position].lower()
+
+
+def iter_html_text(string: str) -> Iterator[str]:
+    string = string.replace("\r\n", "\n").replace("\r", "\n")
+    if "\x00" in string:
+        string = string.replace("\x00", "�")
+
+    length = len(string)
+    position = 0
+    chunks: list[str] = []
+    started = False
+    open_tags: list[str] = []
+
+    def flush() -> Iterator[str]:
+        nonlocal started
+
+        raw = "".join(chunks)
+        chunks.clear()
+        # The parser skips blanks before the first content of a document
+        if not started:
+            raw = raw.lstrip(ASCII_SPACES)
+        if not raw:
+            return
+
+        text = unescape(raw) if "&" in raw else raw
+        # Whitespace-only text between tags is collapsed to one character
+        preserve_whitespace = not PRESERVE_WHITESPACE_TAGS.isdisjoint(
+            open_tags,
+        )
+        if not preserve_whitespace and not text.strip(ASCII_SPACES):
+            text = "\n" if "\n" in text else " "
+
+        started = True
+        yield text
+
+    while position < length:
+        tag_start = string.find("<", position)
+        if tag_start == -1:
+            chunks.append(string[position:])
+            break
+
+        chunks.append(string[position:tag_start])
+
+        next_char = string[tag_start + 1:tag_start + 2]
+        if next_char.isascii() and next_char.isalpha():
+            tag_end = _find_tag_end(string, tag_start + 1)
+            name = _tag_name(string, tag_start + 1, tag_end)
+            is_end_tag = False
+        elif next_char == "/" and tag_start + 2 < length:
+            tag_end = _find_tag_end(string, tag_start + 2)
+            name = _tag_name(string, tag_start + 2, tag_end)
+            is_end_tag = True
+        elif string.startswith("<!--", tag_start):
+            tag_end = _find_end(string, tag_start + 4, "-->")
+            name = None
+            is_end_tag = False
+        elif next_char in ("!", "?"):
+            tag_end = _find_end(string, tag_start + 2, ">")
+            name = None
+            is_end_tag = False
+        else:
+            chunks.append("<")
+            position = tag_start + 1
+            continue
+
+        position = tag_end + 1
+
+        # An end tag without an open element is dropped by the parser and
+        # doesn't split the surrounding text
+        if is_end_tag and name not in open_tags:
+            if not started and not "".join(chunks).strip(ASCII_SPACES):
+                chunks.clear()
+                started = True
+            continue
+
+        yield from flush()
+
+        if name is None:
+            continue
+
+        started = True
+
+        if is_end_tag:
+            while open_tags.pop() != name:
+                pass
+        elif name not in VOID_TAGS:
+            open_tags.append(name)
+
+        if name in RAW_TEXT_TAGS and not is_end_tag:
+            raw_end = string.lower().find(f"</{name}", position)
+            if raw_end == -1:
+                raw_end = length
+
+            if name not in DROPPED_CONTENT_TAGS:
+                chunks.append(string[position:raw_end])
+                yield from flush()
+            position = raw_end
+
+    yield from flush()
+
+
+def escape_html_tags(string: str) -> str:
+    return "".join(iter_html_text(string))
+
+
+def escape_html_tags_or_none(string: Optional[str]) -> Optional[str]:
     if string:
-        return escape_html_tags(string, builder)
+        return escape_html_tags(string)
     return None
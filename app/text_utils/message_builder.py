@@ -0,0 +1,114 @@
+from functools import cached_property
+from html import escape
+from typing import NamedTuple, Optional
+
+from aiogram.types import MessageEntity
+from app.text_utils.text_checker import utf16_length
+
+# Telegram limits the visible text of a message, measured in UTF-16 units
+MAX_MESSAGE_LENGTH = 4096
+
+HTML_TAGS = {
+    "bold": ("<b>", "</b>"),
+    "italic": ("<i>", "</i>"),
+    "code": ("<code>", "</code>"),
+}
+
+
+def cut_to_utf16_length(string: str, length: int) -> str:
+    if length <= 0:
+        return ""
+
+    encoded = string.encode("utf-16-le")
+    if len(encoded) <= length * 2:
+        return string
+    # A surrogate pair cut in half is dropped by the decoder
+    return encoded[:length * 2].decode("utf-16-le", errors="ignore")
+
+
+class Part(NamedTuple):
+    text: str
+    entity: Optional[str] = None
+    url: Optional[str] = None
+
+
+class RenderedMessage:
+    def __init__(self, parts: tuple[Part, ...], length: int) -> None:
+        self.parts = parts
+        self.length = length
+
+    @cached_property
+    def html(self) -> str:
+        chunks = []
+        for text, entity, url in self.parts:
+            if "&" in text or "<" in text or ">" in text:
+                text = escape(text, quote=False)
+            if url is not None:
+                # Only text links have an url
+                url = escape(url, quote=True)
+                chunks.append(f"<a href=\"{url}\">{text}</a>")
+            elif entity is not None:
+                start, end = HTML_TAGS[entity]
+                chunks.append(f"{start}{text}{end}")
+            else:
+                chunks.append(text)
+        return "".join(chunks)
+
+    @cached_property
+    def text(self) -> str:
+        return "".join(part.text for part in self.parts)
+
+    @cached_property
+    def entities(self) -> tuple[MessageEntity, ...]:
+        entities = []
+        offset = 0
+        for text, entity, url in self.parts:
+            length = utf16_length(text)
+            if entity is not None and length:
+                entities.append(
+                    MessageEntity(
+                        type=entity, offset=offset, length=length, url=url,
+                    ),
+                )
+            offset += length
+        return tuple(entities)
+
+
+class MessageBuilder:
+    # Collects plain text parts with their formatting and keeps the visible
+    # length in UTF-16 units as it goes, so a message is built once and can
+    # be rendered as HTML or as text with entities
+    def __init__(self) -> None:
+        self._parts: list[Part] = []
+        self.length = 0
+
+    def add(
+        self,
+        text: str,
+        entity: Optional[str] = None,
+        url: Optional[str] = None,
+    ) -> "MessageBuilder":
+        if text:
+            self._parts.append(Part(text, entity, url))
+            self.length += utf16_length(text)
+        return self
+
+    def plain(self, text: str) -> "MessageBuilder":
+        return self.add(text)
+
+    def code(self, text: str) -> "MessageBuilder":
+        return self.add(text, "code")
+
+    def bold(self, text: str) -> "MessageBuilder":
+        return self.add(text, "bold")
+
+    def link(self, text: str, url: str) -> "MessageBuilder":
+        return self.add(text, "text_link", url)
+
+    def extend(self, other: "MessageBuilder") -> "MessageBuilder":
+        self._parts.extend(other._parts)
+        self.length += other.length
+        return self
+
+    def build(self) -> RenderedMessage:
+        return RenderedMessage(tuple(self._parts), self.length)
@@ -2,9 +2,7 @@ def utf8_length(string: str) -> int:
     return len(string.encode("utf-8"))
 
 
-def all_text_length(*strings: str) -> int:
-    length = 0
-
-    for string in strings:
-        length += len(string)
-    return length
+def utf16_length(string: str) -> int:
+    if string.isascii():
+        return len(string)
+    return len(string.encode("utf-16-le")) // 2
@@ -0,0 +1,83 @@
+from functools import lru_cache
+from typing import Optional, Union
+
+from app.services.title.anilist.schemas import TitlePreview, TitleRelation
+from app.text_utils.message_builder import (MAX_MESSAGE_LENGTH,
+                                            MessageBuilder, RenderedMessage,
+                                            cut_to_utf16_length)
+from app.text_utils.text_checker import utf16_length
+from app.text_utils.text_formatting import (SOURCE_TEXT, UNKNOWN_TEXT,
+                                            formatting_title_format_for_inline)
+
+MAX_CACHED_CARDS = 2048
+TRUNCATED_TEXT = "... (so long description)"
+TRUNCATED_LENGTH = utf16_length(TRUNCATED_TEXT)
+
+
+def render_title_card(title: Union[TitlePreview, TitleRelation]) -> str:
+    return title_card(title).html
+
+
+def title_card(title: Union[TitlePreview, TitleRelation]) -> RenderedMessage:
+    return _title_card(
+        title.id,
+        title.english_name,
+        title.romaji_name,
+        title.native_name,
+        title.title_format,
+        title.description,
+        tuple(title.genres),
+        title.url,
+    )
+
+
+@lru_cache(maxsize=MAX_CACHED_CARDS)
+def _title_card(
+    title_id: int,
+    english_name: Optional[str],
+    romaji_name: Optional[str],
+    native_name: Optional[str],
+    title_format: str,
+    description: Optional[str],
+    genres: tuple[str, ...],
+    url: str,
+) -> RenderedMessage:
+    card = MessageBuilder().plain("Titles:\n")
+    names = [
+        name
+        for name in (english_name, romaji_name, native_name)
+        if name is not None
+    ]
+    for index, name in enumerate(names):
+        card.plain("\n\t" if index else "\t").code(name)
+
+    card.plain("\n\nFormat: ").code(
+        formatting_title_format_for_inline(title_format),
+    )
+    card.plain("\n\nDescription: ")
+
+    tail = MessageBuilder().plain("\n\nGenres: ")
+    if genres:
+        for index, genre in enumerate(genres):
+            if index:
+                tail.plain(", ")
+            tail.code(genre)
+    else:
+        tail.code(UNKNOWN_TEXT)
+    tail.plain("\n\n").link(SOURCE_TEXT, url)
+
+    if not description:
+        card.code(UNKNOWN_TEXT)
+        return card.extend(tail).build()
+
+    card.plain("\n")
+
+    # The description is the only part long enough to go over the limit,
+    # so it gets whatever the rest of the card leaves
+    budget = MAX_MESSAGE_LENGTH - card.length - tail.length
+    if utf16_length(description) <= budget:
+        card.code(description)
+    else:
+        card.code(cut_to_utf16_length(description, budget - TRUNCATED_LENGTH))
+        card.bold(TRUNCATED_TEXT)
+    return card.extend(tail).build()
@@ -0,0 +1,5 @@
+from app.utils.fair_scheduler import FairScheduler, QueueFull
+from app.utils.fast_json import (install_aiogram_json_loads, json_dumps,
+                                 json_loads)
+from app.utils.latest_tasks import LatestTasks, Superseded
+from app.utils.rate_limiter import RateLimiter
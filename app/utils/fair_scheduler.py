@@ -0,0 +1,133 @@
+import asyncio
+from collections import deque
+from typing import Hashable, Optional
+
+from app.utils.latest_tasks import Superseded
+
+
+class QueueFull(Exception):
+    pass
+
+
+class FairScheduler:
+    # Lets at most `concurrency` jobs run at once. Jobs of a key run one
+    # at a time in the order they came, and keys with waiting jobs take
+    # turns, so a single busy key can't take every slot. A waiting job
+    # with the same tag as a new job of the key is replaced by the new one
+    def __init__(self, concurrency: int, queue_size: int) -> None:
+        self.concurrency = concurrency
+        self.queue_size = queue_size
+        self.running = 0
+        self.queued = 0
+
+        self._queues: dict[Hashable, deque[asyncio.Future]] = {}
+        # Keys with waiting jobs and without a running one, in turn order
+        self._turns: deque[Hashable] = deque()
+        self._active: set[Hashable] = set()
+        self._tagged: dict[tuple[Hashable, Hashable], asyncio.Future] = {}
+
+    async def acquire(
+        self,
+        key: Hashable,
+        tag: Optional[Hashable] = None,
+    ) -> None:
+        waiter = None
+        if tag is not None:
+            waiter = self._supersede(key, tag)
+        if waiter is None:
+            waiter = self._enqueue(key)
+            if waiter is None:
+                return
+            if tag is not None:
+                self._tagged[key, tag] = waiter
+
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was given right before the cancellation
+                self.release(key)
+            else:
+                self._forget(key, waiter)
+            raise
+        finally:
+            if tag is not None and self._tagged.get((key, tag)) is waiter:
+                del self._tagged[key, tag]
+
+    def release(self, key: Hashable) -> None:
+        self._active.discard(key)
+        self.running -= 1
+        if key in self._queues:
+            # The next job of the key waits for its turn after other keys
+            self._turns.append(key)
+        self._wake()
+
+    def _start(self, key: Hashable) -> None:
+        self._active.add(key)
+        self.running += 1
+
+    def _wake(self) -> None:
+        while self.running < self.concurrency and self._turns:
+            key = self._turns.popleft()
+            queue = self._queues[key]
+            waiter = queue.popleft()
+            self.queued -= 1
+            if not queue:
+                del self._queues[key]
+
+            if waiter.cancelled():
+                # The waiting job was cancelled and hasn't woken up yet
+                # to forget about itself
+                if key in self._queues:
+                    self._turns.appendleft(key)
+                continue
+
+            self._start(key)
+            waiter.set_result(None)
+
+    def _enqueue(self, key: Hashable) -> Optional[asyncio.Future]:
+        queue = self._queues.get(key)
+        if queue is None:
+            if key not in self._active and self.running < self.concurrency:
+                self._start(key)
+                return None
+
+            queue = self._queues[key] = deque()
+            if key not in self._active:
+                self._turns.append(key)
+        elif len(queue) >= self.queue_size:
+            raise QueueFull()
+
+        waiter = asyncio.get_running_loop().create_future()
+        queue.append(waiter)
+        self.queued += 1
+        return waiter
+
+    def _supersede(
+        self,
+        key: Hashable,
+        tag: Hashable,
+    ) -> Optional[asyncio.Future]:
+        # The new job takes the place of the waiting one in the queue
+        older = self._tagged.get((key, tag))
+        if older is None or older.done():
+            return None
+
+        queue = self._queues[key]
+        waiter = asyncio.get_running_loop().create_future()
+        queue[queue.index(older)] = waiter
+        self._tagged[key, tag] = waiter
+        older.set_exception(Superseded())
+        return waiter
+
+    def _forget(self, key: Hashable, waiter: asyncio.Future) -> None:
+        queue = self._queues.get(key)
+        if queue is None or waiter not in queue:
+            return
+
+        queue.remove(waiter)
+        self.queued -= 1
+        if not queue:
+            del self._queues[key]
+            if key not in self._active:
+                self._turns.remove(key)
@@ -0,0 +1,39 @@
+import json
+from typing import Any, Callable, Optional, Union
+
+try:
+    import orjson
+except ImportError:
+    orjson = None  # type: ignore[assignment]
+
+
+def json_loads(data: Union[str, bytes]) -> Any:
+    # orjson takes the response bytes as they are, the stdlib decodes
+    # them first. Both raise a subclass of json.JSONDecodeError
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def json_dumps(
+    obj: Any,
+    default: Optional[Callable[[Any], Any]] = None,
+) -> str:
+    if orjson is not None:
+        try:
+            return orjson.dumps(
+                obj, default=default, option=orjson.OPT_NON_STR_KEYS,
+            ).decode()
+        except TypeError:
+            # orjson refuses some values the stdlib writes, like ints
+            # over 64 bits
+            pass
+    return json.dumps(obj, default=default, ensure_ascii=False)
+
+
+def install_aiogram_json_loads() -> None:
+    # aiogram decodes Bot API responses with aiogram.utils.json.loads,
+    # which is looked up on every call
+    from aiogram.utils import json as aiogram_json
+
+    aiogram_json.loads = json_loads
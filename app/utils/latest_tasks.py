@@ -0,0 +1,61 @@
+import asyncio
+from typing import Awaitable, Callable, Hashable, TypeVar
+
+T = TypeVar("T")
+
+
+class Superseded(Exception):
+    pass
+
+
+class LatestTasks:
+    # Starting a task for a key cancels the previous one, and the caller
+    # waiting for it gets `Superseded` instead of a result
+    def __init__(self) -> None:
+        self._tasks: dict[Hashable, asyncio.Task] = {}
+
+    def __len__(self) -> int:
+        return len(self._tasks)
+
+    async def run(
+        self,
+        key: Hashable,
+        factory: Callable[[], Awaitable[T]],
+        delay: float = 0,
+    ) -> T:
+        previous = self._tasks.pop(key, None)
+        if previous is not None:
+            previous.cancel()
+
+        task = asyncio.ensure_future(self._run_later(factory, delay))
+        self._tasks[key] = task
+
+        try:
+            return await task
+        except asyncio.CancelledError:
+            if self._tasks.get(key) is not task:
+                raise Superseded() from None
+            raise
+        finally:
+            if self._tasks.get(key) is task:
+                del self._tasks[key]
+
+    def cancel(self, key: Hashable) -> bool:
+        task = self._tasks.pop(key, None)
+        if task is None:
+            return False
+        return task.cancel()
+
+    def close(self) -> None:
+        for task in self._tasks.values():
+            task.cancel()
+        self._tasks.clear()
+
+    @staticmethod
+    async def _run_later(
+        factory: Callable[[], Awaitable[T]],
+        delay: float,
+    ) -> T:
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return await factory()
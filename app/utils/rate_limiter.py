@@ -0,0 +1,147 @@
+import asyncio
+import heapq
+from itertools import count
+from time import monotonic
+from typing import Optional
+from weakref import WeakKeyDictionary
+
+
+class RateLimiter:
+    # Token bucket whose waiters are served by priority, lower values
+    # first, and in the order they came within a priority
+    def __init__(self, requests_per_minute: int, burst: int = 10) -> None:
+        self.rate = requests_per_minute / 60
+        self.burst = burst
+
+        self.wait_time_total = 0.0
+        self.requests_total = 0
+
+        self._tokens = float(burst)
+        self._updated_at = monotonic()
+        self._paused_until = 0.0
+        self._waiters: list[
+            tuple[
+                int, int, asyncio.Future, float,
+                Optional[asyncio.Task],
+            ]
+        ] = []
+        # Priorities that tasks were raised to by raise_priority()
+        self._raised: WeakKeyDictionary[
+            asyncio.Task, int
+        ] = WeakKeyDictionary()
+        self._counter = count()
+        self._wakeup: Optional[asyncio.TimerHandle] = None
+
+    @property
+    def queue_depth(self) -> int:
+        return sum(not waiter[2].done() for waiter in self._waiters)
+
+    @property
+    def available_tokens(self) -> float:
+        self._refill()
+        return self._tokens
+
+    @property
+    def paused_for(self) -> float:
+        return max(self._paused_until - monotonic(), 0.0)
+
+    async def acquire(
+        self,
+        priority: int = 0,
+    ) -> float:
+        enqueued_at = monotonic()
+
+        if not self._waiters and self._try_take():
+            self._observe(0.0)
+            return 0.0
+
+        task = asyncio.current_task()
+        if task is not None:
+            priority = min(priority, self._raised.get(task, priority))
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(
+            self._waiters,
+            (priority, next(self._counter), future, enqueued_at, task),
+        )
+        self._schedule()
+
+        await future
+
+        wait_time = monotonic() - enqueued_at
+        self._observe(wait_time)
+        return wait_time
+
+    def raise_priority(
+        self,
+        task: asyncio.Task,
+        priority: int,
+    ) -> None:
+        # Moves a waiting task up the queue when a more urgent caller
+        # starts to wait for it, later acquires of the task keep the
+        # priority
+        raised = self._raised.get(task)
+        if raised is not None and raised <= priority:
+            return
+        self._raised[task] = priority
+
+        for index, waiter in enumerate(self._waiters):
+            waiter_priority, order, future, enqueued_at, owner = waiter
+            if owner is task and priority < waiter_priority:
+                self._waiters[index] = (
+                    priority, order, future, enqueued_at, owner,
+                )
+                heapq.heapify(self._waiters)
+                break
+
+    def pause(self, seconds: float) -> None:
+        self._paused_until = max(self._paused_until, monotonic() + seconds)
+        # Tokens start to accumulate again only after the pause
+        self._tokens = 0.0
+        self._updated_at = self._paused_until
+        self._schedule()
+
+    def _observe(self, wait_time: float) -> None:
+        self.wait_time_total += wait_time
+        self.requests_total += 1
+
+    def _refill(self) -> None:
+        now = monotonic()
+        if now <= self._updated_at:
+            return
+
+        self._tokens = min(
+            self._tokens + (now - self._updated_at) * self.rate,
+            float(self.burst),
+        )
+        self._updated_at = now
+
+    def _try_take(self) -> bool:
+        self._refill()
+        if self._tokens < 1:
+            return False
+        self._tokens -= 1
+        return True
+
+    def _schedule(self) -> None:
+        if self._wakeup is not None:
+            self._wakeup.cancel()
+            self._wakeup = None
+
+        while self._waiters and self._waiters[0][2].done():
+            heapq.heappop(self._waiters)
+        if not self._waiters:
+            return
+
+        while self._waiters and self._try_take():
+            future = heapq.heappop(self._waiters)[2]
+            if future.done():
+                self._tokens += 1
+            else:
+                future.set_result(None)
+
+        if self._waiters:
+            delay = self.paused_for + max(1 - self._tokens, 0) / self.rate
+            self._wakeup = asyncio.get_running_loop().call_later(
+                delay, self._schedule,
+            )
@@ -0,0 +1,97 @@
+import asyncio
+import hmac
+import signal
+from typing import Awaitable, Callable
+
+from aiogram import Bot
+from aiohttp import web
+from app.application import ALLOWED_UPDATES, Application
+from app.config_reader import Webhook
+from app.processing import UpdateProcessor
+from app.utils import json_loads
+from structlog import get_logger
+from structlog.stdlib import BoundLogger
+
+logger: BoundLogger = get_logger()
+
+SECRET_TOKEN_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+SHUTDOWN_TIMEOUT = 10
+
+
+def webhook_app(
+    bot: Bot,
+    webhook: Webhook,
+    feed: Callable[[dict], None],
+    on_shutdown: Callable[[], Awaitable[None]],
+) -> web.Application:
+    async def handle_update(request: web.Request) -> web.Response:
+        if webhook.secret_token is not None:
+            received = request.headers.get(SECRET_TOKEN_HEADER, "")
+            if not hmac.compare_digest(received, webhook.secret_token):
+                return web.Response(status=401)
+
+        try:
+            data = json_loads(await request.read())
+        except ValueError:
+            return web.Response(status=400)
+
+        # Telegram waits for the answer before sending the next update,
+        # so the update is acknowledged at once and handled later
+        feed(data)
+        return web.Response()
+
+    async def set_webhook(_: web.Application) -> None:
+        await bot.set_webhook(
+            url=webhook.url,
+            allowed_updates=ALLOWED_UPDATES,
+            secret_token=webhook.secret_token,
+        )
+        logger.warning("Webhook is set", url=webhook.url)
+
+    async def shutdown(_: web.Application) -> None:
+        await on_shutdown()
+
+    app = web.Application()
+    app.router.add_post(webhook.path, handle_update)
+    app.on_startup.append(set_webhook)
+    app.on_shutdown.append(shutdown)
+    return app
+
+
+async def serve_until_stopped(app: web.Application, webhook: Webhook):
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, host=webhook.host, port=webhook.port)
+    await site.start()
+    logger.warning(
+        "Webhook server started", host=webhook.host, port=webhook.port,
+    )
+
+    stopped = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signal_number in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signal_number, stopped.set)
+
+    try:
+        await stopped.wait()
+    finally:
+        # Stops accepting updates, then lets on_shutdown finish the ones
+        # in progress
+        await runner.cleanup()
+
+
+async def run_webhook(application: Application) -> None:
+    processor = UpdateProcessor(application)
+
+    async def on_shutdown() -> None:
+        await processor.drain(SHUTDOWN_TIMEOUT)
+        await application.close()
+        logger.warning("Bot stopped!")
+
+    app = webhook_app(
+        bot=application.bot,
+        webhook=application.config.webhook,
+        feed=processor.feed,
+        on_shutdown=on_shutdown,
+    )
+    await serve_until_stopped(app, application.config.webhook)
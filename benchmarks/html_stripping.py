@@ -0,0 +1,76 @@
+"""Compare escape_html_tags with the BeautifulSoup + lxml stripper it
+replaced: check that both give the same text for a corpus of AniList-like
+descriptions and measure how long each takes.
+
+    python -m benchmarks.html_stripping
+"""
+import timeit
+
+from bs4 import BeautifulSoup
+
+from app.text_utils.html_formatting import escape_html_tags
+
+CORPUS = [
+    "Ken Kaneki",
+    "東京喰種トーキョーグール",
+    "Shingeki no Kyojin &mdash; Attack on Titan",
+    (
+        "Ken Kaneki is an ordinary college student until a violent "
+        "encounter turns him into the first half-human half-ghoul hybrid."
+        "<br><br>\n(Source: Viz Media)<br><br>\n<i>Note: Chapter 143 "
+        "includes an extra.</i>"
+    ),
+    (
+        "<b>Volume 1</b><br>\nThe story of &quot;Edward&quot; &amp; "
+        "&quot;Alphonse&quot; Elric.<br>\n<br>\n<i>(Source: Crunchyroll)"
+        "</i>"
+    ),
+    "  Leading blanks<br>  \n  <i>  </i>  trailing  ",
+    "1 < 2 and 3 > 2, but <3 is a heart",
+    "Tom &amp; Jerry &hellip; &#039;quoted&#039; &#x27;hex&#x27; &nbsp;",
+    "<i>un<b>closed",
+    "Stray</i> end\n\n</b> tags",
+    "a<!-- comment -->  <!-- another -->b",
+    "<a href=\"https://anilist.co/?a=1&b=2\">link</a> text",
+    "line\r\nbreaks\rhere",
+    "<p>para</p>  <p>graph</p>",
+    "<script>alert(1)</script>safe<style>p {}</style>",
+    "<pre>  kept  </pre>  <i>x</i>",
+    "",
+    " ",
+    "<br>",
+]
+
+
+def main() -> None:
+    for string in CORPUS:
+        expected = BeautifulSoup(string, "lxml").text
+        actual = escape_html_tags(string)
+        if actual != expected:
+            raise AssertionError(
+                f"{string!r}: expected {expected!r}, got {actual!r}",
+            )
+    print(f"Equivalence: {len(CORPUS)} strings match")
+
+    cases = {
+        "title name": CORPUS[1],
+        "description": CORPUS[3],
+        "long description": CORPUS[3] * 8,
+    }
+    number = 2000
+
+    for case, string in cases.items():
+        old = timeit.timeit(
+            lambda: BeautifulSoup(string, "lxml").text, number=number,
+        )
+        new = timeit.timeit(lambda: escape_html_tags(string), number=number)
+
+        print(
+            f"{case}: BeautifulSoup + lxml {old / number * 1e6:.1f} us, "
+            f"escape_html_tags {new / number * 1e6:.1f} us "
+            f"(x{old / new:.1f})",
+        )
+
+
+if __name__ == "__main__":
+    main()
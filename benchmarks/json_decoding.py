@@ -0,0 +1,149 @@
+"""Compare decoding of AniList responses before and after the fast path:
+stdlib json from text plus pydantic models against orjson from bytes plus
+slotted dataclasses, per response of each shape the bot requests.
+
+    python -m benchmarks.json_decoding
+"""
+import json
+import timeit
+from copy import deepcopy
+from typing import Optional
+
+from pydantic import BaseModel
+
+from app.bench.catalog import Catalog
+from app.bench.fake_anilist import media_fields
+from app.services.title.anilist.anilist_api import (parse_title_preview,
+                                                    parse_title_relation)
+from app.text_utils.html_formatting import escape_html_tags_or_none
+from app.utils import json_loads
+
+
+class PydanticTitlePreview(BaseModel):
+    id: int
+    english_name: Optional[str]
+    romaji_name: Optional[str]
+    native_name: Optional[str]
+    title_format: str
+    url: str
+    banner_image_url: Optional[str]
+    description: Optional[str]
+    genres: list[str]
+
+
+class PydanticTitleRelation(PydanticTitlePreview):
+    relation_type: str
+
+
+def pydantic_fields(media: dict) -> dict:
+    title = media["title"]
+
+    return dict(
+        id=media["id"],
+        english_name=escape_html_tags_or_none(title["english"]),
+        romaji_name=escape_html_tags_or_none(title["romaji"]),
+        native_name=escape_html_tags_or_none(title["native"]),
+        title_format=media["format"],
+        url=media["siteUrl"],
+        banner_image_url=media["bannerImage"],
+        description=escape_html_tags_or_none(media["description"]),
+        genres=media["genres"],
+    )
+
+
+def responses() -> dict[str, tuple[bytes, str]]:
+    catalog = Catalog(size=100)
+    media = [
+        media_fields(catalog.media[title_id]) for title_id in range(1, 41)
+    ]
+
+    return {
+        "title": (
+            json.dumps({"data": {"Media": media[0]}}).encode(),
+            "title",
+        ),
+        "page of 10": (
+            json.dumps(
+                {
+                    "data": {
+                        "Page": {
+                            "pageInfo": {"total": 100, "hasNextPage": True},
+                            "media": media[:10],
+                        },
+                    },
+                },
+            ).encode(),
+            "page",
+        ),
+        "40 relations": (
+            json.dumps(
+                {
+                    "data": {
+                        "Media": {
+                            "relations": {
+                                "edges": [
+                                    {"node": node, "relationType": "SEQUEL"}
+                                    for node in media
+                                ],
+                            },
+                        },
+                    },
+                },
+            ).encode(),
+            "relations",
+        ),
+    }
+
+
+def old_path(body: bytes, shape: str) -> object:
+    # aiohttp decoded the body to text for json.loads, and every waiter
+    # of a shared request got a deep copy
+    result = deepcopy(json.loads(body.decode("utf-8")))
+    data = result["data"]
+
+    if shape == "title":
+        return PydanticTitlePreview(**pydantic_fields(data["Media"]))
+    if shape == "page":
+        return [
+            PydanticTitlePreview(**pydantic_fields(media))
+            for media in data["Page"]["media"]
+        ]
+    return [
+        PydanticTitleRelation(
+            **pydantic_fields(edge["node"]),
+            relation_type=edge["relationType"],
+        )
+        for edge in data["Media"]["relations"]["edges"]
+    ]
+
+
+def new_path(body: bytes, shape: str) -> object:
+    data = json_loads(body)["data"]
+
+    if shape == "title":
+        return parse_title_preview(data["Media"])
+    if shape == "page":
+        return [parse_title_preview(media) for media in data["Page"]["media"]]
+    return [
+        parse_title_relation(edge)
+        for edge in data["Media"]["relations"]["edges"]
+    ]
+
+
+def main() -> None:
+    number = 500
+
+    for case, (body, shape) in responses().items():
+        old = timeit.timeit(lambda: old_path(body, shape), number=number)
+        new = timeit.timeit(lambda: new_path(body, shape), number=number)
+
+        print(
+            f"{case} ({len(body) / 1024:.1f} KiB): "
+            f"json + pydantic {old / number * 1e6:.1f} us, "
+            f"orjson + dataclasses {new / number * 1e6:.1f} us "
+            f"(x{old / new:.1f})",
+        )
+
+
+if __name__ == "__main__":
+    main()
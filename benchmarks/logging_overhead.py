@@ -0,0 +1,68 @@
+"""Measure how long a log call keeps the calling thread busy with each
+logging profile: the development one (console rendering, call site
+lookup, writing in the calling thread) and the production one (JSON,
+cached loggers, writing from a background thread), with and without
+sampling of info events. Output goes to /dev/null, so only the logging
+work is measured.
+
+    python -m benchmarks.logging_overhead
+"""
+import os
+import timeit
+
+import structlog
+
+from app.logging import (DEVELOPMENT, PRODUCTION, _stop_listener,
+                         logging_configure)
+
+CASES = (
+    ("development", DEVELOPMENT, 1.0),
+    ("production", PRODUCTION, 1.0),
+    ("production, 10% sampled", PRODUCTION, 0.1),
+)
+
+
+def log_calls(logger: structlog.stdlib.BoundLogger, number: int) -> None:
+    for update_id in range(number):
+        logger.info(
+            "Update handled",
+            update_id=update_id,
+            handler="title_preview_switch_cmd",
+            duration=0.0123,
+        )
+
+
+def measure(profile: str, sample_rate: float, number: int) -> float:
+    with open(os.devnull, "w") as devnull:
+        structlog.reset_defaults()
+        logging_configure(
+            profile=profile, sample_rate=sample_rate, stream=devnull,
+        )
+        logger = structlog.get_logger("benchmark")
+
+        log_calls(logger, 100)
+        elapsed = timeit.timeit(
+            lambda: log_calls(logger, number), number=1,
+        )
+        # Records still in the queue are written before the file closes
+        _stop_listener()
+    return elapsed / number
+
+
+def main() -> None:
+    number = 20000
+
+    baseline = None
+    for case, profile, sample_rate in CASES:
+        per_call = measure(profile, sample_rate, number)
+        if baseline is None:
+            baseline = per_call
+
+        print(
+            f"{case}: {per_call * 1e6:.1f} us per call "
+            f"(x{baseline / per_call:.1f})",
+        )
+
+
+if __name__ == "__main__":
+    main()
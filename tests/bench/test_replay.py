@@ -0,0 +1,20 @@
+import gzip
+import json
+
+from app.bench.replay import read_recording
+
+
+def record(update_id: int) -> bytes:
+    line = json.dumps({"time": update_id, "update": {"update_id": update_id}})
+    return (line + "\n").encode()
+
+
+def test_read_recording_keeps_lines_before_truncated_member(tmp_path) -> None:
+    path = tmp_path / "updates.jsonl.gz"
+    unfinished = gzip.compress(record(2) + record(3))
+    path.write_bytes(gzip.compress(record(1)) + unfinished[:-10])
+
+    updates = [update for _, update in read_recording(str(path))]
+
+    assert updates[0] == {"update_id": 1}
+    assert {"update_id": 3} not in updates
@@ -0,0 +1,39 @@
+import gzip
+import time
+import zlib
+
+from app.middlewares import recorder
+from app.middlewares.recorder import UpdateRecorderMiddleware
+
+
+def gzip_members(data: bytes) -> int:
+    # Counts the complete members, a truncated one isn't counted
+    members = 0
+    while data:
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        decompressor.decompress(data)
+        if not decompressor.eof:
+            break
+        data = decompressor.unused_data
+        members += 1
+    return members
+
+
+def test_recorder_closes_gzip_member_every_interval(
+    tmp_path, monkeypatch,
+) -> None:
+    monkeypatch.setattr(recorder, "FLUSH_INTERVAL", 0.01)
+    path = tmp_path / "updates.jsonl.gz"
+    middleware = UpdateRecorderMiddleware(str(path))
+
+    middleware._queue.put((1.0, {"update_id": 1}))
+    deadline = time.monotonic() + 5
+    while not path.exists() or not gzip_members(path.read_bytes()):
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+    middleware._queue.put((2.0, {"update_id": 2}))
+    middleware.close()
+
+    assert gzip_members(path.read_bytes()) == 2
+    assert gzip.decompress(path.read_bytes()).count(b"\n") == 2
@@ -0,0 +1,118 @@
+import asyncio
+
+import pytest
+from aiogram import types
+from aiogram.dispatcher.handler import CancelHandler
+
+from app.middlewares.scheduler import (SchedulerMiddleware,
+                                       update_scheduler_key)
+from app.utils import FairScheduler, LatestTasks
+
+GROUP = {"id": -100, "type": "supergroup"}
+
+
+def user(id: int) -> dict:
+    return {"id": id, "is_bot": False, "first_name": "User"}
+
+
+def click(update_id: int, user_id: int) -> types.Update:
+    return types.Update.to_object({
+        "update_id": update_id,
+        "callback_query": {
+            "id": str(update_id),
+            "from": user(user_id),
+            "chat_instance": "1",
+            "data": "preview a 2 tokyo",
+            "message": {
+                "message_id": 7,
+                "date": 0,
+                "chat": GROUP,
+                "from": {"id": 1, "is_bot": True, "first_name": "Bot"},
+                "text": "Tokyo",
+            },
+        },
+    })
+
+
+def message(update_id: int, user_id: int) -> types.Update:
+    return types.Update.to_object({
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": 0,
+            "chat": GROUP,
+            "from": user(user_id),
+            "text": "/search tokyo",
+        },
+    })
+
+
+def test_updates_of_group_are_scheduled_per_user() -> None:
+    assert update_scheduler_key(message(1, 10)) == 10
+    assert update_scheduler_key(message(2, 20)) == 20
+    assert update_scheduler_key(click(3, 20)) == 20
+
+
+def test_click_is_dropped_after_newer_click_on_message(monkeypatch) -> None:
+    superseded = []
+
+    async def answer_superseded(update: types.Update) -> None:
+        superseded.append(update.update_id)
+
+    monkeypatch.setattr(
+        SchedulerMiddleware, "_answer_superseded",
+        staticmethod(answer_superseded),
+    )
+
+    async def main() -> list[int]:
+        middleware = SchedulerMiddleware(
+            FairScheduler(concurrency=1, queue_size=4),
+            LatestTasks(),
+            LatestTasks(),
+        )
+        busy: dict = {}
+        await middleware.on_pre_process_update(message(1, 30), busy)
+
+        handled = []
+
+        async def handle(update: types.Update) -> None:
+            data: dict = {}
+            try:
+                await middleware.on_pre_process_update(update, data)
+            except CancelHandler:
+                return
+            handled.append(update.update_id)
+            await middleware.on_post_process_update(update, [], data)
+
+        tasks = [
+            asyncio.create_task(handle(click(2, 10))),
+            asyncio.create_task(handle(click(3, 20))),
+        ]
+        await asyncio.sleep(0)
+        await middleware.on_post_process_update(message(1, 30), [], busy)
+        await asyncio.gather(*tasks)
+        return handled
+
+    assert asyncio.run(main()) == [3]
+    assert superseded == [2]
+
+
+@pytest.mark.parametrize("chat_type, answered", [
+    ("private", True),
+    ("group", False),
+])
+def test_busy_answer_isnt_posted_to_groups(
+    monkeypatch, chat_type, answered,
+) -> None:
+    answers = []
+
+    async def answer(self, **kwargs) -> None:
+        answers.append(kwargs["text"])
+
+    monkeypatch.setattr(types.Message, "answer", answer)
+    update = message(1, 10)
+    update.message.chat.type = chat_type
+
+    asyncio.run(SchedulerMiddleware._answer_busy(update))
+
+    assert bool(answers) is answered
@@ -0,0 +1,154 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+import pytest
+
+from app.services.title.anilist.anilist_api import (DEFAULT_RETRY_AFTER,
+                                                    MAX_RETRY_AFTER,
+                                                    AnilistApi,
+                                                    parse_retry_after,
+                                                    parse_title_preview)
+from app.services.title.anilist.exceptions import ServerError
+from app.services.title.anilist.schemas import TitlePage, TitlePreview
+from app.services.title.anilist.title_index import TitleIndex
+
+
+@pytest.mark.parametrize(
+    "value, expected",
+    [
+        (None, DEFAULT_RETRY_AFTER),
+        ("5", 5.0),
+        ("1.5", 1.5),
+        ("-3", 0.0),
+        ("100000", MAX_RETRY_AFTER),
+        ("nan", DEFAULT_RETRY_AFTER),
+        ("soon", DEFAULT_RETRY_AFTER),
+        ("Wed, 21 Oct 2015 07:28:00 GMT", 0.0),
+    ],
+)
+def test_parse_retry_after(value, expected) -> None:
+    assert parse_retry_after(value) == expected
+
+
+def test_parse_retry_after_http_date() -> None:
+    retry_at = datetime.now(timezone.utc) + timedelta(seconds=30)
+
+    seconds = parse_retry_after(format_datetime(retry_at, usegmt=True))
+
+    assert 25 < seconds <= 30
+
+
+def media(id: int, description: str) -> dict:
+    return {
+        "id": id,
+        "type": "ANIME",
+        "format": "TV",
+        "title": {"english": f"Title {id}", "romaji": None, "native": None},
+        "siteUrl": f"https://anilist.co/anime/{id}",
+        "bannerImage": None,
+        "description": description,
+        "genres": ["Drama"],
+    }
+
+
+@pytest.fixture
+def title_index(tmp_path):
+    index = TitleIndex(str(tmp_path / "titles.sqlite3"))
+    index.upsert_sync([media(1, "stale"), media(2, "stale")])
+    yield index
+    asyncio.run(index.close())
+
+
+def test_index_ranks_titles_with_details_from_source(title_index) -> None:
+    async def fetch(ids, title_format, priority):
+        return {id: parse_title_preview(media(id, "fresh")) for id in ids}
+
+    async def main() -> TitlePage:
+        api = AnilistApi(title_index=title_index)
+        api._fetch_title_previews_by_ids = fetch
+        return await api.title_page_by_name(page=1, name="title")
+
+    title_page = asyncio.run(main())
+
+    assert [title.id for title in title_page.titles] == [1, 2]
+    assert {title.description for title in title_page.titles} == {"fresh"}
+
+
+def test_index_answers_while_source_is_unavailable(title_index) -> None:
+    async def fail(*args):
+        raise ServerError("Bad Gateway")
+
+    async def main() -> tuple[TitlePage, TitlePreview]:
+        api = AnilistApi(title_index=title_index)
+        api._fetch_title_previews_by_ids = fail
+        api._fetch_title_preview_by_id = fail
+        return (
+            await api.title_page_by_name(page=1, name="title"),
+            await api.title_preview_by_id(2),
+        )
+
+    title_page, title = asyncio.run(main())
+
+    assert [title.id for title in title_page.titles] == [1, 2]
+    assert title.id == 2 and title.description == "stale"
+
+
+def test_same_requests_share_one_call_to_source() -> None:
+    calls = []
+
+    async def post(query: str, variables: dict, priority) -> tuple:
+        calls.append(variables)
+        await asyncio.sleep(0.01)
+        return 200, b'{"data": {"Media": {"id": 1}}}'
+
+    async def main() -> list[tuple[int, dict]]:
+        api = AnilistApi()
+        api._post_to_source = post
+        return await asyncio.gather(
+            api.send_request_to_source("query", {"id": 1}),
+            api.send_request_to_source("query", {"id": 1}),
+            api.send_request_to_source("query", {"id": 2}),
+        )
+
+    first, second, other = asyncio.run(main())
+
+    assert calls == [{"id": 1}, {"id": 2}]
+    assert first == second == (200, {"data": {"Media": {"id": 1}}})
+    # Every waiter gets a result of its own to change
+    first[1]["data"]["Media"]["id"] = 3
+    assert second[1]["data"]["Media"]["id"] == 1
+
+
+def test_shared_request_is_cancelled_with_its_last_waiter() -> None:
+    cancelled = []
+
+    async def post(query: str, variables: dict, priority) -> tuple:
+        try:
+            await asyncio.sleep(1)
+        except asyncio.CancelledError:
+            cancelled.append(variables)
+            raise
+        return 200, b"{}"
+
+    async def main() -> int:
+        api = AnilistApi()
+        api._post_to_source = post
+        waiters = [
+            asyncio.ensure_future(
+                api.send_request_to_source("query", {"id": 1}),
+            )
+            for _ in range(2)
+        ]
+        await asyncio.sleep(0)
+
+        waiters[0].cancel()
+        await asyncio.sleep(0)
+        assert not cancelled
+
+        waiters[1].cancel()
+        await asyncio.sleep(0)
+        return len(api._requests_in_flight)
+
+    assert asyncio.run(main()) == 0
+    assert cancelled == [{"id": 1}]
@@ -0,0 +1,74 @@
+import asyncio
+
+import pytest
+
+from app.services.title.anilist.dto import RequestPriority, TitleFormat
+from app.services.title.anilist.exceptions import TitleNotFound
+from app.services.title.anilist.media_batcher import MediaBatcher
+
+
+def test_loads_are_sent_as_one_batch() -> None:
+    batches = []
+
+    async def load_batch(ids, title_format, priority) -> dict:
+        batches.append((ids, priority))
+        return {id: f"title {id}" for id in ids if id != 3}
+
+    async def main() -> list:
+        batcher = MediaBatcher(load_batch, window=0.01, max_size=50)
+        return await asyncio.gather(
+            batcher.load(1, TitleFormat.ANIME),
+            batcher.load(2, TitleFormat.ANIME, RequestPriority.INTERACTIVE),
+            batcher.load(1, TitleFormat.ANIME),
+            batcher.load(3, TitleFormat.ANIME),
+            return_exceptions=True,
+        )
+
+    first, second, again, missing = asyncio.run(main())
+
+    assert batches == [([1, 2, 3], RequestPriority.INTERACTIVE)]
+    assert (first, second, again) == ("title 1", "title 2", "title 1")
+    assert isinstance(missing, TitleNotFound)
+
+
+def test_full_batch_is_sent_before_window_ends() -> None:
+    batches = []
+
+    async def load_batch(ids, title_format, priority) -> dict:
+        batches.append(ids)
+        return {id: id for id in ids}
+
+    async def main() -> list:
+        batcher = MediaBatcher(load_batch, window=60, max_size=2)
+        return await asyncio.wait_for(
+            asyncio.gather(
+                batcher.load(1, TitleFormat.ANIME),
+                batcher.load(2, TitleFormat.ANIME),
+            ),
+            timeout=1,
+        )
+
+    assert asyncio.run(main()) == [1, 2]
+    assert batches == [[1, 2]]
+
+
+def test_cancelled_load_is_left_out_of_batch() -> None:
+    batches = []
+
+    async def load_batch(ids, title_format, priority) -> dict:
+        batches.append(ids)
+        return {id: id for id in ids}
+
+    async def main() -> int:
+        batcher = MediaBatcher(load_batch, window=0.01, max_size=50)
+        cancelled = asyncio.ensure_future(batcher.load(1, TitleFormat.MANGA))
+        loaded = asyncio.ensure_future(batcher.load(2, TitleFormat.MANGA))
+        await asyncio.sleep(0)
+        cancelled.cancel()
+
+        with pytest.raises(asyncio.CancelledError):
+            await cancelled
+        return await loaded
+
+    assert asyncio.run(main()) == 2
+    assert batches == [[2]]
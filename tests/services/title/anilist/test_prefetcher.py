@@ -0,0 +1,52 @@
+import asyncio
+
+from app.metrics import PREFETCH_HITS, PREFETCH_WASTED
+from app.services.title.anilist.cache import MemoryCache
+from app.services.title.anilist.prefetcher import Prefetcher
+
+
+def test_key_is_prefetched_again_after_cache_entry_expires() -> None:
+    loads = []
+
+    async def main() -> None:
+        cache = MemoryCache(max_size=10, ttl=0.05)
+        prefetcher = Prefetcher(max_concurrency=2, min_tokens=0)
+
+        async def load() -> None:
+            loads.append("page")
+            await cache.set("page", "value")
+
+        hits = PREFETCH_HITS.labels().value
+        wasted = PREFETCH_WASTED.labels().value
+
+        assert prefetcher.prefetch("page", cache, load)
+        await asyncio.sleep(0.01)
+        assert not prefetcher.prefetch("page", cache, load)
+
+        await asyncio.sleep(0.05)
+        assert prefetcher.prefetch("page", cache, load)
+        await asyncio.sleep(0.01)
+        assert PREFETCH_WASTED.labels().value == wasted + 1
+
+        prefetcher.used("page")
+        assert PREFETCH_HITS.labels().value == hits + 1
+
+    asyncio.run(main())
+
+    assert loads == ["page", "page"]
+
+
+def test_empty_result_isnt_tracked_without_cache_entry() -> None:
+    async def main() -> None:
+        cache = MemoryCache(max_size=10, ttl=60)
+        prefetcher = Prefetcher(max_concurrency=2, min_tokens=0)
+
+        async def load() -> None:
+            await cache.get_or_load("page", lambda: asyncio.sleep(0))
+
+        assert prefetcher.prefetch("page", cache, load)
+        await asyncio.sleep(0.01)
+        assert prefetcher.prefetch("page", cache, load)
+        prefetcher.close()
+
+    asyncio.run(main())
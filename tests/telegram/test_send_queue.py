@@ -0,0 +1,86 @@
+import asyncio
+
+from aiogram.utils.exceptions import RetryAfter
+
+from app.telegram.send_queue import SendQueue
+
+
+def send_queue(send) -> SendQueue:
+    return SendQueue(
+        send=send,
+        messages_per_second=30,
+        chat_messages_per_minute=60,
+        group_chat_messages_per_minute=20,
+        chat_burst=3,
+    )
+
+
+async def sent(method: str, data: dict, files, **kwargs) -> dict:
+    return data
+
+
+def test_groups_have_lower_chat_limit() -> None:
+    async def main() -> dict:
+        queue = send_queue(sent)
+        for chat_id in (10, -100, "@channel"):
+            await queue.submit("sendMessage", {"chat_id": chat_id}, None, {})
+        rates = {
+            chat_id: chat.limiter.rate * 60
+            for chat_id, chat in queue._chats.items()
+        }
+        queue.close()
+        return rates
+
+    assert asyncio.run(main()) == {10: 60, -100: 20, "@channel": 20}
+
+
+def test_retry_after_pauses_all_chats() -> None:
+    calls = []
+
+    async def send(method: str, data: dict, files, **kwargs) -> dict:
+        calls.append(data["chat_id"])
+        if len(calls) == 1:
+            raise RetryAfter(1)
+        return data
+
+    async def main() -> float:
+        queue = send_queue(send)
+        asyncio.create_task(
+            queue.submit("sendMessage", {"chat_id": 10}, None, {}),
+        )
+        await asyncio.sleep(0.01)
+        paused_for = queue._limiter.paused_for
+        queue.close()
+        return paused_for
+
+    assert asyncio.run(main()) > 0.9
+    assert calls == [10]
+
+
+def test_waiting_edit_of_message_is_replaced_by_newer_one() -> None:
+    texts = []
+
+    async def send(method: str, data: dict, files, **kwargs) -> dict:
+        texts.append(data.get("text"))
+        return data
+
+    async def main() -> list:
+        queue = send_queue(send)
+        message = {"chat_id": 10, "text": "new"}
+        edits = [
+            {"chat_id": 10, "message_id": 5, "text": text}
+            for text in ("1", "2", "3")
+        ]
+        results = await asyncio.gather(
+            queue.submit("sendMessage", message, None, {}),
+            *(
+                queue.submit("editMessageText", edit, None, {})
+                for edit in edits
+            ),
+        )
+        queue.close()
+        return [result["text"] for result in results]
+
+    # Callers of the replaced edits get the result of the newest one
+    assert asyncio.run(main()) == ["new", "3", "3", "3"]
+    assert texts == ["new", "3"]
@@ -0,0 +1,83 @@
+import pytest
+
+from app.text_utils.html_formatting import (escape_html_tags,
+                                            escape_html_tags_or_none)
+
+# Outputs of the BeautifulSoup + lxml stripper that escape_html_tags
+# replaced, stored so the check doesn't need bs4
+CASES = [
+    ("Ken Kaneki", "Ken Kaneki"),
+    ("東京喰種トーキョーグール", "東京喰種トーキョーグール"),
+    (
+        "Shingeki no Kyojin &mdash; Attack on Titan",
+        "Shingeki no Kyojin — Attack on Titan",
+    ),
+    (
+        (
+            "Ken Kaneki is an ordinary college student until a violent "
+            "encounter turns him into the first half-human half-ghoul "
+            "hybrid.<br><br>\n(Source: Viz Media)<br><br>\n<i>Note: "
+            "Chapter 143 includes an extra.</i>"
+        ),
+        (
+            "Ken Kaneki is an ordinary college student until a violent "
+            "encounter turns him into the first half-human half-ghoul "
+            "hybrid.\n(Source: Viz Media)\nNote: Chapter 143 includes an "
+            "extra."
+        ),
+    ),
+    (
+        (
+            "<b>Volume 1</b><br>\nThe story of &quot;Edward&quot; &amp; "
+            "&quot;Alphonse&quot; Elric.<br>\n<br>\n<i>(Source: "
+            "Crunchyroll)</i>"
+        ),
+        (
+            "Volume 1\nThe story of \"Edward\" & \"Alphonse\" Elric.\n\n"
+            "(Source: Crunchyroll)"
+        ),
+    ),
+    (
+        "  Leading blanks<br>  \n  <i>  </i>  trailing  ",
+        "Leading blanks\n   trailing  ",
+    ),
+    (
+        "1 < 2 and 3 > 2, but <3 is a heart",
+        "1 < 2 and 3 > 2, but <3 is a heart",
+    ),
+    (
+        "Tom &amp; Jerry &hellip; &#039;quoted&#039; &#x27;hex&#x27; &nbsp;",
+        "Tom & Jerry … 'quoted' 'hex' \xa0",
+    ),
+    ("<i>un<b>closed", "unclosed"),
+    (
+        "<i>open <b>inner</b> and &lt;escaped&gt;",
+        "open inner and <escaped>",
+    ),
+    (
+        "<b><i>nested</i> and <u>deep <s>er</s></u></b> text",
+        "nested and deep er text",
+    ),
+    ("<br/>one<br />two<BR>three", "onetwothree"),
+    ("Stray</i> end\n\n</b> tags", "Stray end\n\n tags"),
+    ("a<!-- comment -->  <!-- another -->b", "a b"),
+    ('<a href="https://anilist.co/?a=1&b=2">link</a> text', "link text"),
+    ("line\r\nbreaks\rhere", "line\nbreaks\nhere"),
+    ("<p>para</p>  <p>graph</p>", "para graph"),
+    ("<script>alert(1)</script>safe<style>p {}</style>", "safe"),
+    ("<pre>  kept  </pre>  <i>x</i>", "  kept   x"),
+    ("", ""),
+    (" ", ""),
+    ("<br>", ""),
+]
+
+
+@pytest.mark.parametrize("string, expected", CASES)
+def test_escape_html_tags(string: str, expected: str) -> None:
+    assert escape_html_tags(string) == expected
+
+
+def test_escape_html_tags_or_none() -> None:
+    assert escape_html_tags_or_none(None) is None
+    assert escape_html_tags_or_none("") is None
+    assert escape_html_tags_or_none("<b>a</b>") == "a"
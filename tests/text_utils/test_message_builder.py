@@ -0,0 +1,59 @@
+import pytest
+
+from app.text_utils.message_builder import (MessageBuilder,
+                                            cut_to_utf16_length)
+
+
+def test_length_and_entities_are_counted_in_utf16_units() -> None:
+    message = (
+        MessageBuilder()
+        .bold("Naruto 🍥")
+        .plain("\n")
+        .link("AniList", "https://anilist.co/anime/20")
+        .plain(" é")
+        .code("")
+        .build()
+    )
+
+    assert message.length == len("Naruto 🍥\nAniList é") + 1
+    assert [
+        (entity.type, entity.offset, entity.length)
+        for entity in message.entities
+    ] == [("bold", 0, 9), ("text_link", 10, 7)]
+    assert message.entities[1].url == "https://anilist.co/anime/20"
+
+
+def test_html_escapes_text_and_urls() -> None:
+    message = (
+        MessageBuilder()
+        .bold("<Re:Zero>")
+        .plain(" & ")
+        .link("link", "https://example.com/?a=1&b=\"2\"")
+        .build()
+    )
+
+    assert message.html == (
+        "<b>&lt;Re:Zero&gt;</b> &amp; "
+        "<a href=\"https://example.com/?a=1&amp;b=&quot;2&quot;\">link</a>"
+    )
+    assert message.text == "<Re:Zero> & link"
+
+
+def test_extend_adds_parts_and_length() -> None:
+    message = MessageBuilder().plain("🍥").extend(
+        MessageBuilder().bold("ab"),
+    ).build()
+
+    assert message.length == 4
+    assert message.entities[0].offset == 2
+
+
+@pytest.mark.parametrize("string, length, expected", [
+    ("abc", 5, "abc"),
+    ("abc", 2, "ab"),
+    ("a🍥b", 2, "a"),
+    ("a🍥b", 3, "a🍥"),
+    ("abc", 0, ""),
+])
+def test_cut_to_utf16_length(string: str, length: int, expected: str) -> None:
+    assert cut_to_utf16_length(string, length) == expected
@@ -0,0 +1,72 @@
+import asyncio
+
+import pytest
+
+from app.utils import FairScheduler, QueueFull, Superseded
+
+
+async def run(scheduler: FairScheduler, key, order: list, tag=None) -> None:
+    await scheduler.acquire(key, tag=tag)
+    order.append(key)
+    await asyncio.sleep(0)
+    scheduler.release(key)
+
+
+def test_keys_take_turns() -> None:
+    async def main() -> list:
+        scheduler = FairScheduler(concurrency=1, queue_size=10)
+        order: list = []
+        await scheduler.acquire("busy")
+        tasks = [
+            asyncio.ensure_future(run(scheduler, key, order))
+            for key in ("a", "a", "a", "b", "c")
+        ]
+        await asyncio.sleep(0)
+        scheduler.release("busy")
+        await asyncio.gather(*tasks)
+        return order
+
+    assert asyncio.run(main()) == ["a", "b", "c", "a", "a"]
+
+
+def test_full_queue_of_key_sheds_new_jobs() -> None:
+    async def main() -> None:
+        scheduler = FairScheduler(concurrency=1, queue_size=1)
+        await scheduler.acquire("a")
+        waiting = asyncio.ensure_future(scheduler.acquire("a"))
+        await asyncio.sleep(0)
+
+        with pytest.raises(QueueFull):
+            await scheduler.acquire("a")
+        # Other keys still have room
+        other = asyncio.ensure_future(scheduler.acquire("b"))
+        await asyncio.sleep(0)
+        assert scheduler.queued == 2
+
+        waiting.cancel()
+        other.cancel()
+
+    asyncio.run(main())
+
+
+def test_tagged_job_supersedes_waiting_one() -> None:
+    async def main() -> list:
+        scheduler = FairScheduler(concurrency=1, queue_size=10)
+        order: list = []
+        await scheduler.acquire("busy")
+        older = asyncio.ensure_future(run(scheduler, "a", order, tag="t"))
+        other = asyncio.ensure_future(run(scheduler, "b", order))
+        await asyncio.sleep(0)
+        newer = asyncio.ensure_future(run(scheduler, "a", order, tag="t"))
+        await asyncio.sleep(0)
+
+        with pytest.raises(Superseded):
+            await older
+        assert scheduler.queued == 2
+
+        scheduler.release("busy")
+        await asyncio.gather(other, newer)
+        return order
+
+    # The newer job keeps the place of the older one in the turns
+    assert asyncio.run(main()) == ["a", "b"]
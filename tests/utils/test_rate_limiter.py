@@ -0,0 +1,50 @@
+import asyncio
+
+from app.utils import RateLimiter
+
+
+def test_raised_task_is_served_before_earlier_waiters() -> None:
+    async def main() -> list:
+        limiter = RateLimiter(requests_per_minute=6000, burst=1)
+        await limiter.acquire()
+        order = []
+
+        async def acquire(name: str, priority: int) -> None:
+            await limiter.acquire(priority)
+            order.append(name)
+
+        first = asyncio.ensure_future(acquire("first", 2))
+        raised = asyncio.ensure_future(acquire("raised", 2))
+        await asyncio.sleep(0)
+
+        limiter.raise_priority(raised, 0)
+        await asyncio.gather(first, raised)
+        return order
+
+    assert asyncio.run(main()) == ["raised", "first"]
+
+
+def test_raised_priority_stays_for_later_acquires() -> None:
+    async def main() -> list:
+        limiter = RateLimiter(requests_per_minute=6000, burst=1)
+        await limiter.acquire()
+        order = []
+
+        async def retried() -> None:
+            # The second acquire is like a retry of a raised request
+            await asyncio.sleep(0.001)
+            await limiter.acquire(2)
+            order.append("retried")
+
+        async def acquire(name: str, priority: int) -> None:
+            await asyncio.sleep(0.0005)
+            await limiter.acquire(priority)
+            order.append(name)
+
+        task = asyncio.ensure_future(retried())
+        limiter.raise_priority(task, 0)
+        other = asyncio.ensure_future(acquire("other", 1))
+        await asyncio.gather(task, other)
+        return order
+
+    assert asyncio.run(main()) == ["retried", "other"]